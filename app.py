@@ -1,18 +1,30 @@
+import logging
+import sys
 from github import Github, Auth
 from config import APP_ID, PRIVATE_KEY_PATH
 from server import create_app, start_server
+from code_review_integration import get_code_review_integration
 
 def main():
     """
     Main application entry point
     """
+    # Review debug output stays off unless explicitly enabled
+    logging.basicConfig(level=logging.INFO)
+    
+    try:
+        app_id = int(APP_ID)
+    except (TypeError, ValueError):
+        print(f"❌ ERROR: APP_ID must be the numeric GitHub App id, got {APP_ID!r}")
+        sys.exit(1)
+    
     # Read the private key content
     with open(PRIVATE_KEY_PATH, 'r') as f:
         private_key_content = f.read()
     
     # Create GitHub App authentication using the new PyGithub Auth system
     auth = Auth.AppAuth(
-        app_id=int(APP_ID),
+        app_id=app_id,
         private_key=private_key_content
     )
     
@@ -21,6 +33,10 @@ def main():
     
     # Create and start the server
     app = create_app(github_app)
+    
+    # Build the code review backends up front so the first PR doesn't pay for it
+    get_code_review_integration()
+    
     start_server(app)
 
 if __name__ == "__main__":
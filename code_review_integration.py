@@ -5,43 +5,107 @@ Integrates the code_reviewer functionality into the main GitHub App PR review pr
 """
 
 import os
+import re
+import asyncio
+import concurrent.futures
+import functools
+import hashlib
+import io
+import json
 import sys
 import logging
-from typing import Optional, Dict, Any, List
+import threading
+from collections import OrderedDict, defaultdict
+from operator import itemgetter
+from typing import Optional, Dict, Any, List, Callable, Awaitable
 from pathlib import Path
 
-# Add code_reviewer to path for imports
-sys.path.append(str(Path(__file__).parent / "code_reviewer"))
+from code_reviewer.util.aio import run_sync
 
+# Prefer orjson for parsing large review payloads when it is installed
 try:
-    from code_reviewer.multi_agent_reviewer import MultiAgentCodeReviewer
-    from code_reviewer.consolidation_agent import ConsolidatedReview
-    from code_reviewer.pr_review_formatter import PRReviewFormatter
-except ImportError as e:
-    print(f"Warning: Could not import code_reviewer modules: {e}")
-    MultiAgentCodeReviewer = None
-    ConsolidatedReview = None
-    PRReviewFormatter = None
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
 
 logger = logging.getLogger(__name__)
 
+# The multi-agent reviewer is imported on first use so importing this module stays cheap
+_reviewer_cls = None
+_reviewer_import_failed = False
+
+# Matches both "diff --git a/x b/x" and "+++ b/x" headers in a single scan
+_DIFF_PATH_RE = re.compile(r'diff --git a/\S+ b/(\S+)|^\+\+\+ b/([^\s\n]+)', re.MULTILINE)
+
+# Separator placed between files in the combined review content
+_FILE_CHANGE_SEPARATOR = "\n" + "=" * 50 + "\n\n"
+
+# Per-file patch budget in UTF-8 bytes, to keep prompts within token limits
+_PATCH_BUDGET_BYTES = 8000
+
+# Fixed pieces of the PR review comment
+_REVIEW_HEADER = "## 🔍 **Code Review Results**\n\n"
+_REVIEW_FILE_SEPARATOR = "---\n\n"
+_REVIEW_FOOTER = "Please review the feedback above and address any critical issues before merging."
+
+# Maximum number of formatted reviews kept for re-triggered identical diffs
+_REVIEW_CACHE_SIZE = 256
+
+
+def _get_reviewer_cls():
+    """Import MultiAgentCodeReviewer on first use; returns None if it is unavailable."""
+    global _reviewer_cls, _reviewer_import_failed
+    if _reviewer_cls is None and not _reviewer_import_failed:
+        # Add code_reviewer to path for imports
+        code_reviewer_dir = str(Path(__file__).parent / "code_reviewer")
+        if code_reviewer_dir not in sys.path:
+            sys.path.append(code_reviewer_dir)
+        
+        try:
+            from code_reviewer.multi_agent_reviewer import MultiAgentCodeReviewer
+            _reviewer_cls = MultiAgentCodeReviewer
+        except ImportError as e:
+            logger.warning(f"Could not import code_reviewer modules: {e}")
+            _reviewer_import_failed = True
+    return _reviewer_cls
+
+
+def _line_sort_key(line_num: Any) -> float:
+    """Sort key for issue line numbers; non-numeric values sort last."""
+    if isinstance(line_num, (int, float)):
+        return line_num
+    if isinstance(line_num, str) and line_num.isdigit():
+        return int(line_num)
+    return float('inf')
+
 
 class CodeReviewIntegration:
     """Integrates code review functionality into GitHub PR handling."""
     
-    def __init__(self, use_local_llm: bool = False, creativity_level: float = 0.1):
+    def __init__(self, use_local_llm: bool = False, creativity_level: float = 0.1,
+                 min_agents: Optional[int] = None):
         """
         Initialize the code review integration.
         
         Args:
             use_local_llm: Whether to use local Ollama (True) or Azure OpenAI (False)
             creativity_level: Temperature for AI responses (0.0-1.0)
+            min_agents: Consolidate once this many agents have finished (None waits for all)
         """
         self.use_local_llm = use_local_llm
         self.creativity_level = creativity_level
+        self.min_agents = min_agents
         self.multi_agent_reviewer = None
         
+        # LRU cache of formatted reviews keyed by content hash and reviewer config,
+        # plus the reviews currently running for each key
+        self._review_cache = OrderedDict()
+        self._in_flight_reviews = {}
+        self._review_cache_lock = threading.Lock()
+        
         # Initialize the multi-agent reviewer if available
+        MultiAgentCodeReviewer = _get_reviewer_cls()
         if MultiAgentCodeReviewer:
             try:
                 # Try to initialize with the specified backend
@@ -76,6 +140,66 @@ class CodeReviewIntegration:
         """Check if code review functionality is available."""
         return self.multi_agent_reviewer is not None
     
+    def _review_cache_key(self, content: str, file_path: str) -> str:
+        """Build a cache key from the reviewed content and everything that shapes its review."""
+        reviewer = self.multi_agent_reviewer
+        config = f"{reviewer.is_local}|{reviewer.creativity_level}|{','.join(reviewer.enabled_agents)}|{file_path}"
+        
+        digest = hashlib.blake2b(config.encode('utf-8'), digest_size=16)
+        digest.update(b'\0')
+        digest.update(content.encode('utf-8'))
+        return digest.hexdigest()
+    
+    def _store_cached_review(self, key: str, review: str) -> None:
+        """Remember a formatted review, evicting the least recently used entry when full."""
+        with self._review_cache_lock:
+            self._review_cache[key] = review
+            self._review_cache.move_to_end(key)
+            if len(self._review_cache) > _REVIEW_CACHE_SIZE:
+                self._review_cache.popitem(last=False)
+    
+    async def _review_once(self, key: str,
+                           run_review: Callable[[], Awaitable[Optional[str]]]) -> Optional[str]:
+        """
+        Run a review at most once per key.
+        
+        Finished reviews are served from the cache, and callers that arrive while an identical
+        review is still running (each webhook runs on its own thread and event loop) wait for
+        that review instead of starting another agent fan-out.
+        
+        Args:
+            key: Cache key from _review_cache_key
+            run_review: Coroutine factory that performs the uncached review
+            
+        Returns:
+            Formatted review comment or None if review failed
+        """
+        with self._review_cache_lock:
+            review = self._review_cache.get(key)
+            if review is not None:
+                self._review_cache.move_to_end(key)
+                logger.info("Using cached code review for identical changes")
+                return review
+            
+            in_flight = self._in_flight_reviews.get(key)
+            if in_flight is None:
+                owned = self._in_flight_reviews[key] = concurrent.futures.Future()
+        
+        if in_flight is not None:
+            logger.info("Joining in-flight code review for identical changes")
+            return await asyncio.wrap_future(in_flight)
+        
+        review = None
+        try:
+            review = await run_review()
+            if review is not None:
+                self._store_cached_review(key, review)
+        finally:
+            with self._review_cache_lock:
+                del self._in_flight_reviews[key]
+            owned.set_result(review)
+        return review
+    
     def review_pr_diff(self, diff_content: str, pr_info: Dict[str, Any]) -> Optional[str]:
         """
         Review a PR diff using the multi-agent system.
@@ -87,40 +211,47 @@ class CodeReviewIntegration:
         Returns:
             Formatted review comment or None if review failed
         """
+        return run_sync(self.areview_pr_diff(diff_content, pr_info))
+    
+    async def areview_pr_diff(self, diff_content: str, pr_info: Dict[str, Any]) -> Optional[str]:
+        """Async counterpart of review_pr_diff; agents run concurrently."""
         if not self.is_available():
             logger.warning("Code review functionality not available")
             return None
         
+        logger.info(f"Starting code review for PR #{pr_info.get('number', 'unknown')}")
+        
+        # Identical diffs (re-runs, re-requested reviews, duplicate deliveries) share one review
+        file_path = pr_info.get('title', 'PR Changes')
+        cache_key = self._review_cache_key(diff_content, file_path)
+        return await self._review_once(
+            cache_key, lambda: self._review_diff_uncached(diff_content, pr_info, file_path)
+        )
+    
+    async def _review_diff_uncached(self, diff_content: str, pr_info: Dict[str, Any], file_path: str) -> Optional[str]:
+        """Run the multi-agent review for a diff and format it as a PR comment."""
         try:
-            logger.info(f"Starting code review for PR #{pr_info.get('number', 'unknown')}")
-            
             # Extract file paths directly from the diff content
             extracted_files = self._extract_file_paths_from_diff(diff_content)
-            print(f"🔍 Extracted file paths from diff: {extracted_files}")
-            
-            # Perform multi-agent review
-            consolidated_review = self.multi_agent_reviewer.review_diff(
-                diff_content, 
-                parallel=True
+            logger.debug("Extracted file paths from diff: %s", extracted_files)
+            
+            # Perform multi-agent review; consolidation and the JSON issues
+            # for structured review comments are generated concurrently
+            logger.debug("Generating JSON review comments with file_path: %r", file_path)
+            logger.debug("PR info: %r", pr_info)
+            result = await self.multi_agent_reviewer.areview_code_with_comments(
+                diff_content,
+                file_path,
+                extracted_files,
+                min_agents=self.min_agents
             )
             
-            if not consolidated_review:
+            if not result:
                 logger.error("Failed to get consolidated review")
                 return None
+            _, json_issues = result
             
-            # Generate JSON issues format for structured review comments
-            file_path = pr_info.get('title', 'PR Changes')
-            print(f"🎯 Calling generate_json_review_comments with file_path: '{file_path}'")
-            print(f"📋 PR info: {pr_info}")
-            
-            # Pass the extracted files to the consolidation agent
-            json_issues = self.multi_agent_reviewer.consolidation_agent.generate_json_review_comments(
-                consolidated_review, 
-                file_path,
-                extracted_files
-            )
-            
-            print(f"📄 JSON issues returned from consolidation agent: {json_issues}")
+            logger.debug("JSON issues returned from consolidation agent: %s", json_issues)
             
             # Convert JSON issues to formatted review comment
             formatted_review = self._format_json_issues_for_pr(json_issues, pr_info)
@@ -143,36 +274,45 @@ class CodeReviewIntegration:
         Returns:
             Formatted review comment or None if review failed
         """
+        return run_sync(self.areview_pr_files(files_data, pr_info))
+    
+    async def areview_pr_files(self, files_data: List[Dict[str, Any]], pr_info: Dict[str, Any]) -> Optional[str]:
+        """Async counterpart of review_pr_files; agents run concurrently."""
         if not self.is_available():
             logger.warning("Code review functionality not available")
             return None
         
+        logger.info(f"Starting file-based code review for PR #{pr_info.get('number', 'unknown')}")
+        
+        # Combine all file changes into a single review
+        combined_content = self._combine_file_changes(files_data)
+        
+        if not combined_content:
+            logger.warning("No file changes to review")
+            return None
+        
+        # Identical file sets share one review
+        file_path = f"PR #{pr_info.get('number', 'unknown')} Changes"
+        cache_key = self._review_cache_key(combined_content, file_path)
+        return await self._review_once(
+            cache_key, lambda: self._review_files_uncached(combined_content, pr_info, file_path)
+        )
+    
+    async def _review_files_uncached(self, combined_content: str, pr_info: Dict[str, Any], file_path: str) -> Optional[str]:
+        """Run the multi-agent review for combined file changes and format it as a PR comment."""
         try:
-            logger.info(f"Starting file-based code review for PR #{pr_info.get('number', 'unknown')}")
-            
-            # Combine all file changes into a single review
-            combined_content = self._combine_file_changes(files_data)
-            
-            if not combined_content:
-                logger.warning("No file changes to review")
-                return None
-            
-            # Perform multi-agent review
-            consolidated_review = self.multi_agent_reviewer.review_code(
-                combined_content, 
-                parallel=True
+            # Perform multi-agent review; consolidation and the JSON issues
+            # for structured review comments are generated concurrently
+            result = await self.multi_agent_reviewer.areview_code_with_comments(
+                combined_content,
+                file_path,
+                min_agents=self.min_agents
             )
             
-            if not consolidated_review:
+            if not result:
                 logger.error("Failed to get consolidated review")
                 return None
-            
-            # Generate JSON issues format for structured review comments
-            file_path = f"PR #{pr_info.get('number', 'unknown')} Changes"
-            json_issues = self.multi_agent_reviewer.consolidation_agent.generate_json_review_comments(
-                consolidated_review, 
-                file_path
-            )
+            _, json_issues = result
             
             # Convert JSON issues to formatted review comment
             pr_review = self._format_json_issues_for_pr(json_issues, pr_info)
@@ -194,7 +334,7 @@ class CodeReviewIntegration:
         Returns:
             Combined content string
         """
-        combined_content = "=== PR FILE CHANGES ===\n\n"
+        parts = ["=== PR FILE CHANGES ===\n\n"]
         
         for file_info in files_data:
             filename = file_info.get('filename', 'unknown')
@@ -203,51 +343,39 @@ class CodeReviewIntegration:
             deletions = file_info.get('deletions', 0)
             patch = file_info.get('patch', '')
             
-            combined_content += f"File: {filename}\n"
-            combined_content += f"Status: {status}\n"
-            combined_content += f"Changes: +{additions} -{deletions}\n"
+            parts.append(f"File: {filename}\nStatus: {status}\nChanges: +{additions} -{deletions}\n")
             
             if patch:
-                # Truncate very large patches to avoid token limits
-                if len(patch) > 8000:
-                    patch = patch[:8000] + "\n... (truncated due to size)"
-                combined_content += f"Patch:\n{patch}\n"
-            
-            combined_content += "\n" + "="*50 + "\n\n"
+                # Truncate very large patches to avoid token limits. A UTF-8 character is at
+                # most 4 bytes, so short patches skip the encode entirely.
+                if len(patch) * 4 > _PATCH_BUDGET_BYTES:
+                    patch_bytes = patch.encode('utf-8')
+                    if len(patch_bytes) > _PATCH_BUDGET_BYTES:
+                        patch = patch_bytes[:_PATCH_BUDGET_BYTES].decode('utf-8', errors='ignore') + "\n... (truncated due to size)"
+                parts.append(f"Patch:\n{patch}\n")
+            
+            parts.append(_FILE_CHANGE_SEPARATOR)
         
-        return combined_content
+        return "".join(parts)
     
     def _extract_file_paths_from_diff(self, diff_content: str) -> List[str]:
         """Extract file paths directly from diff content."""
-        import re
-        
-        print("🔍 Extracting file paths directly from diff content")
+        # Cheap substring check before running the regex over the whole diff
+        if not diff_content or ('diff --git' not in diff_content and '+++ b/' not in diff_content):
+            logger.debug("No file paths extracted from diff content")
+            return []
         
-        # Look for diff headers like "diff --git a/file.js b/file.js"
-        diff_pattern = r'diff --git a/([^\s]+) b/([^\s]+)'
-        matches = re.findall(diff_pattern, diff_content)
-        print(f"🎯 Found {len(matches)} diff pattern matches: {matches}")
+        # Collect new paths from "diff --git" and "+++ b/" headers in one pass
+        file_paths = set()
+        for match in _DIFF_PATH_RE.finditer(diff_content):
+            file_paths.add(match.group(1) or match.group(2))
         
-        if matches:
-            # Extract unique file paths
-            file_paths = set()
-            for old_path, new_path in matches:
-                file_paths.add(new_path)  # Use the new path (after changes)
+        if file_paths:
             extracted_files = list(file_paths)
-            print(f"✅ Extracted file paths from diff pattern: {extracted_files}")
+            logger.debug("Extracted file paths from diff: %s", extracted_files)
             return extracted_files
         
-        # Also look for "+++ b/filename" patterns
-        plus_pattern = r'\+\+\+ b/([^\s\n]+)'
-        plus_matches = re.findall(plus_pattern, diff_content)
-        print(f"🎯 Found {len(plus_matches)} plus pattern matches: {plus_matches}")
-        
-        if plus_matches:
-            extracted_files = list(set(plus_matches))
-            print(f"✅ Extracted file paths from plus pattern: {extracted_files}")
-            return extracted_files
-        
-        print("❌ No file paths extracted from diff content")
+        logger.debug("No file paths extracted from diff content")
         return []
     
     def _format_json_issues_for_pr(self, json_issues: str, pr_info: Dict[str, Any]) -> str:
@@ -262,68 +390,57 @@ class CodeReviewIntegration:
             Formatted review comment for PR
         """
         try:
-            import json
-            print(f"🎨 Formatting JSON issues for PR. Input: {json_issues}")
+            logger.debug("Formatting JSON issues for PR. Input: %s", json_issues)
             
-            issues = json.loads(json_issues)
-            print(f"📊 Parsed {len(issues)} issues from JSON")
+            issues = _json_loads(json_issues)
+            logger.debug("Parsed %d issues from JSON", len(issues))
             
             if not issues:
                 return "✅ **No issues found!** The code looks good and follows best practices."
             
-            # Group issues by file
-            issues_by_file = {}
-            for i, issue in enumerate(issues):
+            # Group issues by file, keeping each issue's line sort key alongside it
+            issues_by_file = defaultdict(list)
+            total_issues = 0
+            for issue in issues:
                 file_path = issue.get('file_path', 'unknown')
-                print(f"📁 Issue {i+1} file_path: '{file_path}'")
-                if file_path not in issues_by_file:
-                    issues_by_file[file_path] = []
-                issues_by_file[file_path].append(issue)
-            
-            print(f"🗂️ Grouped issues by file: {list(issues_by_file.keys())}")
+                issues_by_file[file_path].append((_line_sort_key(issue.get('line_number', 'N/A')), issue))
+                total_issues += 1
+            file_count = len(issues_by_file)
             
-            # Sort files alphabetically
-            sorted_files = sorted(issues_by_file.keys())
+            logger.debug("Grouped issues by file: %s", issues_by_file.keys())
             
             # Format the review comment
-            review_comment = "## 🔍 **Code Review Results**\n\n"
+            buf = io.StringIO()
+            buf.write(_REVIEW_HEADER)
             
-            for file_path in sorted_files:
-                file_issues = issues_by_file[file_path]
-                
+            # Files are listed alphabetically; keys are unique so the buckets are never compared
+            for file_path, file_issues in sorted(issues_by_file.items()):
                 # Sort issues by line number within each file
-                def get_line_number(issue):
-                    line_num = issue.get('line_number', 'N/A')
-                    # Handle non-numeric line numbers by putting them at the end
-                    if isinstance(line_num, (int, float)):
-                        return line_num
-                    elif isinstance(line_num, str) and line_num.isdigit():
-                        return int(line_num)
-                    else:
-                        return float('inf')  # Put non-numeric at the end
-                
-                sorted_issues = sorted(file_issues, key=get_line_number)
+                file_issues.sort(key=itemgetter(0))
+                sorted_issues = [issue for _, issue in file_issues]
                 
                 # Add file section header with issue count
-                issue_count = len(sorted_issues)
-                review_comment += f"### 📁 **File: {file_path}** ({issue_count} issue{'s' if issue_count != 1 else ''})\n\n"
+                issue_count = len(file_issues)
+                issue_suffix = '' if issue_count == 1 else 's'
+                buf.write(f"### 📁 **File: {file_path}** ({issue_count} issue{issue_suffix})\n\n")
                 
                 for issue in sorted_issues:
                     line_number = issue.get('line_number', 'N/A')
                     comment = issue.get('review_comment', 'No comment provided')
                     
-                    review_comment += f"**Line {line_number}:** {comment}\n\n"
+                    buf.write(f"**Line {line_number}:** {comment}\n\n")
                 
-                review_comment += "---\n\n"
+                buf.write(_REVIEW_FILE_SEPARATOR)
             
             # Add summary
-            total_issues = len(issues)
-            review_comment += f"**📊 Summary:** Found {total_issues} issue{'s' if total_issues != 1 else ''} across {len(issues_by_file)} file{'s' if len(issues_by_file) != 1 else ''}.\n\n"
-            review_comment += "Please review the feedback above and address any critical issues before merging."
+            issues_suffix = '' if total_issues == 1 else 's'
+            files_suffix = '' if file_count == 1 else 's'
+            buf.write(f"**📊 Summary:** Found {total_issues} issue{issues_suffix} across {file_count} file{files_suffix}.\n\n")
+            buf.write(_REVIEW_FOOTER)
             
-            return review_comment
+            return buf.getvalue()
             
-        except json.JSONDecodeError as e:
+        except (json.JSONDecodeError, ValueError) as e:
             logger.error(f"Failed to parse JSON issues: {e}")
             return f"❌ **Review Error:** Failed to parse review results. Raw output:\n\n```json\n{json_issues}\n```"
         except Exception as e:
@@ -332,27 +449,35 @@ class CodeReviewIntegration:
     
 
 
-def create_code_review_integration(use_local_llm: bool = False) -> CodeReviewIntegration:
+def create_code_review_integration(use_local_llm: bool = False,
+                                   min_agents: Optional[int] = None) -> CodeReviewIntegration:
     """
     Factory function to create a code review integration instance.
     
     Args:
         use_local_llm: Whether to use local Ollama instead of Azure OpenAI
+        min_agents: Consolidate once this many agents have finished (None waits for all)
         
     Returns:
         CodeReviewIntegration instance
     """
-    return CodeReviewIntegration(use_local_llm=use_local_llm)
-
+    return CodeReviewIntegration(use_local_llm=use_local_llm, min_agents=min_agents)
 
-# Global instance for easy access
-_code_review_integration = None
 
+# Cached global instance for easy access
+@functools.lru_cache(maxsize=1)
 def get_code_review_integration() -> Optional[CodeReviewIntegration]:
     """Get the global code review integration instance."""
-    global _code_review_integration
-    if _code_review_integration is None:
-        # Check if we should use local LLM (set via environment variable)
-        use_local = os.getenv('USE_LOCAL_LLM', 'false').lower() == 'true'
-        _code_review_integration = create_code_review_integration(use_local_llm=use_local)
-    return _code_review_integration
+    # Check if we should use local LLM (set via environment variable)
+    use_local = os.getenv('USE_LOCAL_LLM', 'false').lower() == 'true'
+    # Optional agent quorum; unset or 0 waits for every enabled agent
+    min_agents_setting = os.getenv('CODE_REVIEW_MIN_AGENTS') or '0'
+    try:
+        min_agents = int(min_agents_setting) or None
+        if min_agents is not None and min_agents < 0:
+            raise ValueError(min_agents_setting)
+    except ValueError:
+        logger.warning("Ignoring invalid CODE_REVIEW_MIN_AGENTS=%r; waiting for every enabled agent",
+                       min_agents_setting)
+        min_agents = None
+    return create_code_review_integration(use_local_llm=use_local, min_agents=min_agents)
@@ -7,38 +7,41 @@ Multi-agent AI code review system for GitHub PRs
 __version__ = "1.0.0"
 __author__ = "Code Review Team"
 
-# Import main classes for easy access
-try:
-    from .multi_agent_reviewer import MultiAgentCodeReviewer
-    from .consolidation_agent import ConsolidatedReview, ConsolidationAgent
-    from .pr_review_formatter import PRReviewFormatter
-    from .specialized_agents import (
-        SecurityAgent, PerformanceAgent, CodingPracticesAgent,
-        ArchitectureAgent, ReadabilityAgent, TestabilityAgent
-    )
-    from .code_reviewer import CodeReviewer
-    from .llm_manager import get_llm_instance, SandboxInstances
-    
-    __all__ = [
-        'MultiAgentCodeReviewer',
-        'ConsolidatedReview', 
-        'ConsolidationAgent',
-        'PRReviewFormatter',
-        'SecurityAgent',
-        'PerformanceAgent', 
-        'CodingPracticesAgent',
-        'ArchitectureAgent',
-        'ReadabilityAgent',
-        'TestabilityAgent',
-        'CodeReviewer',
-        'get_llm_instance',
-        'SandboxInstances'
-    ]
-    
-except ImportError as e:
-    # Handle import errors gracefully
-    import logging
-    logger = logging.getLogger(__name__)
-    logger.warning(f"Some code_reviewer modules could not be imported: {e}")
+import importlib
+
+# Public names and the submodule that defines each. Submodules are imported lazily
+# on first attribute access (PEP 562) so importing the package stays cheap.
+_LAZY_EXPORTS = {
+    'MultiAgentCodeReviewer': '.multi_agent_reviewer',
+    'ConsolidatedReview': '.consolidation_agent',
+    'ConsolidationAgent': '.consolidation_agent',
+    'PRReviewFormatter': '.pr_review_formatter',
+    'SecurityAgent': '.specialized_agents',
+    'PerformanceAgent': '.specialized_agents',
+    'CodingPracticesAgent': '.specialized_agents',
+    'ArchitectureAgent': '.specialized_agents',
+    'ReadabilityAgent': '.specialized_agents',
+    'TestabilityAgent': '.specialized_agents',
+    'CodeReviewer': '.code_reviewer',
+    'get_llm_instance': '.llm_manager',
+    'SandboxInstances': '.llm_manager',
+    'LLMCache': '.llm_cache',
+    'BatchProcessor': '.batch_consolidator',
+}
+
+__all__ = list(_LAZY_EXPORTS)
+
+
+def __getattr__(name):
+    """Import public classes from their submodule on first access."""
+    module_name = _LAZY_EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
     
-    __all__ = []
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
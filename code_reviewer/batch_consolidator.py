@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Batch Consolidator - Submits many chat completions through the Azure OpenAI Batch API.
+"""
+
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional
+
+import requests
+
+from .util.llm import AzureClient, http_session
+
+logger = logging.getLogger(__name__)
+
+BATCH_API_VERSION = "2024-10-21"
+BATCH_COMPLETION_WINDOW = "24h"
+_BATCH_TERMINAL_STATES = ("completed", "failed", "expired", "cancelled")
+
+
+class BatchProcessor:
+    """
+    Runs a list of chat completion requests as one asynchronous batch job.
+
+    Batch jobs are billed at a discount and do not count against the real-time
+    rate limits, at the cost of up to a day of latency, which suits nightly CI
+    runs over many PRs. Batch jobs only run on a Global-Batch deployment, so
+    one must be given or set in AZURE_BATCH_DEPLOYMENT_NAME. Without one, and
+    for clients without a batch endpoint (Ollama) or with use_batch_api=False,
+    the requests run directly on a small thread pool.
+    """
+
+    def __init__(self, llm_client: Any, use_batch_api: bool = True,
+                 deployment_name: Optional[str] = None, api_version: str = BATCH_API_VERSION,
+                 poll_interval: float = 60.0, timeout: float = 24 * 3600, max_workers: int = 4):
+        """
+        Initialize the batch processor.
+
+        Args:
+            llm_client: AzureClient or OllamaClient, optionally wrapped in a CachedLLMClient
+            use_batch_api: Whether to use the Batch API when the client supports it
+            deployment_name: Azure OpenAI Global-Batch deployment to run the requests on
+                (default: AZURE_BATCH_DEPLOYMENT_NAME)
+            api_version: API version for the files and batches endpoints
+            poll_interval: Seconds between batch status checks
+            timeout: Seconds to wait for the batch before giving up
+            max_workers: Concurrent requests when running without the Batch API
+        """
+        self.llm_client = llm_client
+        self.deployment_name = deployment_name or os.getenv('AZURE_BATCH_DEPLOYMENT_NAME')
+        self.api_version = api_version
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.max_workers = max_workers
+
+        # The batch endpoints need the raw Azure client for its endpoint and token
+        self._azure_client = getattr(llm_client, 'client', llm_client)
+        self.use_batch_api = (use_batch_api and isinstance(self._azure_client, AzureClient)
+                              and bool(self._azure_client.azure_endpoint))
+        if self.use_batch_api and not self.deployment_name:
+            # A standard deployment rejects batch jobs, so there is no sensible default
+            logger.warning("No Global-Batch deployment configured (AZURE_BATCH_DEPLOYMENT_NAME); "
+                           "running the requests directly")
+            self.use_batch_api = False
+
+    def run(self, message_lists: List[List[Dict[str, str]]], temperature: float = 0.1,
+            max_tokens: int = 2000) -> List[Optional[str]]:
+        """
+        Run one chat completion per message list.
+
+        Args:
+            message_lists: Chat messages for each request
+            temperature: Temperature for every request
+            max_tokens: Maximum tokens in each response
+
+        Returns:
+            Response contents in request order, None where a request failed
+        """
+        if not message_lists:
+            return []
+
+        if self.use_batch_api:
+            try:
+                return self._run_batch(message_lists, temperature, max_tokens)
+            except Exception as e:
+                logger.error(f"Batch API run failed, falling back to direct requests: {e}")
+
+        return self._run_direct(message_lists, temperature, max_tokens)
+
+    def _run_direct(self, message_lists: List[List[Dict[str, str]]], temperature: float,
+                    max_tokens: int) -> List[Optional[str]]:
+        """Run the requests against the real-time endpoint."""
+        def complete(messages: List[Dict[str, str]]) -> Optional[str]:
+            return self.llm_client.chat_completion(messages=messages, temperature=temperature, max_tokens=max_tokens)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(complete, message_lists))
+
+    def _run_batch(self, message_lists: List[List[Dict[str, str]]], temperature: float,
+                   max_tokens: int) -> List[Optional[str]]:
+        """Upload the requests as JSONL, wait for the batch job and collect its output."""
+        lines = []
+        for index, messages in enumerate(message_lists):
+            lines.append(json.dumps({
+                "custom_id": f"request-{index}",
+                "method": "POST",
+                "url": "/chat/completions",
+                "body": {
+                    "model": self.deployment_name,
+                    "messages": messages,
+                    "max_tokens": max_tokens,
+                    "temperature": temperature
+                }
+            }, ensure_ascii=False))
+        batch_input = ("\n".join(lines) + "\n").encode('utf-8')
+
+        input_file = self._request(
+            "POST", "files",
+            files={"file": ("batch_input.jsonl", batch_input, "application/jsonl")},
+            data={"purpose": "batch"}
+        ).json()
+
+        batch = self._request("POST", "batches", json={
+            "input_file_id": input_file["id"],
+            "endpoint": "/chat/completions",
+            "completion_window": BATCH_COMPLETION_WINDOW
+        }).json()
+        logger.info(f"Submitted batch {batch['id']} with {len(message_lists)} requests")
+
+        deadline = time.monotonic() + self.timeout
+        while batch.get("status") not in _BATCH_TERMINAL_STATES:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Batch {batch['id']} did not finish within {self.timeout} seconds")
+            time.sleep(self.poll_interval)
+            batch = self._request("GET", f"batches/{batch['id']}").json()
+
+        if batch["status"] != "completed" or not batch.get("output_file_id"):
+            raise RuntimeError(f"Batch {batch['id']} ended with status '{batch['status']}'")
+
+        output = self._request("GET", f"files/{batch['output_file_id']}/content").text
+
+        results: List[Optional[str]] = [None] * len(message_lists)
+        for line in output.splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            index = int(record["custom_id"].rsplit("-", 1)[1])
+            response = record.get("response") or {}
+            if response.get("status_code") != 200:
+                logger.warning(f"Batch request {record['custom_id']} failed: {record.get('error')}")
+                continue
+            results[index] = response["body"]["choices"][0]["message"]["content"].strip()
+
+        return results
+
+    def _request(self, method: str, path: str, **kwargs) -> "requests.Response":
+        """Call an Azure OpenAI data-plane endpoint, refreshing the token once on 401."""
+        client = self._azure_client
+        url = f"{client.azure_endpoint.rstrip('/')}/openai/{path}?api-version={self.api_version}"
+
+        response = http_session.request(method, url, headers={"Authorization": f"Bearer {client._access_token}"},
+                                        timeout=300, **kwargs)
+        if response.status_code == 401:
+            logger.info("Token expired, refreshing...")
+            client._refresh_token()
+            response = http_session.request(method, url, headers={"Authorization": f"Bearer {client._access_token}"},
+                                            timeout=300, **kwargs)
+
+        response.raise_for_status()
+        return response
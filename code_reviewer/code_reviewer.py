@@ -3,235 +3,1326 @@
 Code Review Bot - A Python application that provides code reviews using a local AI model.
 """
 
-import requests
+import ast
+import asyncio
+import codecs
+import functools
+import hashlib
+import io
+import math
 import json
+import re
+import sqlite3
 import sys
 import os
-from typing import Optional, Dict, Any
+import threading
+import time
+import tokenize
+from collections import OrderedDict
 from pathlib import Path
+from typing import Callable, Optional, Dict, Any, List, Tuple
+
+# Prefer orjson for parsing the streamed NDJSON chunks and serializing payloads when it is installed
+try:
+    import orjson
+    _json_loads = orjson.loads
+    _json_dumps_bytes = orjson.dumps
+except ImportError:
+    _json_loads = json.loads
+    
+    def _json_dumps_bytes(obj: Any) -> bytes:
+        return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+# requests is imported when the first HTTP session is created so importing this module stays cheap
+requests = None
+
+REVIEW_TYPES = ("general", "security", "performance", "modern")
+
+_JSON_HEADERS = {'Content-Type': 'application/json'}
+
+# (connect, read) timeouts in seconds: fail fast when the model server is unreachable,
+# but give slow generations the same read budget as before
+_HTTP_TIMEOUT = (10, 180)
+
+# Context windows chosen from the prompt size are rounded up to one of these, so
+# Ollama does not reload the model for every slightly different num_ctx
+_NUM_CTX_BUCKETS = (1024, 2048, 4096, 8192)
+
+# Tokens kept free for the prompt template overhead when checking whether a prompt fits
+_CONTEXT_SAFETY_MARGIN = 64
+_CONTEXT_TRUNCATION_NOTE = "\n# ...truncated to fit the model's context window"
+
+# Streamed tokens are written to the terminal once this many characters are pending
+_STREAM_WRITE_CHARS = 256
+
+# Most streamed lines look like {"model":...,"response":"<token>","done":false}; when
+# enabled, the token is sliced straight out of the bytes and only other frames are parsed
+_FAST_PARSE = True
+_RESPONSE_KEY = b'"response":"'
+_DONE_TRUE = b'"done":true'
+_JSON_ESCAPE_RE = re.compile(r'\\(u[0-9a-fA-F]{4}|.)')
+_JSON_ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', '"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f'}
+
+# Delimiters used to demultiplex several reviews out of one batched response
+_BATCH_REVIEW_RE = re.compile(r'<<<REVIEW (\d+)>>>')
+_BATCH_END = '<<<END>>>'
+# Files of a --file glob up to this size are reviewed several to a prompt
+_BATCH_FILE_MAX_CHARS = 3000
+_BATCH_FILE_COUNT = 8
+
+# Section headers separating review types in one multiplexed response, e.g. "### SECURITY ###"
+_MULTI_SECTION_RE = re.compile(r'^[ \t]*###[ \t]*(\w+)[ \t]*###[ \t]*$', re.MULTILINE)
+
+# Zero-width split points in front of every file header and hunk header of a unified diff
+_DIFF_SECTION_RE = re.compile(r'^(?=diff --git |@@ )', re.MULTILINE)
+_DIFF_FILE_RE = re.compile(r'diff --git a/\S+ b/(\S+)')
+_TRAILING_WHITESPACE_RE = re.compile(r'[ \t]+$', re.MULTILINE)
+_BLANK_LINES_RE = re.compile(r'\n{2,}')
+
+_EMBED_CACHE_SIZE = 1024
+_SIMILAR_HUNK_THRESHOLD = 0.98
+
+# Files larger than this are truncated before review; the model cannot use more context anyway
+MAX_REVIEW_BYTES = 200_000
+MAX_REVIEW_CHARS = 200_000
+_EMPTY_FILE_REVIEW = "No code to review: the file is empty."
+
+# Review types whose answer does not depend on comments, so Python comments are dropped from the prompt
+_COMMENT_FREE_REVIEW_TYPES = frozenset({"security", "performance"})
+_EXTRA_BLANK_LINES_RE = re.compile(r'\n{3,}')
+
+# Finished reviews are kept on disk so re-running on unchanged code skips the model entirely
+REVIEW_CACHE_PATH = os.path.join(os.path.expanduser('~/.cache/code_reviewer'), 'reviews.sqlite3')
+_REVIEW_CACHE_TTL_SECONDS = 7 * 86400
+
+
+def _unescape_json_char(match: "re.Match") -> str:
+    """Decode one JSON string escape sequence (surrogates are left to the full parser)."""
+    escape = match.group(1)
+    if len(escape) == 1:
+        return _JSON_ESCAPES[escape]
+    code_point = int(escape[1:], 16)
+    if 0xD800 <= code_point <= 0xDFFF:
+        raise ValueError("surrogate escape")
+    return chr(code_point)
+
+
+def _fast_extract_response(line: bytes) -> Tuple[Optional[str], bool]:
+    """
+    Extract the token from a streamed Ollama line without a full JSON parse.
+    
+    Args:
+        line: One NDJSON line from the streaming response
+        
+    Returns:
+        Tuple of (response text, done flag). The text is None when the line does
+        not have the usual shape and must be parsed as JSON instead.
+    """
+    start = line.find(_RESPONSE_KEY)
+    if start == -1:
+        return None, False
+    start += len(_RESPONSE_KEY)
+    
+    # Find the closing quote, skipping quotes escaped by an odd number of backslashes
+    end = line.find(b'"', start)
+    while end != -1:
+        backslashes = 0
+        while line[end - 1 - backslashes] == 0x5C:
+            backslashes += 1
+        if backslashes % 2 == 0:
+            break
+        end = line.find(b'"', end + 1)
+    if end == -1:
+        return None, False
+    
+    try:
+        text = line[start:end].decode('utf-8')
+        if '\\' in text:
+            text = _JSON_ESCAPE_RE.sub(_unescape_json_char, text)
+    except (UnicodeDecodeError, KeyError, ValueError):
+        return None, False
+    return text, _DONE_TRUE in line[end:]
+
+
+def _parse_stream_line(line: bytes) -> Tuple[Optional[str], bool]:
+    """
+    Parse one streamed NDJSON line.
+    
+    Args:
+        line: One NDJSON line from the streaming response
+        
+    Returns:
+        Tuple of (response text or None if the line carries none, done flag)
+    """
+    if _FAST_PARSE:
+        text, done = _fast_extract_response(line)
+        if text is not None:
+            return text, done
+    try:
+        chunk = _json_loads(line)
+    except json.JSONDecodeError:
+        return None, False
+    if not isinstance(chunk, dict):
+        return None, False
+    return chunk.get('response'), chunk.get('done', False)
+
+
+@functools.lru_cache(maxsize=1)
+def _get_tokenizer():
+    """Load a tiktoken encoding for token estimates, or None when tiktoken is not available."""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding('cl100k_base')
+    except (ImportError, OSError, ValueError):
+        return None
+
+
+def _estimate_tokens(text: str) -> int:
+    """
+    Estimate how many tokens a text takes up in the model's context.
+    
+    Uses tiktoken when installed (close enough for Llama-family tokenizers) and
+    otherwise the usual four-characters-per-token rule of thumb.
+    
+    Args:
+        text: The text to measure
+        
+    Returns:
+        Estimated token count
+    """
+    tokenizer = _get_tokenizer()
+    if tokenizer is not None:
+        return len(tokenizer.encode(text, disallowed_special=()))
+    return len(text) // 4
+
+
+def _import_requests():
+    """Import requests on first use and bind it to the module global."""
+    global requests
+    if requests is None:
+        import requests as requests_module
+        requests = requests_module
+    return requests
+
+
+def read_review_source(file_path: str) -> Tuple[str, int]:
+    """
+    Read at most MAX_REVIEW_BYTES of a source file and decode it once.
+    
+    The size is checked first so oversized files are never loaded whole; they
+    are cut after the last complete line, or at a character boundary when the
+    kept bytes contain no newline. Undecodable bytes are replaced rather than
+    failing the review.
+    
+    Args:
+        file_path: Path to the file to read
+        
+    Returns:
+        The decoded content and the file's full size in bytes
+        
+    Raises:
+        OSError: If the file cannot be read
+    """
+    size = os.stat(file_path).st_size
+    with open(file_path, 'rb') as file:
+        data = file.read(MAX_REVIEW_BYTES)
+    if size <= MAX_REVIEW_BYTES:
+        return data.decode('utf-8', errors='replace'), size
+    
+    line_end = data.rfind(b'\n')
+    if line_end >= 0:
+        return data[:line_end + 1].decode('utf-8', errors='replace'), size
+    # A non-final decode holds back a multibyte character split by the cut
+    return codecs.getincrementaldecoder('utf-8')(errors='replace').decode(data, final=False), size
+
+
+def _read_code_file(file_path: str) -> str:
+    """
+    Read a source file for review.
+    
+    Files over MAX_REVIEW_BYTES are truncated (see read_review_source) with a
+    note for the model.
+    
+    Args:
+        file_path: Path to the file to read
+        
+    Returns:
+        The decoded file content ('' for an empty file)
+        
+    Raises:
+        OSError: If the file cannot be read
+    """
+    code, size = read_review_source(file_path)
+    if size <= MAX_REVIEW_BYTES:
+        return code
+    
+    print(f"⚠️  '{file_path}' is {size} bytes; reviewing only the first {MAX_REVIEW_BYTES}")
+    return f"# NOTE: file truncated to its first {MAX_REVIEW_BYTES} of {size} bytes\n{code}"
+
+
+def _strip_python_comments(code: str) -> str:
+    """Remove comments from Python source, leaving other code untouched; non-Python input is returned as is."""
+    try:
+        ast.parse(code)
+        comments = [
+            token.start for token in tokenize.generate_tokens(io.StringIO(code).readline)
+            if token.type == tokenize.COMMENT
+        ]
+    except (SyntaxError, ValueError, tokenize.TokenError):
+        return code
+    if not comments:
+        return code
+    
+    lines = code.split('\n')
+    for row, col in comments:
+        lines[row - 1] = lines[row - 1][:col].rstrip()
+    return '\n'.join(lines)
+
+
+def _normalize_code(code: str, review_type: str) -> str:
+    """
+    Trim code before it is put in a prompt so the model does not prefill wasted tokens.
+    
+    Drops a BOM, trailing whitespace and runs of blank lines, removes Python
+    comments for review types that do not need them, and truncates very large
+    input to MAX_REVIEW_CHARS.
+    
+    Args:
+        code: The code to review
+        review_type: Type of review to perform
+        
+    Returns:
+        The normalized code
+    """
+    code = _TRAILING_WHITESPACE_RE.sub('', code.lstrip('\ufeff'))
+    if review_type in _COMMENT_FREE_REVIEW_TYPES:
+        code = _strip_python_comments(code)
+    code = _EXTRA_BLANK_LINES_RE.sub('\n\n', code).strip('\n')
+    if len(code) > MAX_REVIEW_CHARS:
+        code = code[:MAX_REVIEW_CHARS] + '\n# ...truncated'
+    return code
+
+
+def _split_diff_sections(diff_content: str) -> List[str]:
+    """Split a unified diff into file-header and hunk sections, preserving every character."""
+    return [section for section in _DIFF_SECTION_RE.split(diff_content) if section]
+
+
+def _dedupe_diff(diff_content: str) -> Tuple[str, Dict[str, List[str]]]:
+    """
+    Collapse hunks whose changes are identical to an earlier hunk in the diff.
+    
+    Hunks are compared on their body with trailing whitespace and blank-line
+    runs canonicalized; the @@ header is ignored because line numbers differ.
+    The kept hunk is annotated with its occurrence count.
+    
+    Args:
+        diff_content: The diff content to review
+        
+    Returns:
+        Tuple of (deduplicated diff, collapse map). The collapse map maps the
+        location ("path @@ header") of each kept hunk to the locations of the
+        hunks collapsed into it, so a review can be mapped back to every file.
+    """
+    sections = _split_diff_sections(diff_content)
+    seen: Dict[bytes, int] = {}
+    counts: Dict[int, int] = {}
+    collapse_map: Dict[str, List[str]] = {}
+    locations: Dict[int, str] = {}
+    kept: List[Optional[str]] = []
+    current_file = ""
+    
+    for section in sections:
+        if not section.startswith('@@ '):
+            match = _DIFF_FILE_RE.match(section)
+            if match:
+                current_file = match.group(1)
+            kept.append(section)
+            continue
+        
+        header, _, body = section.partition('\n')
+        canonical = _BLANK_LINES_RE.sub('\n', _TRAILING_WHITESPACE_RE.sub('', body))
+        digest = hashlib.blake2b(canonical.encode('utf-8'), digest_size=16).digest()
+        location = f"{current_file} {header.strip()}".strip()
+        
+        first = seen.get(digest)
+        if first is None:
+            seen[digest] = len(kept)
+            counts[len(kept)] = 1
+            locations[len(kept)] = location
+            kept.append(section)
+        else:
+            counts[first] += 1
+            collapse_map.setdefault(locations[first], []).append(location)
+    
+    duplicates = sum(counts.values()) - len(counts)
+    if not duplicates:
+        return diff_content, {}
+    
+    for index, count in counts.items():
+        if count > 1:
+            header, newline, body = kept[index].partition('\n')
+            kept[index] = f"{header} (x{count} occurrences){newline}{body}"
+    return f"# NOTE: {duplicates} duplicate hunks collapsed\n" + ''.join(kept), collapse_map
+
+
+def _format_collapse_map(collapse_map: Dict[str, List[str]]) -> str:
+    """Review footer listing, for each reviewed hunk, the identical hunks collapsed into it."""
+    lines = ["Identical hunks (findings on a hunk also apply to the locations after it):"]
+    lines.extend(f"- {location} -> {', '.join(duplicates)}" for location, duplicates in collapse_map.items())
+    return '\n'.join(lines)
+
+
+def _hunk_locations(sections: List[str]) -> Dict[int, str]:
+    """Location ("path @@ header") of every hunk section, keyed by section index."""
+    locations: Dict[int, str] = {}
+    current_file = ""
+    for index, section in enumerate(sections):
+        if section.startswith('@@ '):
+            header = section.partition('\n')[0]
+            locations[index] = f"{current_file} {header.strip()}".strip()
+        else:
+            match = _DIFF_FILE_RE.match(section)
+            if match:
+                current_file = match.group(1)
+    return locations
+
+
+def _cosine_similarity(a: List[float], b: List[float]) -> float:
+    """Cosine similarity of two embedding vectors."""
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class _RateLimiter:
+    """Token bucket that lets at most `rate` requests start per second, on average, across threads."""
+    
+    def __init__(self, rate: float):
+        """
+        Create a rate limiter.
+        
+        Args:
+            rate: Requests allowed per second
+        """
+        self.rate = rate
+        self.tokens = 1.0
+        self.last = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self) -> None:
+        """Block until a request may start; waiting callers are let through one at a time."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(1.0, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            if self.tokens < 1:
+                time.sleep((1 - self.tokens) / self.rate)
+                self.tokens, self.last = 1.0, time.monotonic()
+            self.tokens -= 1
+
+
+class _ReviewCache:
+    """Small SQLite-backed key/value store for finished reviews, shared safely between threads."""
+    
+    def __init__(self, path: str = REVIEW_CACHE_PATH, ttl_seconds: int = _REVIEW_CACHE_TTL_SECONDS):
+        """
+        Open (or create) the review cache.
+        
+        Args:
+            path: Location of the SQLite database file
+            ttl_seconds: How long a cached review stays valid
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS reviews (key TEXT PRIMARY KEY, review TEXT NOT NULL, created REAL NOT NULL)"
+        )
+        self._conn.commit()
+    
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached review for key, or None if missing or expired."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT review FROM reviews WHERE key = ? AND created >= ?",
+                (key, time.time() - self.ttl_seconds)
+            ).fetchone()
+        return row[0] if row else None
+    
+    def set(self, key: str, review: str) -> None:
+        """Store a finished review under key."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO reviews (key, review, created) VALUES (?, ?, ?)",
+                (key, review, time.time())
+            )
+            self._conn.commit()
+    
+    def clear(self) -> None:
+        """Remove every cached review."""
+        with self._lock:
+            self._conn.execute("DELETE FROM reviews")
+            self._conn.commit()
+    
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
 
 
 class CodeReviewer:
-    def __init__(self, model_url: str = "http://localhost:11434/api/generate", model_name: str = "llama3.2"):
+    # Review prompt templates, formatted with the code under review
+    _PROMPTS_MINIMAL = {
+        "general": """Code review - be concise and actionable:
+
+Code:
+```
+{code}
+```
+
+Provide only:
+- 3 most critical issues
+- Quick fixes (1-2 lines each)
+- No explanations, just solutions""",
+
+        "security": """Security review - be brief:
+
+Code:
+```
+{code}
+```
+
+List only:
+- Critical vulnerabilities found
+- One-line fix for each
+- Risk level (High/Medium/Low)""",
+
+        "performance": """Performance review - quick summary:
+
+Code:
+```
+{code}
+```
+
+Provide:
+- 2-3 main bottlenecks
+- Simple optimization fixes
+- Expected impact""",
+
+        "modern": """Modernization - essential changes:
+
+Code:
+```
+{code}
+```
+
+Show:
+- Replace old syntax with modern equivalent
+- Most important upgrades only
+- Before/after code snippets (brief)"""
+    }
+    
+    _PROMPTS_FULL = {
+        "general": """Please provide a comprehensive code review for the following code. Include:
+1. Code quality issues
+2. Potential bugs or security vulnerabilities
+3. Performance improvements
+4. Best practices recommendations
+5. Refactoring suggestions
+
+Code to review:
+```
+{code}
+```
+
+Please provide detailed feedback with explanations and examples where applicable.""",
+
+        "security": """Please perform a security-focused code review for the following code. Look for:
+1. Security vulnerabilities (XSS, SQL injection, etc.)
+2. Input validation issues
+3. Authentication/authorization problems
+4. Data exposure risks
+5. Secure coding practices
+
+Code to review:
+```
+{code}
+```
+
+Provide specific security recommendations and fixes.""",
+
+        "performance": """Please perform a performance-focused code review for the following code. Analyze:
+1. Time complexity issues
+2. Memory usage optimization
+3. Algorithm efficiency
+4. Resource management
+5. Scalability concerns
+
+Code to review:
+```
+{code}
+```
+
+Suggest specific performance improvements with examples.""",
+
+        "modern": """Please suggest modern improvements for the following code. Focus on:
+1. Modern language features and syntax
+2. Best practices and conventions
+3. Code readability and maintainability
+4. Updated patterns and approaches
+5. Framework/library recommendations
+
+Code to review:
+```
+{code}
+```
+
+Provide modernized code examples and explanations."""
+    }
+    
+    _DIFF_PROMPT_MINIMAL = """Diff review - brief summary:
+
+Diff:
+```
+{diff}
+```
+
+Provide only:
+- Main issues found
+- Critical fixes needed
+- Approval status (Approve/Request Changes)"""
+    
+    _DIFF_PROMPT_FULL = """Please review the following code changes/diff. Focus on:
+1. Quality of the changes
+2. Potential issues introduced
+3. Best practices compliance
+4. Impact on existing code
+5. Suggestions for improvement
+
+Diff to review:
+```
+{diff}
+```
+
+Provide specific feedback on the changes."""
+    
+    def __init__(self, model_url: str = "http://localhost:11434/api/generate", model_name: str = "llama3.2",
+                 embed_model: Optional[str] = None, use_cache: bool = True, cache_stream: bool = False,
+                 keep_alive: str = "30m", num_ctx: Optional[int] = None, num_predict: int = 1024,
+                 max_concurrency: Optional[int] = None, rate_per_min: Optional[float] = None):
+        """
+        Initialize the Code Reviewer.
+        
+        Args:
+            model_url: URL of the local AI model API
+            model_name: Name of the model to use
+            embed_model: Embedding model used to collapse near-duplicate diff hunks (disabled when None)
+            use_cache: Whether to reuse reviews of identical code from the on-disk cache
+            cache_stream: Whether streamed reviews are also served from and stored in the cache
+            keep_alive: How long Ollama keeps the model loaded after a request
+            num_ctx: Context window to request; sized from each prompt when None
+            num_predict: Maximum number of tokens to generate per review
+            max_concurrency: Maximum requests in flight at once, from any thread or async review
+                (default: OLLAMA_NUM_PARALLEL or 4)
+            rate_per_min: Maximum requests started per minute (unlimited when None)
+        """
+        self.model_url = model_url
+        self.model_name = model_name
+        self.keep_alive = keep_alive
+        self.num_ctx = num_ctx
+        self.num_predict = num_predict
+        self.max_concurrency = max_concurrency or int(os.getenv('OLLAMA_NUM_PARALLEL', '4'))
+        self.rate_per_min = rate_per_min
+        # Every model request takes a slot, whether it comes from a thread pool, an event loop or the caller
+        self._request_slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._rate_limiter = _RateLimiter(rate_per_min / 60) if rate_per_min else None
+        # Serialized once; only the per-request fields are appended in _build_payload_bytes
+        self._payload_prefix = _json_dumps_bytes({"model": model_name, "keep_alive": keep_alive})[:-1]
+        self.embed_model = embed_model
+        self.use_cache = use_cache
+        self.cache_stream = cache_stream
+        self.base_url = model_url.split('/api/', 1)[0]
+        self._embedding_cache: "OrderedDict[Tuple[str, bytes], List[float]]" = OrderedDict()
+        self._session = None
+        self._session_lock = threading.Lock()
+        self._review_cache: Optional[_ReviewCache] = None
+    
+    @property
+    def session(self):
+        """Keep-alive HTTP session shared by every request to the model server, created on first use."""
+        if self._session is None:
+            # File reviews run on a thread pool; only the first of them may create the session
+            with self._session_lock:
+                if self._session is None:
+                    requests = _import_requests()
+                    session = requests.Session()
+                    adapter = requests.adapters.HTTPAdapter(pool_connections=10, pool_maxsize=10, max_retries=0)
+                    session.mount('http://', adapter)
+                    session.mount('https://', adapter)
+                    # Compressed bodies are decoded transparently, including streamed ones,
+                    # so a gzip-enabled reverse proxy in front of Ollama can shrink long reviews
+                    session.headers.update({'Connection': 'keep-alive', 'Accept-Encoding': 'gzip, deflate'})
+                    self._session = session
+        return self._session
+    
+    def close(self) -> None:
+        """Release the pooled HTTP connections and the review cache."""
+        with self._session_lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+        if self._review_cache is not None:
+            self._review_cache.close()
+            self._review_cache = None
+    
+    @property
+    def review_cache(self) -> Optional[_ReviewCache]:
+        """On-disk review cache, opened on first use; None when caching is disabled or unavailable."""
+        if self.use_cache and self._review_cache is None:
+            try:
+                self._review_cache = _ReviewCache()
+            except (OSError, sqlite3.Error) as e:
+                print(f"⚠️  Review cache unavailable, continuing without it: {e}")
+                self.use_cache = False
+        return self._review_cache
+    
+    def _review_cache_key(self, code: str, review_type: str, minimal: bool) -> str:
+        """Cache key for a review of code with the current model and settings."""
+        digest = hashlib.sha256(code.encode('utf-8', 'ignore')).hexdigest()
+        return f"{self.model_name}:{review_type}:{int(minimal)}:{digest}"
+    
+    def _get_cached_review(self, code: str, review_type: str, minimal: bool) -> Optional[str]:
+        """Return a cached review of code, or None on a miss or when caching is disabled."""
+        cache = self.review_cache
+        if cache is None:
+            return None
+        try:
+            return cache.get(self._review_cache_key(code, review_type, minimal))
+        except sqlite3.Error:
+            return None
+    
+    def _store_cached_review(self, code: str, review_type: str, minimal: bool, review: Optional[str]) -> None:
+        """Store a successful review in the cache."""
+        cache = self.review_cache
+        if cache is None or not review:
+            return
+        try:
+            cache.set(self._review_cache_key(code, review_type, minimal), review)
+        except sqlite3.Error as e:
+            print(f"⚠️  Could not store review in cache: {e}")
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        
+    def _context_size(self, prompt: str) -> int:
+        """
+        Context window to request for a prompt.
+        
+        Without an explicit num_ctx the window is sized from the prompt (about
+        three characters per token) plus the generation budget, so small
+        reviews do not reserve an oversized KV cache.
+        
+        Args:
+            prompt: The prompt to send to the AI model
+            
+        Returns:
+            The num_ctx option for the request
+        """
+        if self.num_ctx:
+            return self.num_ctx
+        needed = len(prompt) // 3 + self.num_predict
+        for size in _NUM_CTX_BUCKETS:
+            if needed <= size:
+                return size
+        return _NUM_CTX_BUCKETS[-1]
+    
+    def _build_payload_bytes(self, prompt: str, stream: bool) -> bytes:
+        """
+        Serialize a /api/generate request body.
+        
+        Args:
+            prompt: The prompt to send to the AI model
+            stream: Whether to request a streaming response
+            
+        Returns:
+            The JSON request body
+        """
+        options = b',"options":{"num_ctx":%d,"num_predict":%d}' % (self._context_size(prompt), self.num_predict)
+        return b''.join((
+            self._payload_prefix,
+            b',"stream":true' if stream else b',"stream":false',
+            options,
+            b',"prompt":',
+            _json_dumps_bytes(prompt),
+            b'}'
+        ))
+    
+    def _make_api_request(self, prompt: str, stream: bool = True) -> Optional[str]:
+        """
+        Make a request to the local AI model with streaming support.
+        
+        At most max_concurrency requests are in flight and, when rate_per_min is
+        set, request starts are spaced out so Ollama's queue does not thrash.
+        
+        Args:
+            prompt: The prompt to send to the AI model
+            stream: Whether to use streaming output
+            
+        Returns:
+            The AI model's response or None if request failed
+        """
+        with self._request_slots:
+            if self._rate_limiter:
+                self._rate_limiter.acquire()
+            return self._send_request(prompt, stream)
+    
+    def _send_request(self, prompt: str, stream: bool) -> Optional[str]:
+        """Send one request to the AI model; see _make_api_request."""
+        payload = self._build_payload_bytes(prompt, stream)
+        session = self.session
+        
+        try:
+            if stream:
+                return self._handle_streaming_response(payload)
+            else:
+                response = session.post(self.model_url, data=payload, headers=_JSON_HEADERS, timeout=_HTTP_TIMEOUT)
+                response.raise_for_status()
+                
+                result = _json_loads(response.content)
+                return result.get("response", "").strip()
+            
+        except requests.exceptions.RequestException as e:
+            print(f"Error connecting to AI model: {e}")
+            return None
+        except json.JSONDecodeError as e:
+            print(f"Error parsing AI model response: {e}")
+            return None
+    
+    def _handle_streaming_response(self, payload: bytes) -> Optional[str]:
+        """
+        Handle streaming response from Ollama.
+        
+        Args:
+            payload: The serialized request payload
+            
+        Returns:
+            Complete response text or None if failed
+        """
+        session = self.session
+        try:
+            print("🔄 Connecting to Ollama for streaming response...")
+            response = session.post(
+                self.model_url, 
+                data=payload, 
+                headers=_JSON_HEADERS,
+                timeout=_HTTP_TIMEOUT,
+                stream=True
+            )
+            response.raise_for_status()
+            
+            print("\n" + "="*80)
+            print("📋 CODE REVIEW RESULTS (Streaming)")
+            print("="*80)
+            
+            parts = []
+            pending = []
+            pending_len = 0
+            buffer = bytearray()
+            done = False
+            
+            # Split the raw byte stream on newlines ourselves and parse each NDJSON line from bytes
+            for data in response.iter_content(chunk_size=8192):
+                buffer += data
+                while not done:
+                    newline = buffer.find(b'\n')
+                    if newline == -1:
+                        break
+                    line = bytes(buffer[:newline])
+                    del buffer[:newline + 1]
+                    if not line:
+                        continue
+                    
+                    chunk_text, done = _parse_stream_line(line)
+                    if chunk_text:
+                        parts.append(chunk_text)
+                        pending.append(chunk_text)
+                        pending_len += len(chunk_text)
+                        if pending_len >= _STREAM_WRITE_CHARS:
+                            sys.stdout.write(''.join(pending))
+                            sys.stdout.flush()
+                            pending.clear()
+                            pending_len = 0
+                if done:
+                    break
+            
+            # The last line may arrive without a trailing newline
+            if not done and buffer.strip():
+                chunk_text, done = _parse_stream_line(bytes(buffer))
+                if chunk_text:
+                    parts.append(chunk_text)
+                    pending.append(chunk_text)
+            sys.stdout.write(''.join(pending))
+            sys.stdout.flush()
+            
+            print("\n" + "="*80)
+            print("✅ Review completed!")
+            
+            return ''.join(parts).strip()
+            
+        except requests.exceptions.RequestException as e:
+            print(f"Error during streaming request: {e}")
+            return None
+    
+    def _embed_batch(self, texts: List[str], model: str = "nomic-embed-text") -> List[List[float]]:
+        """
+        Embed several texts with as few round trips as possible.
+        
+        Uncached texts are sent in a single request to /api/embed. Servers that
+        predate the batch endpoint are handled by falling back to one
+        /api/embeddings call per text.
+        
+        Args:
+            texts: The texts to embed
+            model: Name of the embedding model
+            
+        Returns:
+            One embedding per text, in input order
+            
+        Raises:
+            requests.exceptions.RequestException: If the embedding server cannot be reached
+        """
+        keys = [(model, hashlib.sha256(text.encode('utf-8')).digest()) for text in texts]
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key in self._embedding_cache:
+                self._embedding_cache.move_to_end(key)
+            else:
+                missing.setdefault(key, text)
+        
+        if missing:
+            response = self.session.post(
+                f"{self.base_url}/api/embed",
+                json={"model": model, "input": list(missing.values()), "keep_alive": self.keep_alive},
+                timeout=_HTTP_TIMEOUT
+            )
+            embeddings = response.json().get("embeddings") if response.ok else None
+            if not embeddings or len(embeddings) != len(missing):
+                embeddings = []
+                for text in missing.values():
+                    response = self.session.post(
+                        f"{self.base_url}/api/embeddings",
+                        json={"model": model, "prompt": text, "keep_alive": self.keep_alive},
+                        timeout=_HTTP_TIMEOUT
+                    )
+                    response.raise_for_status()
+                    embeddings.append(response.json()["embedding"])
+            
+            for key, embedding in zip(missing, embeddings):
+                self._embedding_cache[key] = embedding
+            while len(self._embedding_cache) > _EMBED_CACHE_SIZE:
+                self._embedding_cache.popitem(last=False)
+        
+        return [self._embedding_cache[key] for key in keys]
+    
+    def _collapse_similar_hunks(self, diff_content: str) -> str:
+        """
+        Drop hunks that are near-duplicates of an earlier hunk in the diff.
+        
+        Every hunk is embedded once (in a single batch); a hunk is dropped when
+        its body is almost identical to a hunk that was already kept, which is
+        common for mechanical changes repeated across files. Near-duplicates can
+        still differ in a token or two, so the kept hunk lists the locations
+        collapsed into it and a note tells the model they were not shown.
+        
+        Args:
+            diff_content: The diff content to review
+            
+        Returns:
+            The diff with near-duplicate hunks removed, or the original diff on failure
+        """
+        sections = _split_diff_sections(diff_content)
+        hunk_indexes = [i for i, section in enumerate(sections) if section.startswith('@@ ')]
+        if len(hunk_indexes) < 2:
+            return diff_content
+        
+        # Compare hunk bodies only; the @@ header carries line numbers that always differ
+        bodies = [sections[i].partition('\n')[2] for i in hunk_indexes]
+        try:
+            embeddings = self._embed_batch(bodies, self.embed_model)
+        except (requests.exceptions.RequestException, KeyError, ValueError) as e:
+            print(f"⚠️  Could not embed diff hunks, reviewing the full diff: {e}")
+            return diff_content
+        
+        locations = _hunk_locations(sections)
+        kept: List[Tuple[int, List[float]]] = []
+        collapsed: Dict[int, List[str]] = {}
+        for index, embedding in zip(hunk_indexes, embeddings):
+            similar = next((kept_index for kept_index, other in kept
+                            if _cosine_similarity(embedding, other) >= _SIMILAR_HUNK_THRESHOLD), None)
+            if similar is None:
+                kept.append((index, embedding))
+            else:
+                collapsed.setdefault(similar, []).append(locations[index])
+        
+        if not collapsed:
+            return diff_content
+        dropped = sum(len(collapsed_locations) for collapsed_locations in collapsed.values())
+        print(f"🧹 Collapsed {dropped} near-duplicate hunk(s) before review")
+        
+        dropped_indexes = set(hunk_indexes) - {index for index, _ in kept}
+        output = [f"# NOTE: {dropped} near-duplicate hunks collapsed; each kept hunk lists the locations "
+                  f"of hunks that look almost the same but may differ in small details\n"]
+        for i, section in enumerate(sections):
+            if i in dropped_indexes:
+                continue
+            if i in collapsed:
+                header, newline, body = section.partition('\n')
+                section = f"{header} (near-duplicates not shown: {'; '.join(collapsed[i])}){newline}{body}"
+            output.append(section)
+        return ''.join(output)
+    
+    def _fit_prompt(self, build: Callable[[str], str], text: str) -> Optional[str]:
+        """
+        Build a prompt around some code, truncating the code so the prompt fits the context window.
+        
+        Ollama silently drops the start of an oversized prompt and still runs the
+        full prefill, so the resulting review is both slow and meaningless. Instead
+        the end of the code is cut at a line boundary, with a note for the model.
+        
+        Args:
+            build: Function wrapping the code in its prompt template
+            text: The code or diff to put in the prompt
+            
+        Returns:
+            The prompt, or None if even the bare template does not fit
+        """
+        num_ctx = self.num_ctx or _NUM_CTX_BUCKETS[-1]
+        limit = num_ctx - self.num_predict - _CONTEXT_SAFETY_MARGIN
+        prompt = build(text)
+        estimate = _estimate_tokens(prompt)
+        if estimate <= limit:
+            return prompt
+        
+        overhead = _estimate_tokens(build(_CONTEXT_TRUNCATION_NOTE))
+        if overhead >= limit:
+            print(f"❌ The prompt template alone is about {overhead} tokens but only {limit} fit in a "
+                  f"{num_ctx}-token context with num_predict={self.num_predict}; raise --num-ctx")
+            return None
+        
+        # Shrink the code in proportion to the excess until the estimate fits
+        keep = len(text)
+        while estimate > limit and keep > 0:
+            keep = int(keep * (limit - overhead) / (estimate - overhead) * 0.95)
+            cut = text[:keep]
+            line_end = cut.rfind('\n')
+            if line_end > 0:
+                cut = cut[:line_end]
+            prompt = build(cut + _CONTEXT_TRUNCATION_NOTE)
+            estimate = _estimate_tokens(prompt)
+        print(f"⚠️  Reviewing only the first {len(cut)} of {len(text)} characters to fit a {num_ctx}-token "
+              f"context with num_predict={self.num_predict}; raise --num-ctx to review more")
+        return prompt
+    
+    def _build_review_prompt(self, code: str, review_type: str = "general", minimal: bool = False) -> Optional[str]:
+        """
+        Build the prompt for a single code review.
+        
+        Args:
+            code: The code to review
+            review_type: Type of review to perform
+            minimal: Whether to provide minimal, concise output
+            
+        Returns:
+            The prompt to send to the AI model, or None if it cannot fit in the context window
+        """
+        prompts = self._PROMPTS_MINIMAL if minimal else self._PROMPTS_FULL
+        template = prompts.get(review_type, prompts["general"])
+        return self._fit_prompt(lambda text: template.format(code=text), _normalize_code(code, review_type))
+    
+    def review_code(self, code: str, review_type: str = "general", stream: bool = True, minimal: bool = False) -> Optional[str]:
+        """
+        Review the provided code using the AI model.
+        
+        Args:
+            code: The code to review
+            review_type: Type of review to perform
+            stream: Whether to use streaming output
+            minimal: Whether to provide minimal, concise output
+            
+        Returns:
+            The code review or None if request failed
+        """
+        # Streaming is mostly about the live output, so only cache it when asked to
+        cacheable = self.use_cache and (not stream or self.cache_stream)
+        if cacheable:
+            cached = self._get_cached_review(code, review_type, minimal)
+            if cached is not None:
+                print("💾 Using cached review (unchanged code)")
+                if stream:
+                    print("\n" + "="*80)
+                    print("📋 CODE REVIEW RESULTS (Cached)")
+                    print("="*80)
+                    print(cached)
+                    print("="*80)
+                return cached
+        
+        prompt = self._build_review_prompt(code, review_type, minimal)
+        if prompt is None:
+            return None
+        result = self._make_api_request(prompt, stream)
+        if cacheable:
+            self._store_cached_review(code, review_type, minimal, result)
+        return result
+    
+    def review_code_multi(self, code: str, types: List[str], minimal: bool = True) -> Dict[str, Optional[str]]:
+        """
+        Run several review types over the same code with a single model call.
+        
+        The code is sent once with instructions to answer every review type in
+        its own section, so the prompt is processed once instead of once per
+        type. Types missing from the response are reviewed separately.
+        
+        Args:
+            code: The code to review
+            types: Types of review to perform
+            minimal: Whether to provide minimal, concise output
+            
+        Returns:
+            Mapping of review type to review (or None on failure)
+        """
+        if len(types) == 1:
+            return {types[0]: self.review_code(code, types[0], stream=False, minimal=minimal)}
+        
+        style = "Be concise and actionable." if minimal else "Give detailed feedback with examples."
+        prompt = self._fit_prompt(
+            lambda text: (
+                f"You are performing {len(types)} independent code reviews. For each review type below, "
+                f"produce a section that starts with a line '### TYPE ###' (e.g. '### {types[0].upper()} ###'). "
+                f"{style}\n"
+                f"Types: {', '.join(types)}\n\n"
+                f"Code:\n```\n{text}\n```"
+            ),
+            _normalize_code(code, 'general')
+        )
+        if prompt is None:
+            return {review_type: None for review_type in types}
+        response = self._make_api_request(prompt, stream=False) or ""
+        
+        # re.split with a capturing group yields [preamble, type1, section1, type2, section2, ...]
+        sections = _MULTI_SECTION_RE.split(response)
+        found = {}
+        for review_type, section in zip(sections[1::2], sections[2::2]):
+            review_type = review_type.lower()
+            if review_type in types and section.strip():
+                found[review_type] = section.strip()
+        
+        results: Dict[str, Optional[str]] = {}
+        for review_type in types:
+            results[review_type] = found.get(review_type)
+            if results[review_type] is None:
+                results[review_type] = self.review_code(code, review_type, stream=False, minimal=minimal)
+        return results
+    
+    def review_codes_batched(self, codes: List[str], review_type: str = "general", batch_size: int = 8,
+                             max_prompt_chars: int = 12000, minimal: bool = True) -> List[Optional[str]]:
+        """
+        Review many small snippets with a few batched prompts instead of one prompt each.
+        
+        Snippets are packed into a single prompt until either batch_size or
+        max_prompt_chars is reached, so the shared instructions are processed
+        once per batch. Snippets whose review cannot be recovered from the
+        batched response are reviewed individually. Unchanged snippets are
+        served from the review cache.
+        
+        Args:
+            codes: The code snippets to review
+            review_type: Type of review to perform
+            batch_size: Maximum number of snippets per prompt
+            max_prompt_chars: Soft limit on the size of a batched prompt
+            minimal: Whether to provide minimal, concise output
+            
+        Returns:
+            One review (or None on failure) per snippet, in input order
         """
-        Initialize the Code Reviewer.
+        results = [self._get_cached_review(code, review_type, minimal) for code in codes]
+        
+        batch: List[int] = []
+        batch_chars = 0
+        for index, code in enumerate(codes):
+            if results[index] is not None:
+                continue
+            if batch and (len(batch) >= batch_size or batch_chars + len(code) > max_prompt_chars):
+                self._review_batch(codes, batch, review_type, minimal, results)
+                batch, batch_chars = [], 0
+            batch.append(index)
+            batch_chars += len(code)
+        if batch:
+            self._review_batch(codes, batch, review_type, minimal, results)
+        
+        return results
+    
+    def _review_batch(self, codes: List[str], batch: List[int], review_type: str, minimal: bool,
+                      results: List[Optional[str]]) -> None:
+        """
+        Review one batch of snippets and store the reviews in results.
         
         Args:
-            model_url: URL of the local AI model API
-            model_name: Name of the model to use
+            codes: All snippets being reviewed
+            batch: Indexes into codes that make up this batch
+            review_type: Type of review to perform
+            minimal: Whether to provide minimal, concise output
+            results: Output list, filled in place
         """
-        self.model_url = model_url
-        self.model_name = model_name
+        if len(batch) == 1:
+            results[batch[0]] = self.review_code(codes[batch[0]], review_type, stream=False, minimal=minimal)
+            return
         
-    def _make_api_request(self, prompt: str, stream: bool = True) -> Optional[str]:
+        style = "Be concise and actionable." if minimal else "Give detailed feedback with examples."
+        instructions = (
+            f"Review the following {len(batch)} snippets independently ({review_type} review). {style}\n"
+            f"Start each review with a line '<<<REVIEW n>>>' where n is the snippet number, "
+            f"and finish with a line '{_BATCH_END}'.\n"
+        )
+        snippets = ''.join(
+            f"\nSnippet {number}:\n```\n{_normalize_code(codes[index], review_type)}\n```\n"
+            for number, index in enumerate(batch, 1)
+        )
+        # Snippets cut off by the context budget get no delimiter and are reviewed individually below
+        prompt = self._fit_prompt(lambda text: instructions + text, snippets)
+        response = (self._make_api_request(prompt, stream=False) if prompt else None) or ""
+        
+        # re.split with a capturing group yields [preamble, n1, review1, n2, review2, ...]
+        sections = _BATCH_REVIEW_RE.split(response.split(_BATCH_END, 1)[0])
+        reviews = {}
+        for number, review in zip(sections[1::2], sections[2::2]):
+            number = int(number)
+            review = review.strip()
+            if 1 <= number <= len(batch) and review:
+                reviews[number] = review
+        
+        if len(reviews) < len(batch) // 2:
+            reviews = {}
+        for number, index in enumerate(batch, 1):
+            if number in reviews:
+                results[index] = reviews[number]
+                self._store_cached_review(codes[index], review_type, minimal, reviews[number])
+            else:
+                results[index] = self.review_code(codes[index], review_type, stream=False, minimal=minimal)
+    
+    async def _amake_api_request(self, prompt: str) -> Optional[str]:
         """
-        Make a request to the local AI model with streaming support.
+        Make a non-streaming request to the AI model without blocking the event loop.
+        
+        The blocking call runs on a worker thread and shares this reviewer's
+        connection pool, so concurrent prompts overlap on the network and are
+        processed side by side by Ollama (up to OLLAMA_NUM_PARALLEL).
         
         Args:
             prompt: The prompt to send to the AI model
-            stream: Whether to use streaming output
             
         Returns:
             The AI model's response or None if request failed
         """
-        payload = {
-            "model": self.model_name,
-            "prompt": prompt,
-            "stream": stream
-        }
+        return await asyncio.to_thread(self._make_api_request, prompt, False)
+    
+    async def _agather_prompts(self, prompts: List[str]) -> List[Optional[str]]:
+        """
+        Send several prompts concurrently.
         
-        try:
-            if stream:
-                return self._handle_streaming_response(payload)
-            else:
-                response = requests.post(self.model_url, json=payload, timeout=180)
-                response.raise_for_status()
-                
-                result = response.json()
-                return result.get("response", "").strip()
+        The requests share the reviewer's max_concurrency slots and rate limit
+        with every other review running on this reviewer.
+        
+        Args:
+            prompts: The prompts to send to the AI model
             
-        except requests.exceptions.RequestException as e:
-            print(f"Error connecting to AI model: {e}")
-            return None
-        except json.JSONDecodeError as e:
-            print(f"Error parsing AI model response: {e}")
-            return None
+        Returns:
+            The responses, in the same order as the prompts
+        """
+        return await asyncio.gather(*(self._amake_api_request(prompt) for prompt in prompts))
     
-    def _handle_streaming_response(self, payload: dict) -> Optional[str]:
+    async def _areview_pairs(self, pairs: List[Tuple[str, str]], minimal: bool) -> List[Optional[str]]:
         """
-        Handle streaming response from Ollama.
+        Review (code, review_type) pairs concurrently, serving unchanged code from the cache.
         
         Args:
-            payload: The request payload
+            pairs: The (code, review_type) pairs to review
+            minimal: Whether to provide minimal, concise output
             
         Returns:
-            Complete response text or None if failed
+            One review (or None on failure) per pair, in input order
         """
-        try:
-            print("🔄 Connecting to Ollama for streaming response...")
-            response = requests.post(
-                self.model_url, 
-                json=payload, 
-                timeout=180,
-                stream=True
-            )
-            response.raise_for_status()
-            
-            print("\n" + "="*80)
-            print("📋 CODE REVIEW RESULTS (Streaming)")
-            print("="*80)
-            
-            full_response = ""
-            
-            for line in response.iter_lines():
-                if line:
-                    try:
-                        chunk = json.loads(line.decode('utf-8'))
-                        if 'response' in chunk:
-                            chunk_text = chunk['response']
-                            print(chunk_text, end='', flush=True)
-                            full_response += chunk_text
-                        
-                        # Check if this is the final chunk
-                        if chunk.get('done', False):
-                            break
-                            
-                    except json.JSONDecodeError:
-                        continue
-            
-            print("\n" + "="*80)
-            print("✅ Review completed!")
-            
-            return full_response.strip()
-            
-        except requests.exceptions.RequestException as e:
-            print(f"Error during streaming request: {e}")
-            return None
+        results = [self._get_cached_review(code, review_type, minimal) for code, review_type in pairs]
+        missing = [i for i, result in enumerate(results) if result is None]
+        
+        prompts = {i: self._build_review_prompt(pairs[i][0], pairs[i][1], minimal) for i in missing}
+        sendable = [i for i in missing if prompts[i] is not None]
+        for i, result in zip(sendable, await self._agather_prompts([prompts[i] for i in sendable])):
+            results[i] = result
+            self._store_cached_review(pairs[i][0], pairs[i][1], minimal, result)
+        return results
     
-    def review_code(self, code: str, review_type: str = "general", stream: bool = True, minimal: bool = False) -> Optional[str]:
+    async def areview_code(self, codes: List[str], review_type: str = "general", minimal: bool = False) -> List[Optional[str]]:
         """
-        Review the provided code using the AI model.
+        Review several pieces of code concurrently.
         
         Args:
-            code: The code to review
+            codes: The code snippets to review
             review_type: Type of review to perform
-            stream: Whether to use streaming output
             minimal: Whether to provide minimal, concise output
             
         Returns:
-            The code review or None if request failed
+            One review (or None on failure) per snippet, in input order
         """
-        if minimal:
-            prompts = {
-                "general": f"""Code review - be concise and actionable:
-
-Code:
-```
-{code}
-```
-
-Provide only:
-- 3 most critical issues
-- Quick fixes (1-2 lines each)
-- No explanations, just solutions""",
-
-                "security": f"""Security review - be brief:
-
-Code:
-```
-{code}
-```
-
-List only:
-- Critical vulnerabilities found
-- One-line fix for each
-- Risk level (High/Medium/Low)""",
-
-                "performance": f"""Performance review - quick summary:
-
-Code:
-```
-{code}
-```
-
-Provide:
-- 2-3 main bottlenecks
-- Simple optimization fixes
-- Expected impact""",
-
-                "modern": f"""Modernization - essential changes:
-
-Code:
-```
-{code}
-```
-
-Show:
-- Replace old syntax with modern equivalent
-- Most important upgrades only
-- Before/after code snippets (brief)"""
-            }
-        else:
-            prompts = {
-                "general": f"""Please provide a comprehensive code review for the following code. Include:
-1. Code quality issues
-2. Potential bugs or security vulnerabilities
-3. Performance improvements
-4. Best practices recommendations
-5. Refactoring suggestions
-
-Code to review:
-```
-{code}
-```
-
-Please provide detailed feedback with explanations and examples where applicable.""",
-            
-            "security": f"""Please perform a security-focused code review for the following code. Look for:
-1. Security vulnerabilities (XSS, SQL injection, etc.)
-2. Input validation issues
-3. Authentication/authorization problems
-4. Data exposure risks
-5. Secure coding practices
-
-Code to review:
-```
-{code}
-```
-
-Provide specific security recommendations and fixes.""",
+        return await self._areview_pairs([(code, review_type) for code in codes], minimal)
+    
+    async def areview_types(self, code: str, review_types: List[str], minimal: bool = False) -> Dict[str, Optional[str]]:
+        """
+        Run several review types over the same code concurrently.
+        
+        Args:
+            code: The code to review
+            review_types: Types of review to perform
+            minimal: Whether to provide minimal, concise output
             
-            "performance": f"""Please perform a performance-focused code review for the following code. Analyze:
-1. Time complexity issues
-2. Memory usage optimization
-3. Algorithm efficiency
-4. Resource management
-5. Scalability concerns
-
-Code to review:
-```
-{code}
-```
-
-Suggest specific performance improvements with examples.""",
+        Returns:
+            Mapping of review type to review (or None on failure)
+        """
+        results = await self._areview_pairs([(code, review_type) for review_type in review_types], minimal)
+        return dict(zip(review_types, results))
+    
+    async def areview_files(self, file_paths: List[str], review_type: str = "general", minimal: bool = False) -> Dict[str, Optional[str]]:
+        """
+        Review several files concurrently.
+        
+        Args:
+            file_paths: Paths of the files to review
+            review_type: Type of review to perform
+            minimal: Whether to provide minimal, concise output
             
-            "modern": f"""Please suggest modern improvements for the following code. Focus on:
-1. Modern language features and syntax
-2. Best practices and conventions
-3. Code readability and maintainability
-4. Updated patterns and approaches
-5. Framework/library recommendations
-
-Code to review:
-```
-{code}
-```
-
-Provide modernized code examples and explanations."""
-            }
+        Returns:
+            Mapping of file path to review (or None if reading or the request failed)
+        """
+        reviews = dict.fromkeys(file_paths)
+        codes = {}
+        for file_path in file_paths:
+            try:
+                code = _read_code_file(file_path)
+            except OSError as e:
+                print(f"Error reading file '{file_path}': {e}")
+                continue
+            if code:
+                codes[file_path] = code
+            else:
+                reviews[file_path] = _EMPTY_FILE_REVIEW
         
-        prompt = prompts.get(review_type, prompts["general"])
-        return self._make_api_request(prompt, stream)
+        results = await self.areview_code(list(codes.values()), review_type, minimal)
+        reviews.update(zip(codes, results))
+        return reviews
     
     def review_file(self, file_path: str, review_type: str = "general", stream: bool = True, minimal: bool = False) -> Optional[str]:
         """
@@ -247,20 +1338,22 @@ Provide modernized code examples and explanations."""
             The code review or None if file reading or request failed
         """
         try:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                code = file.read()
-            
-            print(f"Reviewing file: {file_path}")
-            return self.review_code(code, review_type, stream, minimal)
-            
+            code = _read_code_file(file_path)
         except FileNotFoundError:
             print(f"Error: File '{file_path}' not found.")
             return None
-        except IOError as e:
+        except OSError as e:
             print(f"Error reading file '{file_path}': {e}")
             return None
+        
+        print(f"Reviewing file: {file_path}")
+        if not code:
+            print(_EMPTY_FILE_REVIEW)
+            return _EMPTY_FILE_REVIEW
+        return self.review_code(code, review_type, stream, minimal)
     
-    def review_diff(self, diff_content: str, stream: bool = True, minimal: bool = False) -> Optional[str]:
+    def review_diff(self, diff_content: str, stream: bool = True, minimal: bool = False,
+                    dedupe: bool = True) -> Optional[str]:
         """
         Review a git diff or code changes.
         
@@ -268,53 +1361,91 @@ Provide modernized code examples and explanations."""
             diff_content: The diff content to review
             stream: Whether to use streaming output
             minimal: Whether to provide minimal, concise output
+            dedupe: Whether to collapse identical hunks before review
             
         Returns:
-            The code review or None if request failed
+            The code review or None if request failed. When hunks were collapsed,
+            the review ends with the locations each reviewed hunk stands for.
         """
-        if minimal:
-            prompt = f"""Diff review - brief summary:
-
-Diff:
-```
-{diff_content}
-```
-
-Provide only:
-- Main issues found
-- Critical fixes needed
-- Approval status (Approve/Request Changes)"""
-        else:
-            prompt = f"""Please review the following code changes/diff. Focus on:
-1. Quality of the changes
-2. Potential issues introduced
-3. Best practices compliance
-4. Impact on existing code
-5. Suggestions for improvement
+        collapse_map: Dict[str, List[str]] = {}
+        if dedupe:
+            diff_content, collapse_map = _dedupe_diff(diff_content)
+            if collapse_map:
+                collapsed = sum(len(locations) for locations in collapse_map.values())
+                print(f"🧹 Collapsed {collapsed} duplicate hunk(s) before review")
+        if self.embed_model:
+            diff_content = self._collapse_similar_hunks(diff_content)
+        
+        template = self._DIFF_PROMPT_MINIMAL if minimal else self._DIFF_PROMPT_FULL
+        prompt = self._fit_prompt(lambda text: template.format(diff=text), diff_content)
+        if prompt is None:
+            return None
 
-Diff to review:
-```
-{diff_content}
-```
+        result = self._make_api_request(prompt, stream)
+        if result and collapse_map:
+            # Map findings on a collapsed hunk back to every file it was repeated in
+            duplicates = _format_collapse_map(collapse_map)
+            if stream:
+                print(duplicates)
+            result = f"{result}\n\n{duplicates}"
+        return result
 
-Provide specific feedback on the changes."""
 
-        return self._make_api_request(prompt, stream)
+def _parse_review_types(value: str) -> List[str]:
+    """Parse a comma-separated --type value into a list of review types."""
+    import argparse
+    
+    review_types = [review_type.strip() for review_type in value.split(',') if review_type.strip()]
+    invalid = [review_type for review_type in review_types if review_type not in REVIEW_TYPES]
+    if not review_types or invalid:
+        raise argparse.ArgumentTypeError(
+            f"invalid review type(s) {', '.join(invalid) or repr(value)} (choose from {', '.join(REVIEW_TYPES)})"
+        )
+    return review_types
 
 
 def main():
     """Main function for CLI usage with streaming support."""
     import argparse
     
-    parser = argparse.ArgumentParser(description="Code Review Bot using local AI model with streaming")
-    parser.add_argument("--file", "-f", help="Path to file to review")
+    parser = argparse.ArgumentParser(
+        description="Code Review Bot using local AI model with streaming",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""Concurrency:
+  Several --type values (e.g. --type general,security) are answered by one combined
+  model call; with --parallel-types each type gets its own request instead, and those
+  requests run concurrently. Ollama only processes them in parallel when the server
+  allows it, e.g.:
+    OLLAMA_NUM_PARALLEL=4        parallel requests per loaded model
+    OLLAMA_MAX_LOADED_MODELS=1   models kept in memory at the same time
+  --keep-alive keeps the model loaded between runs; each parallel slot gets its own
+  num_ctx-sized context, so a smaller --num-ctx leaves room for more slots.""")
+    parser.add_argument("--file", "-f", help="Path to file to review, or a glob such as 'src/**/*.py'")
     parser.add_argument("--code", "-c", help="Code string to review")
     parser.add_argument("--diff", "-d", help="Diff content to review")
-    parser.add_argument("--type", "-t", choices=["general", "security", "performance", "modern"], 
-                       default="general", help="Type of review to perform")
+    parser.add_argument("--type", "-t", type=_parse_review_types, default=["general"],
+                       help=f"Type of review to perform; comma-separate several to combine them ({', '.join(REVIEW_TYPES)})")
+    parser.add_argument("--parallel-types", action="store_true",
+                       help="With several --type values, send one concurrent request per type instead of one combined request")
     parser.add_argument("--model-url", default="http://localhost:11434/api/generate", 
                        help="URL of the local AI model API")
     parser.add_argument("--model-name", default="llama3.2", help="Name of the AI model")
+    parser.add_argument("--keep-alive", default="30m",
+                       help="How long Ollama keeps the model loaded between requests (default: 30m)")
+    parser.add_argument("--num-ctx", type=int,
+                       help="Context window size to request (default: sized from each prompt, up to 8192)")
+    parser.add_argument("--num-predict", type=int, default=1024,
+                       help="Maximum number of tokens to generate per review (default: 1024)")
+    parser.add_argument("--workers", type=int,
+                       help="Files reviewed at once for a --file glob (default: OLLAMA_NUM_PARALLEL or 4)")
+    parser.add_argument("--max-concurrency", type=int,
+                       help="Maximum concurrent requests when running several reviews (default: OLLAMA_NUM_PARALLEL or 4)")
+    parser.add_argument("--rate-limit", type=float, metavar="PER_MINUTE",
+                       help="Maximum requests started per minute when running several reviews")
+    parser.add_argument("--dedupe-diff", action=argparse.BooleanOptionalAction, default=True,
+                       help="Collapse identical hunks in --diff reviews before sending them to the model")
+    parser.add_argument("--embed-model",
+                       help="Embedding model used to skip near-duplicate hunks in --diff reviews (e.g. nomic-embed-text)")
     parser.add_argument("--no-stream", action="store_true", 
                        help="Disable streaming output (get complete response at once)")
     parser.add_argument("--minimal", "-m", action="store_true", 
@@ -327,8 +1458,28 @@ def main():
                        help="Specific agents to use with --multi-agent (default: all agents)")
     parser.add_argument("--format", choices=["detailed", "summary", "json"], 
                        default="detailed", help="Report format for multi-agent reviews")
+    parser.add_argument("--no-cache", action="store_true",
+                       help="Always ask the model, ignoring reviews cached for identical code")
+    parser.add_argument("--clear-cache", action="store_true",
+                       help=f"Delete all cached reviews ({REVIEW_CACHE_PATH}) before running")
+    parser.add_argument("--cache-stream", action="store_true",
+                       help="Also cache streamed reviews (by default only --no-stream reviews are cached)")
     
     args = parser.parse_args()
+    if args.diff and not (args.file or args.code) and len(args.type) > 1 and not args.multi_agent:
+        parser.error("--diff uses its own diff review prompt and does not combine review types; "
+                     "pass a single --type or use --multi-agent")
+    
+    if args.clear_cache:
+        try:
+            cache = _ReviewCache()
+            cache.clear()
+            cache.close()
+            print("🧹 Review cache cleared")
+        except (OSError, sqlite3.Error) as e:
+            print(f"⚠️  Could not clear review cache: {e}")
+        if not any([args.file, args.code, args.diff]):
+            return
     
     if not any([args.file, args.code, args.diff]):
         print("Error: Please provide either --file, --code, or --diff")
@@ -380,42 +1531,173 @@ def main():
     
     else:
         # Use original single-agent reviewer
-        reviewer = CodeReviewer(args.model_url, args.model_name)
         use_streaming = not args.no_stream
         use_minimal = args.minimal
         
-        try:
-            print(f"🚀 Starting {args.type} code review...")
-            if use_minimal:
-                print("⚡ Using minimal mode for concise output")
-            if use_streaming:
-                print("💫 Using streaming mode for real-time output")
-            else:
-                print("⏳ Using non-streaming mode")
+        with CodeReviewer(args.model_url, args.model_name, embed_model=args.embed_model,
+                          use_cache=not args.no_cache, cache_stream=args.cache_stream,
+                          keep_alive=args.keep_alive, num_ctx=args.num_ctx,
+                          num_predict=args.num_predict, max_concurrency=args.max_concurrency,
+                          rate_per_min=args.rate_limit) as reviewer:
+            try:
+                if args.file and any(char in args.file for char in '*?['):
+                    _run_file_glob_reviews(reviewer, args, use_minimal)
+                    return
+                
+                if len(args.type) > 1:
+                    _run_multi_type_reviews(reviewer, args, use_minimal)
+                    return
+                
+                review_type = args.type[0]
+                print(f"🚀 Starting {review_type} code review...")
+                if use_minimal:
+                    print("⚡ Using minimal mode for concise output")
+                if use_streaming:
+                    print("💫 Using streaming mode for real-time output")
+                else:
+                    print("⏳ Using non-streaming mode")
             
-            if args.file:
-                result = reviewer.review_file(args.file, args.type, stream=use_streaming, minimal=use_minimal)
-            elif args.code:
-                result = reviewer.review_code(args.code, args.type, stream=use_streaming, minimal=use_minimal)
-            elif args.diff:
-                result = reviewer.review_diff(args.diff, stream=use_streaming, minimal=use_minimal)
+                if args.file:
+                    result = reviewer.review_file(args.file, review_type, stream=use_streaming, minimal=use_minimal)
+                elif args.code:
+                    result = reviewer.review_code(args.code, review_type, stream=use_streaming, minimal=use_minimal)
+                elif args.diff:
+                    result = reviewer.review_diff(args.diff, stream=use_streaming, minimal=use_minimal,
+                                                  dedupe=args.dedupe_diff)
             
-            if result:
-                if not use_streaming:
-                    # Only print results if not streaming (streaming already prints)
-                    print("\n" + "="*80)
-                    print("📋 CODE REVIEW RESULTS")
-                    print("="*80)
-                    print(result)
-                    print("="*80)
-                    print("✅ Review completed!")
-            else:
-                print("❌ Failed to get code review. Please check your AI model connection.")
-                sys.exit(1)
+                if result:
+                    if not use_streaming:
+                        # Only print results if not streaming (streaming already prints)
+                        print("\n" + "="*80)
+                        print("📋 CODE REVIEW RESULTS")
+                        print("="*80)
+                        print(result)
+                        print("="*80)
+                        print("✅ Review completed!")
+                else:
+                    print("❌ Failed to get code review. Please check your AI model connection.")
+                    sys.exit(1)
                 
-        except KeyboardInterrupt:
-            print("\n⏹ Review cancelled by user.")
-            sys.exit(0)
+            except KeyboardInterrupt:
+                print("\n⏹ Review cancelled by user.")
+                sys.exit(0)
+
+
+def _review_file_types(reviewer: CodeReviewer, file_path: str, review_types: List[str], minimal: bool) -> Optional[str]:
+    """Review one file without streaming, combining several review types into one result."""
+    if len(review_types) == 1:
+        return reviewer.review_file(file_path, review_types[0], stream=False, minimal=minimal)
+    
+    try:
+        code = _read_code_file(file_path)
+    except OSError as e:
+        print(f"Error reading file '{file_path}': {e}")
+        return None
+    if not code:
+        return _EMPTY_FILE_REVIEW
+    
+    results = reviewer.review_code_multi(code, review_types, minimal=minimal)
+    if not all(results.values()):
+        return None
+    return "\n\n".join(f"### {review_type.upper()} ###\n{review}" for review_type, review in results.items())
+
+
+def _read_small_files(files: List[str]) -> Dict[str, str]:
+    """Contents of the non-empty files small enough to share a batched review prompt."""
+    small = {}
+    for path in files:
+        try:
+            if os.path.getsize(path) > _BATCH_FILE_MAX_CHARS:
+                continue
+            code = _read_code_file(path)
+        except OSError:
+            continue  # reviewed on its own, which reports the error
+        if code and len(code) <= _BATCH_FILE_MAX_CHARS:
+            small[path] = code
+    return small
+
+
+def _run_file_glob_reviews(reviewer: CodeReviewer, args, use_minimal: bool) -> None:
+    """Review every file matching a --file glob on a thread pool and print each result as it finishes."""
+    import glob
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    
+    files = sorted(path for path in glob.glob(args.file, recursive=True) if os.path.isfile(path))
+    if not files:
+        print(f"❌ No files match '{args.file}'")
+        sys.exit(1)
+    
+    # Small files share prompts so the instructions are processed once per batch instead of once per file
+    small = _read_small_files(files) if len(args.type) == 1 else {}
+    batches = [list(small)[i:i + _BATCH_FILE_COUNT] for i in range(0, len(small), _BATCH_FILE_COUNT)]
+    
+    # Each review mostly waits on Ollama, so threads overlap well up to the server's parallel slots
+    workers = args.workers or min(len(files), int(os.getenv('OLLAMA_NUM_PARALLEL', '4')))
+    print(f"🚀 Starting {', '.join(args.type)} code review of {len(files)} files with {workers} workers...")
+    if use_minimal:
+        print("⚡ Using minimal mode for concise output")
+    if small:
+        print(f"📦 Batching {len(small)} small files into {len(batches)} prompt group(s)")
+    
+    failed = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(_review_file_types, reviewer, path, args.type, use_minimal): [path]
+            for path in files if path not in small
+        }
+        for batch in batches:
+            future = executor.submit(reviewer.review_codes_batched, [small[path] for path in batch],
+                                     args.type[0], batch_size=_BATCH_FILE_COUNT, minimal=use_minimal)
+            futures[future] = batch
+        for future in as_completed(futures):
+            paths = futures[future]
+            results = future.result()
+            for path, result in zip(paths, results if isinstance(results, list) else [results]):
+                print("\n" + "="*80)
+                print(f"📋 CODE REVIEW RESULTS: {path}")
+                print("="*80)
+                if result:
+                    print(result)
+                else:
+                    print("❌ Failed to get code review. Please check your AI model connection.")
+                    failed.append(path)
+    print("="*80)
+    
+    if failed:
+        print(f"❌ {len(failed)} of {len(files)} reviews failed")
+        sys.exit(1)
+    print(f"✅ Reviewed {len(files)} files!")
+
+
+def _run_multi_type_reviews(reviewer: CodeReviewer, args, use_minimal: bool) -> None:
+    """Run every requested review type over the same code and print the results."""
+    if args.file:
+        try:
+            code = _read_code_file(args.file)
+        except OSError as e:
+            print(f"Error reading file '{args.file}': {e}")
+            sys.exit(1)
+        print(f"Reviewing file: {args.file}")
+    else:
+        code = args.code
+    
+    if args.parallel_types:
+        print(f"🚀 Starting {', '.join(args.type)} code reviews concurrently...")
+        results = asyncio.run(reviewer.areview_types(code, args.type, minimal=use_minimal))
+    else:
+        print(f"🚀 Starting combined {', '.join(args.type)} code review...")
+        results = reviewer.review_code_multi(code, args.type, minimal=use_minimal)
+    
+    for review_type, result in results.items():
+        print("\n" + "="*80)
+        print(f"📋 {review_type.upper()} CODE REVIEW RESULTS")
+        print("="*80)
+        print(result if result else "❌ Failed to get code review. Please check your AI model connection.")
+    print("="*80)
+    
+    if not all(results.values()):
+        sys.exit(1)
+    print("✅ Reviews completed!")
 
 
 if __name__ == "__main__":
@@ -3,19 +3,212 @@
 Consolidation Agent - Aggregates and synthesizes reviews from multiple specialized agents.
 """
 
+import asyncio
+import functools
+import itertools
 import json
 import logging
-from typing import List, Dict, Any, Optional, Union
-from dataclasses import dataclass, asdict
+import random
+import re
+import threading
+from typing import List, Dict, Any, Optional, Tuple, Union
+from dataclasses import dataclass, asdict, fields, is_dataclass
 from collections import defaultdict
-from .specialized_agents import AgentReview, ReviewFinding, Severity
+from enum import Enum
+from .specialized_agents import DATACLASS_SLOTS, AgentReview, ReviewFinding, Severity
 from .llm_manager import SandboxInstances
+from .llm_cache import CachedLLMClient, LLMCache, default_embedder
+from .batch_consolidator import BatchProcessor
+from .util.aio import run_sync
 from .util.llm import AzureClient, OllamaClient
 
+try:
+    import ahocorasick_rs
+except ImportError:
+    ahocorasick_rs = None
+
+
+@functools.lru_cache(maxsize=None)
+def _agent_display_name(agent_type: str) -> str:
+    """Human-readable agent name, e.g. 'coding_practices' -> 'Coding Practices'."""
+    return agent_type.replace('_', ' ').title()
+
+
+@functools.lru_cache(maxsize=None)
+def _dataclass_field_names(cls: type) -> Tuple[str, ...]:
+    """Field names of a dataclass, looked up once per class."""
+    return tuple(f.name for f in fields(cls))
+
+
+def _json_default(obj: Any) -> Any:
+    """Serialize review dataclasses and enums that the JSON encoder does not handle natively."""
+    if isinstance(obj, Enum):
+        return obj.value
+    if is_dataclass(obj):
+        return {name: getattr(obj, name) for name in _dataclass_field_names(type(obj))}
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+# Prefer orjson for the report and review-comment JSON when it is installed;
+# it serializes dataclasses and enums natively
+try:
+    import orjson
+    _json_loads = orjson.loads
+    
+    def _json_dumps_pretty(obj: Any) -> str:
+        return orjson.dumps(obj, default=_json_default,
+                            option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode('utf-8')
+except ImportError:
+    _json_loads = json.loads
+    
+    def _json_dumps_pretty(obj: Any) -> str:
+        return json.dumps(obj, indent=2, ensure_ascii=False, default=_json_default)
+
 logger = logging.getLogger(__name__)
 
+# Shared across agents so re-reviewing the same PR in one process skips the LLM.
+# Only deterministic (temperature 0) requests are cached: a sampled answer, such as a
+# malformed JSON comment list, must not be replayed on every re-run for the whole TTL.
+# Near-duplicate prompts also hit when sentence-transformers is installed.
+_RESPONSE_CACHE = LLMCache(max_temperature=0.0, embed_fn=default_embedder())
+
+# Plain lookups instead of the Enum .value descriptor in the per-finding loops
+_SEVERITY_VALUE = {severity: severity.value for severity in Severity}
+_SEVERITY_LABEL = {severity: severity.value.upper() for severity in Severity}
+
+_ANALYSIS_MAX_TOKENS = 3000
+# The analysis summarizes findings the agents already made, so it is sampled
+# deterministically and can be served from _RESPONSE_CACHE
+_ANALYSIS_TEMPERATURE = 0.0
+_ANALYSIS_UNAVAILABLE = "Unable to generate detailed analysis due to AI service unavailability."
+# Used instead of an LLM analysis when the agents reported nothing to consolidate
+_NO_FINDINGS_ANALYSIS = "No issues found by any agent."
+
+# JSON review comment requests: sampling, retries and backoff between retries in seconds
+_JSON_COMMENTS_TEMPERATURE = 0.2  # Slightly higher for more diverse responses
+_JSON_COMMENTS_MAX_TOKENS = 4000  # Reduced to avoid model limits
+_JSON_COMMENTS_MAX_RETRIES = 2
+_RETRY_BASE_DELAY = 1.0
+_RETRY_MAX_DELAY = 60.0
+
+# Patterns used when scanning agent summaries and model output
+_LINE_RE = re.compile(r'line\s*(\d+)', re.IGNORECASE)
+_KEYWORD_RE = re.compile(r'(?:issue|problem|vulnerability|warning|concern):', re.IGNORECASE)
+_DIFF_RE = re.compile(r'diff --git a/(\S+) b/(\S+)')
+_PLUS_RE = re.compile(r'\+\+\+ b/(\S+)')
+_JSON_BLOCK_RE = re.compile(r'```(?:json)?\s*(\[.*?\])\s*```', re.DOTALL)
+_TRAILING_WHITESPACE_RE = re.compile(r'[ \t]+$', re.MULTILINE)
+
+# Characters of the original code quoted in the consolidated analysis prompt
+_CODE_EXCERPT_CHARS = 1000
+
+
+def _truncate(text: str, limit: int = _CODE_EXCERPT_CHARS) -> Tuple[str, str]:
+    """
+    Cut text to at most limit characters for quoting in a prompt.
+    
+    The excerpt's line endings and trailing whitespace are normalized so that
+    the same code produces the same prompt, whatever editor or platform it came from.
+    
+    Returns:
+        Tuple of (excerpt, "..." if text was cut else "")
+    """
+    excerpt = _TRAILING_WHITESPACE_RE.sub('', text[:limit].replace('\r\n', '\n'))
+    return excerpt, "..." if len(text) > limit else ""
+
+
+# Recommendations mentioning any of these are treated as high priority
+PRIORITY_KEYWORDS = (
+    'security', 'vulnerability', 'critical', 'fix immediately',
+    'performance', 'bottleneck', 'memory leak', 'sql injection',
+    'xss', 'authentication', 'authorization'
+)
+
+# Single-pass multi-keyword matcher; the regex alternation is the fallback when
+# ahocorasick_rs is not installed
+if ahocorasick_rs is not None:
+    _PRIORITY_AC = ahocorasick_rs.AhoCorasick(PRIORITY_KEYWORDS, matchkind=ahocorasick_rs.MATCHKIND_LEFTMOST_FIRST)
+    
+    def _has_priority_keyword(text: str) -> bool:
+        return bool(_PRIORITY_AC.find_matches_as_indexes(text))
+else:
+    _PRIORITY_RE = re.compile('|'.join(map(re.escape, PRIORITY_KEYWORDS)))
+    
+    def _has_priority_keyword(text: str) -> bool:
+        return _PRIORITY_RE.search(text) is not None
+
+# Static instructions live in the system message and stay byte-for-byte identical
+# across calls so provider-side prompt prefix caching can reuse them; only the
+# per-review data goes into the user message.
+CONSOLIDATION_SYSTEM_PROMPT = """You are a senior technical lead specializing in consolidating multiple code review reports. Provide comprehensive analysis and actionable recommendations.
+
+You will be given the original code, a summary of each specialized agent's review and the key findings.
+
+Provide a comprehensive consolidated analysis that:
+
+1. **Cross-Agent Correlation**: Identify patterns and connections between different agents' findings
+2. **Priority Assessment**: Rank issues by business impact and technical risk
+3. **Root Cause Analysis**: Identify underlying causes that contribute to multiple issues
+4. **Implementation Roadmap**: Suggest a logical order for addressing issues
+5. **Trade-off Analysis**: Highlight any conflicts between different recommendations
+6. **Quality Gates**: Recommend what must be fixed before code can be deployed
+
+Structure your response as a detailed technical analysis that helps developers understand:
+- Which issues are interconnected
+- What to fix first and why
+- How different aspects of code quality relate to each other
+- Long-term implications of current code state
+
+Be specific, actionable, and focus on helping the development team make informed decisions."""
+
+REVIEW_GOAL = """**Goal:**
+Review each hunk of diff and agent feedback
+    - If there is any feedback for that hunk: Provide crisp feedback with line numbers and suggest the change to be made.
+    - If there is no feedback for that hunk: Ignore and move on the next hunk.
+    - Do not provide a highly verbose review, so that its not overwhelming for the user to read.
+"""
+
+OUTPUT_FORMAT = """
+CRITICAL: Your response must be ONLY a valid JSON array. Do not include any other text, explanations, or markdown formatting.
+
+Output format (return ONLY this JSON, nothing else):
+[
+    {
+        "file_path": "filename.js",
+        "line_number": 10,
+        "review_comment": "Specific issue description and suggested fix"
+    }
+]
+
+If no issues found, return: []
+"""
+
+JSON_COMMENTS_SYSTEM_PROMPT = f"""You are a senior technical lead consolidating code review reports.
+
+{REVIEW_GOAL}
+
+{OUTPUT_FORMAT}
+
+CRITICAL CONSOLIDATION INSTRUCTIONS:
+1. ANALYZE ALL AGENT FEEDBACK thoroughly - do not miss any issues mentioned by any agent
+2. DEDUPLICATE similar findings: If multiple agents mention the same issue on the same line or similar lines, consolidate them into ONE comprehensive review comment
+3. PRIORITIZE the most actionable and specific feedback
+4. COMBINE related issues: If agents mention related problems (e.g., "input validation" from security and "parameter validation" from coding practices), merge them into one comprehensive comment
+5. FOCUS on unique, distinct issues - ensure ALL different types of issues are captured
+6. Extract specific line numbers where mentioned and create crisp, actionable review comments
+7. BE COMPREHENSIVE: If agents found multiple different issues, ensure ALL are included in the final output
+
+QUALITY REQUIREMENTS:
+- NEVER ignore or skip issues mentioned by agents
+- ALWAYS provide COMPLETE review comments with specific code suggestions
+- NEVER use placeholder text like "(Recommendation details not provided)" or truncate responses
+- Each review_comment must be fully detailed and actionable with specific fix suggestions
+- If multiple agents found different issues on different lines, include ALL of them
+
+Consolidate the agent reviews you are given into the JSON format specified above, ensuring NO DUPLICATE issues for the same line but INCLUDING ALL DISTINCT ISSUES found by any agent."""
 
-@dataclass
+
+@dataclass(**DATACLASS_SLOTS)
 class ConsolidatedReview:
     """Represents the final consolidated review from all agents."""
     overall_score: int  # 1-10 scale
@@ -31,45 +224,42 @@ class ConsolidatedReview:
 class ConsolidationAgent:
     """Agent responsible for consolidating reviews from all specialized agents."""
     
-    def __init__(self, is_local: bool = False, creativity_level: float = 0.2):
+    def __init__(self, is_local: bool = False, creativity_level: float = 0.2, max_concurrency: int = 4):
         """
         Initialize the consolidation agent.
         
         Args:
             is_local: Whether to use local Ollama (True) or Azure OpenAI (False)
-            creativity_level: Temperature for AI responses (0.0-1.0)
+            creativity_level: Creativity level of the shared LLM instance (0.0-1.0); the
+                analysis itself is sampled at temperature 0 so it can be cached
+            max_concurrency: Maximum LLM requests this agent has in flight at once
         """
         self.is_local = is_local
         self.creativity_level = creativity_level
         
+        # Shared by every thread and event loop using this agent, unlike an asyncio.Semaphore
+        self._request_slots = threading.BoundedSemaphore(max_concurrency)
+        
         # Get LLM instance through the sandbox manager
-        self.llm_client = SandboxInstances.get_instance(
-            name="consolidation_agent",
-            is_local=is_local,
-            creativity_level=creativity_level
+        self.llm_client = CachedLLMClient(
+            SandboxInstances.get_instance(
+                name="consolidation_agent",
+                is_local=is_local,
+                creativity_level=creativity_level
+            ),
+            _RESPONSE_CACHE
         )
     
     def _make_api_request(self, prompt: str) -> Optional[str]:
         """Make a request to the AI model through the LLM client."""
         try:
-            # Prepare messages for chat completion
-            messages = [
-                {
-                    "role": "system",
-                    "content": "You are a senior technical lead specializing in consolidating multiple code review reports. Provide comprehensive analysis and actionable recommendations."
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ]
-            
             # Make request through the LLM client
-            response = self.llm_client.chat_completion(
-                messages=messages,
-                temperature=self.creativity_level,
-                max_tokens=3000
-            )
+            with self._request_slots:
+                response = self.llm_client.chat_completion(
+                    messages=self._analysis_messages(prompt),
+                    temperature=_ANALYSIS_TEMPERATURE,
+                    max_tokens=_ANALYSIS_MAX_TOKENS
+                )
             
             if response:
                 logger.debug("ConsolidationAgent completed successfully")
@@ -82,37 +272,140 @@ class ConsolidationAgent:
             logger.error(f"Error in ConsolidationAgent: {e}")
             return None
     
+    @staticmethod
+    def _analysis_messages(prompt: str) -> List[Dict[str, str]]:
+        """Chat messages for a consolidated analysis prompt."""
+        return [
+            {
+                "role": "system",
+                "content": CONSOLIDATION_SYSTEM_PROMPT
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ]
+    
+    async def _make_api_request_async(self, prompt: str) -> Optional[str]:
+        """Make a request to the AI model on a worker thread without blocking the event loop."""
+        return await asyncio.to_thread(self._make_api_request, prompt)
+    
     def consolidate_reviews(self, agent_reviews: List[AgentReview], 
                           original_code: str) -> ConsolidatedReview:
         """Consolidate multiple agent reviews into a single comprehensive review."""
+        return run_sync(self.consolidate_reviews_async(agent_reviews, original_code))
+    
+    async def consolidate_with_comments_async(self, agent_reviews: List[AgentReview], original_code: str,
+                                              file_path: str, extracted_files: Optional[List[str]] = None
+                                              ) -> Tuple[ConsolidatedReview, str]:
+        """
+        Consolidate agent reviews and generate the JSON review comments concurrently.
+        
+        The JSON comments only depend on the agent reviews, so both LLM calls
+        are in flight at the same time instead of one after the other.
+        
+        Args:
+            agent_reviews: Reviews produced by the specialized agents
+            original_code: The code or diff that was reviewed
+            file_path: Fallback file path for comments
+            extracted_files: File paths found in the diff, if already known
+            
+        Returns:
+            Tuple of (consolidated review, JSON review comments)
+        """
+        consolidated_review, json_comments = await asyncio.gather(
+            self.consolidate_reviews_async(agent_reviews, original_code),
+            self._agenerate_json_review_comments(agent_reviews, file_path, extracted_files)
+        )
+        return consolidated_review, json_comments
+    
+    async def consolidate_reviews_async(self, agent_reviews: List[AgentReview], 
+                                        original_code: str) -> ConsolidatedReview:
+        """Async counterpart of consolidate_reviews; the LLM analysis runs on a worker thread."""
+        consolidated_review, all_findings, agent_summaries = self._aggregate_reviews(agent_reviews)
+        if not all_findings:
+            consolidated_review.detailed_analysis = _NO_FINDINGS_ANALYSIS
+            return consolidated_review
+        
+        # Generate AI-powered consolidated summary and analysis
+        consolidated_review.detailed_analysis = await self._generate_consolidated_analysis(
+            agent_summaries, all_findings, original_code
+        )
+        return consolidated_review
+    
+    def consolidate_reviews_batch(self, reviews: List[Tuple[List[AgentReview], str]],
+                                  use_batch_api: bool = True) -> List[ConsolidatedReview]:
+        """
+        Consolidate the agent reviews of many PRs, submitting their analyses as one batch job.
+        
+        Args:
+            reviews: (agent_reviews, original_code) pairs, one per PR
+            use_batch_api: Whether to use the Azure OpenAI Batch API; Ollama always runs directly
+            
+        Returns:
+            Consolidated reviews in the same order as reviews
+        """
+        aggregated = [self._aggregate_reviews(agent_reviews) for agent_reviews, _ in reviews]
+        
+        # Only reviews with findings need an LLM analysis
+        pending = [index for index, (_, all_findings, _) in enumerate(aggregated) if all_findings]
+        message_lists = [
+            self._analysis_messages(self._build_analysis_prompt(aggregated[index][2], aggregated[index][1],
+                                                                reviews[index][1]))
+            for index in pending
+        ]
+        
+        processor = BatchProcessor(self.llm_client, use_batch_api=use_batch_api)
+        responses = processor.run(message_lists, temperature=_ANALYSIS_TEMPERATURE,
+                                  max_tokens=_ANALYSIS_MAX_TOKENS)
+        
+        consolidated_reviews = [consolidated_review for consolidated_review, _, _ in aggregated]
+        for consolidated_review in consolidated_reviews:
+            consolidated_review.detailed_analysis = _NO_FINDINGS_ANALYSIS
+        for index, response in zip(pending, responses):
+            consolidated_reviews[index].detailed_analysis = response if response else _ANALYSIS_UNAVAILABLE
+        return consolidated_reviews
+    
+    def _aggregate_reviews(self, agent_reviews: List[AgentReview]
+                           ) -> Tuple[ConsolidatedReview, List[ReviewFinding], List[str]]:
+        """
+        Aggregate findings, scores and recommendations of the agent reviews.
+        
+        Returns:
+            Tuple of (consolidated review without detailed analysis, all findings,
+            per-agent summary lines for the analysis prompt)
+        """
+        
+        # Flatten findings and recommendations at C level instead of extending per review
+        all_findings = list(itertools.chain.from_iterable(review.findings for review in agent_reviews))
+        all_recommendations = list(itertools.chain.from_iterable(review.recommendations for review in agent_reviews))
+        
+        # Scores and summary lines per agent
+        agent_summaries = []
+        total_score = 0
+        for review in agent_reviews:
+            total_score += review.overall_score
+            findings_summary = f"{len(review.findings)} findings" if review.findings else "no major issues"
+            agent_summaries.append(f"- {review.agent_name}: Score {review.overall_score}/10, {findings_summary}")
         
         # Aggregate findings and statistics
-        all_findings = []
         critical_issues = []
-        all_recommendations = []
         findings_by_category = defaultdict(list)
         severity_distribution = defaultdict(int)
-        
-        for review in agent_reviews:
-            all_findings.extend(review.findings)
-            all_recommendations.extend(review.recommendations)
+        for finding in all_findings:
+            if finding.severity == Severity.CRITICAL:
+                critical_issues.append(finding)
             
-            for finding in review.findings:
-                if finding.severity == Severity.CRITICAL:
-                    critical_issues.append(finding)
-                
-                findings_by_category[finding.agent_type].append(finding)
-                severity_distribution[finding.severity.value] += 1
+            findings_by_category[finding.agent_type].append(finding)
+            severity_distribution[_SEVERITY_VALUE[finding.severity]] += 1
+        
+        # Freeze the defaultdicts so missing keys raise like a plain dict, without copying them
+        findings_by_category.default_factory = None
+        severity_distribution.default_factory = None
         
         # Calculate overall score (weighted average of agent scores)
-        total_score = sum(review.overall_score for review in agent_reviews)
         overall_score = round(total_score / len(agent_reviews)) if agent_reviews else 5
         
-        # Generate AI-powered consolidated summary and analysis
-        detailed_analysis = self._generate_consolidated_analysis(
-            agent_reviews, all_findings, original_code
-        )
-        
         # Extract high-priority recommendations
         high_priority_recommendations = self._extract_high_priority_recommendations(
             all_recommendations, critical_issues
@@ -129,81 +422,62 @@ class ConsolidationAgent:
             agent_reviews=agent_reviews,
             critical_issues=critical_issues,
             high_priority_recommendations=high_priority_recommendations,
-            findings_by_category=dict(findings_by_category),
-            severity_distribution=dict(severity_distribution),
-            detailed_analysis=detailed_analysis
-        )
+            findings_by_category=findings_by_category,
+            severity_distribution=severity_distribution,
+            detailed_analysis=""
+        ), all_findings, agent_summaries
     
-    def _generate_consolidated_analysis(self, agent_reviews: List[AgentReview], 
+    async def _generate_consolidated_analysis(self, agent_summaries: List[str], 
                                       all_findings: List[ReviewFinding], 
                                       original_code: str) -> str:
         """Generate detailed consolidated analysis using AI."""
+        prompt = self._build_analysis_prompt(agent_summaries, all_findings, original_code)
+        response = await self._make_api_request_async(prompt)
+        return response if response else _ANALYSIS_UNAVAILABLE
+    
+    def _build_analysis_prompt(self, agent_summaries: List[str], 
+                               all_findings: List[ReviewFinding], 
+                               original_code: str) -> str:
+        """Build the user prompt for the consolidated analysis from the per-agent summary lines."""
         
-        # Prepare summary of all agent findings
-        agent_summaries = []
-        for review in agent_reviews:
-            findings_summary = f"{len(review.findings)} findings" if review.findings else "no major issues"
-            agent_summaries.append(f"- {review.agent_name}: Score {review.overall_score}/10, {findings_summary}")
-        
-        findings_summary = []
-        for finding in all_findings[:10]:  # Limit to top 10 findings
-            findings_summary.append(f"- [{finding.severity.value.upper()}] {finding.title}")
+        findings_summary = "\n".join(  # Limit to top 10 findings
+            f"- [{_SEVERITY_LABEL[finding.severity]}] {finding.title}" for finding in all_findings[:10]
+        )
+        agent_summary = "\n".join(agent_summaries)
+        code_excerpt, ellipsis = _truncate(original_code)
         
-        prompt = f"""You are a senior technical lead consolidating multiple specialized code review reports.
-
-Original Code:
+        prompt = f"""Original Code:
 ```
-{original_code[:1000]}{'...' if len(original_code) > 1000 else ''}
+{code_excerpt}{ellipsis}
 ```
 
 Agent Review Summary:
-{chr(10).join(agent_summaries)}
+{agent_summary}
 
 Key Findings:
-{chr(10).join(findings_summary)}
-
-Provide a comprehensive consolidated analysis that:
-
-1. **Cross-Agent Correlation**: Identify patterns and connections between different agents' findings
-2. **Priority Assessment**: Rank issues by business impact and technical risk
-3. **Root Cause Analysis**: Identify underlying causes that contribute to multiple issues
-4. **Implementation Roadmap**: Suggest a logical order for addressing issues
-5. **Trade-off Analysis**: Highlight any conflicts between different recommendations
-6. **Quality Gates**: Recommend what must be fixed before code can be deployed
-
-Structure your response as a detailed technical analysis that helps developers understand:
-- Which issues are interconnected
-- What to fix first and why
-- How different aspects of code quality relate to each other
-- Long-term implications of current code state
-
-Be specific, actionable, and focus on helping the development team make informed decisions."""
-        
-        response = self._make_api_request(prompt)
-        return response if response else "Unable to generate detailed analysis due to AI service unavailability."
+{findings_summary}"""
+        return prompt
     
     def _extract_high_priority_recommendations(self, all_recommendations: List[str], 
                                              critical_issues: List[ReviewFinding]) -> List[str]:
         """Extract and prioritize the most important recommendations."""
         
         high_priority = []
+        seen = set()
         
         # Add recommendations for critical issues
         for issue in critical_issues:
             if issue.suggestion:
-                high_priority.append(f"CRITICAL: {issue.suggestion}")
+                rec = f"CRITICAL: {issue.suggestion}"
+                if rec not in seen:
+                    seen.add(rec)
+                    high_priority.append(rec)
         
         # Use keyword-based prioritization for other recommendations
-        priority_keywords = [
-            'security', 'vulnerability', 'critical', 'fix immediately',
-            'performance', 'bottleneck', 'memory leak', 'sql injection',
-            'xss', 'authentication', 'authorization'
-        ]
-        
         for rec in all_recommendations:
-            if any(keyword in rec.lower() for keyword in priority_keywords):
-                if rec not in high_priority:
-                    high_priority.append(rec)
+            if rec not in seen and _has_priority_keyword(rec.lower()):
+                seen.add(rec)
+                high_priority.append(rec)
         
         return high_priority[:10]  # Limit to top 10
     
@@ -211,7 +485,7 @@ Be specific, actionable, and focus on helping the development team make informed
                                    overall_score: int, critical_count: int) -> str:
         """Generate an executive summary of the consolidated review."""
         
-        agent_names = [review.agent_type.replace('_', ' ').title() for review in agent_reviews]
+        agent_names = [_agent_display_name(review.agent_type) for review in agent_reviews]
         agent_list = ', '.join(agent_names)
         
         if overall_score >= 8:
@@ -242,44 +516,9 @@ Review covers security, performance, coding practices, architecture, readability
     
     def _generate_json_report(self, review: ConsolidatedReview) -> str:
         """Generate a JSON format report."""
-        # Convert dataclass to dict, handling nested objects
-        def serialize_finding(finding):
-            return {
-                'agent_type': finding.agent_type,
-                'severity': finding.severity.value,
-                'title': finding.title,
-                'description': finding.description,
-                'line_number': finding.line_number,
-                'code_snippet': finding.code_snippet,
-                'suggestion': finding.suggestion,
-                'category': finding.category
-            }
-        
-        def serialize_agent_review(agent_review):
-            return {
-                'agent_name': agent_review.agent_name,
-                'agent_type': agent_review.agent_type,
-                'overall_score': agent_review.overall_score,
-                'summary': agent_review.summary,
-                'findings': [serialize_finding(f) for f in agent_review.findings],
-                'recommendations': agent_review.recommendations
-            }
-        
-        report_dict = {
-            'overall_score': review.overall_score,
-            'summary': review.summary,
-            'agent_reviews': [serialize_agent_review(ar) for ar in review.agent_reviews],
-            'critical_issues': [serialize_finding(ci) for ci in review.critical_issues],
-            'high_priority_recommendations': review.high_priority_recommendations,
-            'findings_by_category': {
-                k: [serialize_finding(f) for f in v] 
-                for k, v in review.findings_by_category.items()
-            },
-            'severity_distribution': review.severity_distribution,
-            'detailed_analysis': review.detailed_analysis
-        }
-        
-        return json.dumps(report_dict, indent=2, ensure_ascii=False)
+        # ConsolidatedReview's fields are the report keys; nested findings and
+        # agent reviews are serialized straight from their dataclasses
+        return _json_dumps_pretty(review)
     
     def _generate_json_issues_markdown(self, review: ConsolidatedReview) -> str:
         """Generate a JSON list of review comments in the specified format."""
@@ -290,7 +529,7 @@ Review covers security, performance, coding practices, architecture, readability
         
         # Process each agent review to extract line-specific feedback
         for agent_review in review.agent_reviews:
-            agent_name = agent_review.agent_type.replace('_', ' ').title()
+            agent_name = _agent_display_name(agent_review.agent_type)
             
             # Parse the agent summary to extract line-specific issues
             summary_lines = agent_review.summary.split('\n')
@@ -305,35 +544,35 @@ Review covers security, performance, coding practices, architecture, readability
                 review_comment = ""
                 
                 # Try to extract line numbers from the summary
-                import re
-                line_match = re.search(r'line\s*(\d+)', line, re.IGNORECASE)
+                line_match = _LINE_RE.search(line)
                 if line_match:
                     line_number = int(line_match.group(1))
                 
                 # Generate review comment based on agent type and content
-                if any(keyword in line.lower() for keyword in ['issue:', 'problem:', 'vulnerability:', 'warning:', 'concern:']):
+                if _KEYWORD_RE.search(line):
                     # Extract the main issue
                     review_comment = line
+                    line_lower = line.lower()
                     
                     # Add specific suggestions based on agent type
                     if agent_review.agent_type == 'security':
-                        if 'sql injection' in line.lower():
+                        if 'sql injection' in line_lower:
                             review_comment += " Use parameterized queries instead of string concatenation."
-                        elif 'xss' in line.lower():
+                        elif 'xss' in line_lower:
                             review_comment += " Sanitize user input and use proper encoding."
-                        elif 'input validation' in line.lower():
+                        elif 'input validation' in line_lower:
                             review_comment += " Add proper input validation and sanitization."
                     
                     elif agent_review.agent_type == 'performance':
-                        if 'loop' in line.lower():
+                        if 'loop' in line_lower:
                             review_comment += " Consider using modern array methods like filter(), map(), or reduce()."
-                        elif 'inefficient' in line.lower():
+                        elif 'inefficient' in line_lower:
                             review_comment += " Optimize this operation for better performance."
                     
                     elif agent_review.agent_type == 'coding_practices':
-                        if 'var' in line.lower():
+                        if 'var' in line_lower:
                             review_comment += " Use 'const' or 'let' instead of 'var'."
-                        elif '==' in line.lower():
+                        elif '==' in line_lower:
                             review_comment += " Use strict equality (===) instead of loose equality (==)."
                 
                 # If we found a meaningful comment, add it to the list
@@ -354,37 +593,33 @@ Review covers security, performance, coding practices, architecture, readability
                     comment_obj = {
                         "file_path": file_path,
                         "line_number": None,
-                        "review_comment": f"{agent_review.agent_type.replace('_', ' ').title()}: {summary_excerpt}..."
+                        "review_comment": f"{_agent_display_name(agent_review.agent_type)}: {summary_excerpt}..."
                     }
                     review_comments.append(comment_obj)
         
         # Return as JSON array
-        return json.dumps(review_comments, indent=2, ensure_ascii=False)
+        return _json_dumps_pretty(review_comments)
     
-    def _extract_file_paths_from_diff(self, review: ConsolidatedReview) -> List[str]:
-        """Extract file paths from the diff content in the review."""
-        import re
-        
-        print("🔍 Starting file path extraction from diff content")
+    def _extract_file_paths_from_diff(self, agent_reviews: List[AgentReview]) -> List[str]:
+        """Extract file paths from the diff content in the review; the first agent whose summary has any wins."""
+        logger.debug("Starting file path extraction from diff content")
         
         # Try to get the original diff content from the first agent review
-        if review.agent_reviews:
-            print(f"📋 Found {len(review.agent_reviews)} agent reviews to check for diff content")
+        if agent_reviews:
+            logger.debug("Found %d agent reviews to check for diff content", len(agent_reviews))
             
             # Look for diff content in the agent summaries
-            for i, agent_review in enumerate(review.agent_reviews):
+            for i, agent_review in enumerate(agent_reviews):
                 summary = agent_review.summary
-                print(f"🔍 Checking agent review {i+1} ({agent_review.agent_type}) for diff content")
-                print(f"📏 Summary length: {len(summary)} characters")
-                
-                # Log first 500 characters of summary for debugging
-                summary_preview = summary[:500] + "..." if len(summary) > 500 else summary
-                print(f"📄 Summary preview: {summary_preview}")
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Checking agent review %d (%s) for diff content, summary length %d characters",
+                                 i + 1, agent_review.agent_type, len(summary))
+                    # Log first 500 characters of summary for debugging
+                    logger.debug("Summary preview: %s", summary[:500] + "..." if len(summary) > 500 else summary)
                 
                 # Look for diff headers like "diff --git a/file.js b/file.js"
-                diff_pattern = r'diff --git a/([^\s]+) b/([^\s]+)'
-                matches = re.findall(diff_pattern, summary)
-                print(f"🎯 Found {len(matches)} diff pattern matches: {matches}")
+                matches = _DIFF_RE.findall(summary)
+                logger.debug("Found %d diff pattern matches: %s", len(matches), matches)
                 
                 if matches:
                     # Extract unique file paths
@@ -392,67 +627,118 @@ Review covers security, performance, coding practices, architecture, readability
                     for old_path, new_path in matches:
                         file_paths.add(new_path)  # Use the new path (after changes)
                     extracted_files = list(file_paths)
-                    print(f"✅ Extracted file paths from diff pattern: {extracted_files}")
+                    logger.debug("Extracted file paths from diff pattern: %s", extracted_files)
                     return extracted_files
                 
                 # Also look for "+++ b/filename" patterns
-                plus_pattern = r'\+\+\+ b/([^\s\n]+)'
-                plus_matches = re.findall(plus_pattern, summary)
-                print(f"🎯 Found {len(plus_matches)} plus pattern matches: {plus_matches}")
+                plus_matches = _PLUS_RE.findall(summary)
+                logger.debug("Found %d plus pattern matches: %s", len(plus_matches), plus_matches)
                 
                 if plus_matches:
                     extracted_files = list(set(plus_matches))
-                    print(f"✅ Extracted file paths from plus pattern: {extracted_files}")
+                    logger.debug("Extracted file paths from plus pattern: %s", extracted_files)
                     return extracted_files
         else:
-            print("⚠️ No agent reviews found in consolidated review")
+            logger.debug("No agent reviews found in consolidated review")
         
-        print("❌ No file paths extracted from diff content")
+        logger.debug("No file paths extracted from diff content")
         return []
     
     def generate_json_review_comments(self, review: ConsolidatedReview, file_path: str, extracted_files: List[str] = None) -> str:
         """Generate JSON review comments using AI to format properly."""
+        return self._generate_json_review_comments(review.agent_reviews, file_path, extracted_files)
+    
+    def _generate_json_review_comments(self, agent_reviews: List[AgentReview], file_path: str,
+                                       extracted_files: Optional[List[str]] = None) -> str:
+        """Generate JSON review comments from the agent reviews alone, so it can run alongside consolidation."""
+        try:
+            messages, extracted_files = self._json_comments_messages(agent_reviews, file_path, extracted_files)
+            
+            # Make request through the LLM client with retry logic
+            response = None
+            for attempt in range(_JSON_COMMENTS_MAX_RETRIES + 1):
+                try:
+                    response = self._request_json_comments(messages)
+                    if response and response.strip():
+                        break
+                except Exception as e:
+                    logger.warning(f"Attempt {attempt + 1} failed: {e}")
+                    if attempt == _JSON_COMMENTS_MAX_RETRIES:
+                        logger.error(f"All {_JSON_COMMENTS_MAX_RETRIES + 1} attempts failed")
+                        return "[]"
+            
+            return self._parse_json_review_comments(response, file_path, extracted_files)
+        except Exception as e:
+            logger.error(f"Error generating JSON review comments: {e}")
+            return _json_dumps_pretty([])
+    
+    async def _agenerate_json_review_comments(self, agent_reviews: List[AgentReview], file_path: str,
+                                              extracted_files: Optional[List[str]] = None) -> str:
+        """
+        Async counterpart of _generate_json_review_comments.
         
-        print(f"🚀 generate_json_review_comments called with file_path: '{file_path}'")
+        Each attempt runs on a worker thread and failed attempts back off with
+        randomized exponential delays on the event loop, so retries never hold a
+        thread or block other consolidations.
+        """
+        try:
+            messages, extracted_files = self._json_comments_messages(agent_reviews, file_path, extracted_files)
+            
+            response = None
+            for attempt in range(_JSON_COMMENTS_MAX_RETRIES + 1):
+                if attempt:
+                    await asyncio.sleep(random.uniform(0, min(_RETRY_MAX_DELAY, _RETRY_BASE_DELAY * 2 ** attempt)))
+                try:
+                    response = await asyncio.to_thread(self._request_json_comments, messages)
+                    if response and response.strip():
+                        break
+                except Exception as e:
+                    logger.warning(f"Attempt {attempt + 1} failed: {e}")
+                    if attempt == _JSON_COMMENTS_MAX_RETRIES:
+                        logger.error(f"All {_JSON_COMMENTS_MAX_RETRIES + 1} attempts failed")
+                        return "[]"
+            
+            return self._parse_json_review_comments(response, file_path, extracted_files)
+        except Exception as e:
+            logger.error(f"Error generating JSON review comments: {e}")
+            return _json_dumps_pretty([])
+    
+    def _request_json_comments(self, messages: List[Dict[str, str]]) -> Optional[str]:
+        """Make one JSON review comment request through the LLM client."""
+        with self._request_slots:
+            return self.llm_client.chat_completion(
+                messages=messages,
+                temperature=_JSON_COMMENTS_TEMPERATURE,
+                max_tokens=_JSON_COMMENTS_MAX_TOKENS
+            )
+    
+    def _json_comments_messages(self, agent_reviews: List[AgentReview], file_path: str,
+                                extracted_files: Optional[List[str]]) -> Tuple[List[Dict[str, str]], List[str]]:
+        """
+        Build the chat messages for the JSON review comment request.
+        
+        Returns:
+            Tuple of (messages, file paths extracted from the diff)
+        """
+        logger.debug("generate_json_review_comments called with file_path: '%s'", file_path)
         
         # Use provided extracted files or try to extract from review
         if extracted_files is None:
-            extracted_files = self._extract_file_paths_from_diff(review)
-        print(f"📁 Extracted files: {extracted_files}")
+            extracted_files = self._extract_file_paths_from_diff(agent_reviews)
+        logger.debug("Extracted files: %s", extracted_files)
         
         # Prepare all agent findings for the consolidation agent
         agent_summaries = []
-        for agent_review in review.agent_reviews:
+        for agent_review in agent_reviews:
+            recommendations = "\n".join(f"- {rec}" for rec in agent_review.recommendations)
             agent_summaries.append(f"""
-**{agent_review.agent_type.replace('_', ' ').title()} Agent Review:**
+**{_agent_display_name(agent_review.agent_type)} Agent Review:**
 {agent_review.summary}
 
 **Recommendations:**
-{chr(10).join([f"- {rec}" for rec in agent_review.recommendations])}
+{recommendations}
 """)
         
-        REVIEW_GOAL = """**Goal:**
-Review each hunk of diff and agent feedback
-    - If there is any feedback for that hunk: Provide crisp feedback with line numbers and suggest the change to be made.
-    - If there is no feedback for that hunk: Ignore and move on the next hunk.
-    - Do not provide a highly verbose review, so that its not overwhelming for the user to read.
-"""
-
-        OUTPUT_FORMAT = """
-CRITICAL: Your response must be ONLY a valid JSON array. Do not include any other text, explanations, or markdown formatting.
-
-Output format (return ONLY this JSON, nothing else):
-[
-    {
-        "file_path": "filename.js",
-        "line_number": 10,
-        "review_comment": "Specific issue description and suggested fix"
-    }
-]
-
-If no issues found, return: []
-"""
-        
         # Create file context for the prompt
         file_context = ""
         if extracted_files:
@@ -460,133 +746,103 @@ If no issues found, return: []
         else:
             file_context = f"\nFile being reviewed: {file_path}\n"
         
-        prompt = f"""{REVIEW_GOAL}
-
-{OUTPUT_FORMAT}
-
-Agent Reviews to Consolidate:
-{chr(10).join(agent_summaries)}
-{file_context}
-
-CRITICAL CONSOLIDATION INSTRUCTIONS:
-1. ANALYZE ALL AGENT FEEDBACK thoroughly - do not miss any issues mentioned by any agent
-2. DEDUPLICATE similar findings: If multiple agents mention the same issue on the same line or similar lines, consolidate them into ONE comprehensive review comment
-3. PRIORITIZE the most actionable and specific feedback
-4. COMBINE related issues: If agents mention related problems (e.g., "input validation" from security and "parameter validation" from coding practices), merge them into one comprehensive comment
-5. FOCUS on unique, distinct issues - ensure ALL different types of issues are captured
-6. Extract specific line numbers where mentioned and create crisp, actionable review comments
-7. BE COMPREHENSIVE: If agents found multiple different issues, ensure ALL are included in the final output
+        reviews_text = "\n".join(agent_summaries)
+        prompt = f"""Agent Reviews to Consolidate:
+{reviews_text}
+{file_context}"""
 
-QUALITY REQUIREMENTS:
-- NEVER ignore or skip issues mentioned by agents
-- ALWAYS provide COMPLETE review comments with specific code suggestions
-- NEVER use placeholder text like "(Recommendation details not provided)" or truncate responses
-- Each review_comment must be fully detailed and actionable with specific fix suggestions
-- If multiple agents found different issues on different lines, include ALL of them
-
-Please consolidate these agent reviews into the JSON format specified above, ensuring NO DUPLICATE issues for the same line but INCLUDING ALL DISTINCT ISSUES found by any agent."""
-
-        try:
-            # Prepare messages for chat completion with JSON formatting instructions
-            messages = [
-                {
-                    "role": "system", 
-                    "content": f"You are a senior technical lead consolidating code review reports. {REVIEW_GOAL}\n\n{OUTPUT_FORMAT}"
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ]
-            
-            # Make request through the LLM client with retry logic
-            import json
-            max_retries = 2
-            response = None
-            
-            for attempt in range(max_retries + 1):
-                try:
-                    response = self.llm_client.chat_completion(
-                        messages=messages,
-                        temperature=0.2,  # Slightly higher for more diverse responses
-                        max_tokens=4000  # Reduced to avoid model limits
-                    )
-                    if response and response.strip():
-                        break
-                except Exception as e:
-                    logger.warning(f"Attempt {attempt + 1} failed: {e}")
-                    if attempt == max_retries:
-                        logger.error(f"All {max_retries + 1} attempts failed")
-                        return "[]"
-            
-            if response:
-                print(f"🤖 AI response received: {response[:500]}...")
+        messages = [
+            {
+                "role": "system", 
+                "content": JSON_COMMENTS_SYSTEM_PROMPT
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ]
+        return messages, extracted_files
+    
+    def _parse_json_review_comments(self, response: Optional[str], file_path: str,
+                                    extracted_files: List[str]) -> str:
+        """Parse the model's JSON review comments and point each at a file from the diff."""
+        if not response:
+            return _json_dumps_pretty([])
+        
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("AI response received: %s...", response[:500])
+        
+        # Fast path: the model returned a bare JSON array as instructed
+        text = response.strip()
+        parsed_json = None
+        if text.startswith('['):
+            try:
+                parsed_json = _json_loads(text)
+            except json.JSONDecodeError:
+                pass
+            else:
+                if not isinstance(parsed_json, list):
+                    return _json_dumps_pretty([])
+                logger.debug("Successfully parsed JSON with %d items", len(parsed_json))
+                self._assign_comment_file_paths(parsed_json, file_path, extracted_files)
+                final_json = _json_dumps_pretty(parsed_json)
+                logger.debug("Final JSON output: %s", final_json)
+                return final_json
+        
+        # Otherwise pull the array out of a fenced block, or take everything between the
+        # outermost brackets, and parse that once
+        json_match = _JSON_BLOCK_RE.search(text)
+        if json_match:
+            json_str = json_match.group(1)
+        else:
+            start, end = text.find('['), text.rfind(']')
+            json_str = text[start:end + 1] if 0 <= start < end else ""
+        
+        if json_str:
+            try:
+                parsed_json = _json_loads(json_str)
+            except json.JSONDecodeError:
+                parsed_json = None
+            if isinstance(parsed_json, list):
+                for i, item in enumerate(parsed_json):
+                    if isinstance(item, dict):
+                        # If we have extracted files, use them
+                        if extracted_files:
+                            # Use round-robin distribution across extracted files
+                            file_index = i % len(extracted_files)
+                            item['file_path'] = extracted_files[file_index]
+                        else:
+                            item['file_path'] = file_path
+                return _json_dumps_pretty(parsed_json)
+        
+        # Fallback: return empty array if there is no response or parsing fails
+        return _json_dumps_pretty([])
+    
+    @staticmethod
+    def _assign_comment_file_paths(comments: List[Any], file_path: str, extracted_files: List[str]) -> None:
+        """Point each parsed comment at one of the diff's files, keeping paths the model already got right."""
+        # Update file paths to actual files from diff
+        for i, item in enumerate(comments):
+            if isinstance(item, dict):
+                original_file_path = item.get('file_path', 'unknown')
+                logger.debug("Item %d original file_path: '%s'", i + 1, original_file_path)
                 
-                # Try to parse and validate the JSON
-                try:
-                    parsed_json = json.loads(response.strip())
-                    print(f"✅ Successfully parsed JSON with {len(parsed_json)} items")
+                # If we have extracted files, try to match the comment to the right file
+                if extracted_files:
+                    # Try to match based on line number or use round-robin distribution
+                    original_file_path = item.get('file_path', 'unknown')
                     
-                    if isinstance(parsed_json, list):
-                        # Update file paths to actual files from diff
-                        for i, item in enumerate(parsed_json):
-                            if isinstance(item, dict):
-                                original_file_path = item.get('file_path', 'unknown')
-                                print(f"📝 Item {i+1} original file_path: '{original_file_path}'")
-                                
-                                # If we have extracted files, try to match the comment to the right file
-                                if extracted_files:
-                                    # Try to match based on line number or use round-robin distribution
-                                    original_file_path = item.get('file_path', 'unknown')
-                                    
-                                    # If the AI already set a reasonable file path, keep it
-                                    if original_file_path != 'unknown' and any(extracted_file in original_file_path for extracted_file in extracted_files):
-                                        new_file_path = original_file_path
-                                        print(f"🔄 Item {i+1} keeping AI-set file_path: '{new_file_path}'")
-                                    else:
-                                        # Use round-robin distribution across extracted files
-                                        file_index = i % len(extracted_files)
-                                        new_file_path = extracted_files[file_index]
-                                        print(f"🔄 Item {i+1} distributed to file: '{new_file_path}' (index {file_index})")
-                                    
-                                    item['file_path'] = new_file_path
-                                else:
-                                    item['file_path'] = file_path
-                                    print(f"🔄 Item {i+1} set file_path to fallback: '{file_path}'")
-                        
-                        final_json = json.dumps(parsed_json, indent=2, ensure_ascii=False)
-                        print(f"📤 Final JSON output: {final_json}")
-                        return final_json
-                except json.JSONDecodeError:
-                    # If JSON parsing fails, try to extract JSON from markdown blocks
-                    import re
-                    json_match = re.search(r'```json\s*\n(.*?)\n```', response, re.DOTALL)
-                    if not json_match:
-                        json_match = re.search(r'(\[.*?\])', response, re.DOTALL)
+                    # If the AI already set a reasonable file path, keep it
+                    if original_file_path != 'unknown' and any(extracted_file in original_file_path for extracted_file in extracted_files):
+                        new_file_path = original_file_path
+                        logger.debug("Item %d keeping AI-set file_path: '%s'", i + 1, new_file_path)
+                    else:
+                        # Use round-robin distribution across extracted files
+                        file_index = i % len(extracted_files)
+                        new_file_path = extracted_files[file_index]
+                        logger.debug("Item %d distributed to file: '%s' (index %d)", i + 1, new_file_path, file_index)
                     
-                    if json_match:
-                        json_str = json_match.group(1)
-                        try:
-                            parsed_json = json.loads(json_str)
-                            if isinstance(parsed_json, list):
-                                for i, item in enumerate(parsed_json):
-                                    if isinstance(item, dict):
-                                        # If we have extracted files, use them
-                                        if extracted_files:
-                                            # Use round-robin distribution across extracted files
-                                            file_index = i % len(extracted_files)
-                                            item['file_path'] = extracted_files[file_index]
-                                        else:
-                                            item['file_path'] = file_path
-                                return json.dumps(parsed_json, indent=2, ensure_ascii=False)
-                        except json.JSONDecodeError:
-                            pass
-                
-                # Fallback: return empty array if parsing fails
-                return json.dumps([], indent=2, ensure_ascii=False)
-            else:
-                return json.dumps([], indent=2, ensure_ascii=False)
-                
-        except Exception as e:
-            logger.error(f"Error generating JSON review comments: {e}")
-            return json.dumps([], indent=2, ensure_ascii=False)
+                    item['file_path'] = new_file_path
+                else:
+                    item['file_path'] = file_path
+                    logger.debug("Item %d set file_path to fallback: '%s'", i + 1, file_path)
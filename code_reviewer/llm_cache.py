@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+LLM response cache for the code review agents
+"""
+
+import asyncio
+import functools
+import hashlib
+import importlib.util
+import json
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Sentence embedding model for semantic lookups; only used when sentence-transformers is installed
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+
+class InMemoryBackend:
+    """Process-local LRU store with per-entry expiry."""
+
+    def __init__(self, max_entries: int = 512):
+        """
+        Initialize the backend.
+
+        Args:
+            max_entries: Maximum number of responses kept before the oldest are evicted
+        """
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the stored value, or None if missing or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        """Store a value for ttl seconds."""
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+class LLMCache:
+    """
+    Two-tier cache for chat completion responses.
+
+    Exact hits are found by hashing (model, messages, temperature). When an
+    embedding function is supplied, a miss falls back to comparing the user
+    message with previously cached ones and reuses a response whose prompt is
+    at least `threshold` cosine-similar. Requests sampled above
+    `max_temperature` are never cached since their answers are meant to vary.
+    """
+
+    def __init__(self, backend: Optional[Any] = None, ttl: float = 24 * 3600, threshold: float = 0.87,
+                 embed_fn: Optional[Callable[[str], List[float]]] = None, max_semantic_entries: int = 256,
+                 max_temperature: float = 0.0):
+        """
+        Initialize the cache.
+
+        Args:
+            backend: Object with get(key) and set(key, value, ttl); defaults to an in-memory LRU
+            ttl: Seconds a cached response stays valid
+            threshold: Minimum cosine similarity for a semantic hit
+            embed_fn: Function embedding a prompt; semantic lookups are disabled when None
+            max_semantic_entries: Maximum number of prompt embeddings kept for semantic lookups
+            max_temperature: Highest sampling temperature whose responses are cached
+        """
+        self.backend = backend if backend is not None else InMemoryBackend()
+        self.ttl = ttl
+        self.threshold = threshold
+        self.embed_fn = embed_fn
+        self.max_semantic_entries = max_semantic_entries
+        self.max_temperature = max_temperature
+        self._semantic_index: List[Tuple[str, List[float]]] = []
+        self._lock = threading.Lock()
+
+    def accepts(self, temperature: float) -> bool:
+        """Whether responses sampled at this temperature may be cached."""
+        return temperature <= self.max_temperature
+
+    @staticmethod
+    def make_key(model: str, messages: List[Dict[str, str]], temperature: float) -> str:
+        """Exact cache key for a chat completion request."""
+        payload = json.dumps({"model": model, "messages": messages, "temp": temperature}, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, model: str, messages: List[Dict[str, str]], temperature: float) -> Optional[str]:
+        """
+        Look up a cached response.
+
+        Args:
+            model: Model or deployment name
+            messages: Chat messages of the request
+            temperature: Sampling temperature of the request
+
+        Returns:
+            The cached response or None on a miss
+        """
+        key = self.make_key(model, messages, temperature)
+        with self._lock:
+            response = self.backend.get(key)
+        if response is not None or self.embed_fn is None:
+            return response
+
+        embedding = self._embed(messages)
+        if embedding is None:
+            return None
+        with self._lock:
+            best_key, best_score = None, self.threshold
+            for cached_key, cached_embedding in self._semantic_index:
+                score = _cosine_similarity(embedding, cached_embedding)
+                if score >= best_score:
+                    best_key, best_score = cached_key, score
+            if best_key is None:
+                return None
+            response = self.backend.get(best_key)
+        if response is not None:
+            logger.debug("Semantic LLM cache hit (similarity %.3f)", best_score)
+        return response
+
+    def set(self, model: str, messages: List[Dict[str, str]], temperature: float, response: str) -> None:
+        """
+        Store a response.
+
+        Args:
+            model: Model or deployment name
+            messages: Chat messages of the request
+            temperature: Sampling temperature of the request
+            response: The response to cache
+        """
+        key = self.make_key(model, messages, temperature)
+        embedding = self._embed(messages) if self.embed_fn is not None else None
+        with self._lock:
+            self.backend.set(key, response, self.ttl)
+            if embedding is not None:
+                self._semantic_index.append((key, embedding))
+                del self._semantic_index[:-self.max_semantic_entries]
+
+    def _embed(self, messages: List[Dict[str, str]]) -> Optional[List[float]]:
+        """Embed the last user message, or return None if embedding fails."""
+        user_messages = [message.get("content", "") for message in messages if message.get("role") == "user"]
+        if not user_messages:
+            return None
+        try:
+            return self.embed_fn(user_messages[-1])
+        except Exception as e:
+            logger.warning(f"Failed to embed prompt for LLM cache: {e}")
+            return None
+
+
+def default_embedder(model_name: str = EMBEDDING_MODEL) -> Optional[Callable[[str], List[float]]]:
+    """
+    Embedding function for LLMCache backed by sentence-transformers.
+
+    The model is loaded on the first lookup rather than here, so creating a cache
+    stays cheap for runs that never miss the exact tier.
+
+    Args:
+        model_name: sentence-transformers model to embed prompts with
+
+    Returns:
+        A function embedding a text as a normalized vector, or None when
+        sentence-transformers is not installed
+    """
+    if importlib.util.find_spec("sentence_transformers") is None:
+        return None
+
+    @functools.lru_cache(maxsize=1)
+    def load_model():
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(model_name)
+
+    def embed(text: str) -> List[float]:
+        return load_model().encode(text, normalize_embeddings=True).tolist()
+
+    return embed
+
+
+class CachedLLMClient:
+    """Wraps an AzureClient/OllamaClient so identical chat completions are served from an LLMCache."""
+
+    def __init__(self, client: Any, cache: LLMCache):
+        """
+        Initialize the wrapper.
+
+        Args:
+            client: The LLM client to wrap
+            cache: Cache for its responses
+        """
+        self.client = client
+        self.cache = cache
+        self.model = getattr(client, 'model_name', None) or getattr(client, 'azure_openai_url', None) or type(client).__name__
+
+    def chat_completion(self, messages: List[Dict[str, str]], **kwargs) -> Optional[str]:
+        """Return a cached response when available, otherwise call the wrapped client and cache its answer."""
+        temperature = kwargs.get('temperature', 0.0)
+        if not self.cache.accepts(temperature):
+            return self.client.chat_completion(messages=messages, **kwargs)
+
+        response = self.cache.get(self.model, messages, temperature)
+        if response is not None:
+            logger.debug("LLM cache hit")
+            return response
+
+        response = self.client.chat_completion(messages=messages, **kwargs)
+        if response:
+            self.cache.set(self.model, messages, temperature, response)
+        return response
+
+    async def achat_completion(self, messages: List[Dict[str, str]], **kwargs) -> Optional[str]:
+        """Async counterpart of chat_completion; cache misses run on a worker thread."""
+        return await asyncio.to_thread(self.chat_completion, messages, **kwargs)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.client, name)
+
+
+def _cosine_similarity(a: List[float], b: List[float]) -> float:
+    """Cosine similarity of two embedding vectors."""
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
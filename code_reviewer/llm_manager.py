@@ -3,14 +3,100 @@
 LLM Instance Manager for Multi-Agent Code Review System
 """
 
+import functools
 import logging
 import os
-from typing import Optional, Union
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple, Union
 from .util.llm import AzureClient, OllamaClient
 from .util import config
 
 logger = logging.getLogger(__name__)
 
+# One AzureClient (with its OAuth token) is shared per tenant/app/endpoint
+# instead of exchanging a new token for every agent
+_azure_client_cache: Dict[Tuple[str, str, str], AzureClient] = {}
+_azure_client_lock = threading.Lock()
+
+# Required secrets and the environment variables they are read from
+_SECRET_ENV_VARS = (
+    ('azure_tenant_id', 'AZURE_TENANT_ID'),
+    ('azure_client_id', 'AZURE_CLIENT_ID'),
+    ('azure_client_secret', 'AZURE_CLIENT_SECRET'),
+    ('azure_endpoint', 'AZURE_ENDPOINT')
+)
+
+# Optional settings; AzureClient uses its own defaults for the ones left unset
+_OPTIONAL_SECRET_ENV_VARS = (
+    ('azure_token_url', 'AZURE_TOKEN_URL'),
+    ('azure_scope', 'AZURE_SCOPE'),
+    ('azure_openai_url', 'AZURE_OPENAI_URL')
+)
+
+# Most LLM instances SandboxInstances keeps before evicting the least recently used
+MAX_CACHED_INSTANCES = 64
+
+
+@dataclass(frozen=True)
+class AzureSecrets:
+    """Validated Azure credentials and endpoint."""
+    tenant_id: str
+    client_id: str
+    client_secret: str
+    endpoint: str
+    token_url: Optional[str] = None
+    scope: Optional[str] = None
+    openai_url: Optional[str] = None
+    
+    def as_dict(self) -> Dict[str, str]:
+        """Secrets in the form AzureClient expects; unset optional settings are left out so its defaults apply."""
+        secrets = {
+            'azure_tenant_id': self.tenant_id,
+            'azure_client_id': self.client_id,
+            'azure_client_secret': self.client_secret,
+            'azure_endpoint': self.endpoint
+        }
+        optional = {
+            'azure_token_url': self.token_url,
+            'azure_scope': self.scope,
+            'azure_openai_url': self.openai_url
+        }
+        secrets.update({name: value for name, value in optional.items() if value})
+        return secrets
+
+
+@functools.lru_cache(maxsize=1)
+def _load_secrets() -> AzureSecrets:
+    """Read the Azure secrets from the environment or config, once per process."""
+    # Get secrets from environment or config
+    environ = os.environ
+    secrets = {name: environ.get(var) for name, var in _SECRET_ENV_VARS + _OPTIONAL_SECRET_ENV_VARS}
+    unset = [name for name, value in secrets.items() if not value]
+    
+    # Fallback to config only for the settings the environment doesn't have
+    if unset:
+        logger.info("Environment variables not found, trying config...")
+        configured = config.get_secrets()
+        for name in unset:
+            secrets[name] = configured.get(name)
+    
+    missing = [name for name, _ in _SECRET_ENV_VARS if not secrets[name]]
+    if missing:
+        raise ValueError(f"Missing Azure credentials ({', '.join(missing)}). "
+                         "Please set environment variables or configure secrets.")
+    
+    return AzureSecrets(
+        tenant_id=secrets['azure_tenant_id'],
+        client_id=secrets['azure_client_id'],
+        client_secret=secrets['azure_client_secret'],
+        endpoint=secrets['azure_endpoint'],
+        token_url=secrets['azure_token_url'],
+        scope=secrets['azure_scope'],
+        openai_url=secrets['azure_openai_url']
+    )
+
 
 def get_llm_instance(is_local: bool = False, creativity_level: float = 0.5) -> Union[AzureClient, OllamaClient]:
     """
@@ -27,31 +113,24 @@ def get_llm_instance(is_local: bool = False, creativity_level: float = 0.5) -> U
         logger.info("Creating local Ollama client")
         return OllamaClient()
     else:
-        logger.info("Creating Azure OpenAI client")
+        secrets = _load_secrets()
+        key = (secrets.tenant_id, secrets.client_id, secrets.endpoint)
         
-        # Get secrets from environment or config
-        secrets = {
-            'azure_tenant_id': os.getenv('AZURE_TENANT_ID'),
-            'azure_client_id': os.getenv('AZURE_CLIENT_ID'),
-            'azure_client_secret': os.getenv('AZURE_CLIENT_SECRET'),
-            'azure_endpoint': os.getenv('AZURE_ENDPOINT')
-        }
-        
-        # Fallback to config if environment variables not found
-        if not all(secrets.values()):
-            logger.info("Environment variables not found, trying config...")
-            secrets = config.get_secrets()
-        
-        if not all(secrets.values()):
-            raise ValueError("Missing Azure credentials. Please set environment variables or configure secrets.")
-        
-        return AzureClient(secrets)
+        with _azure_client_lock:
+            client = _azure_client_cache.get(key)
+            if client is None:
+                logger.info("Creating Azure OpenAI client")
+                client = _azure_client_cache[key] = AzureClient(secrets.as_dict())
+            else:
+                logger.debug("Reusing Azure OpenAI client")
+        return client
 
 
 class SandboxInstances:
     """Singleton manager for LLM instances to avoid recreating clients."""
     
-    llm_map = {}
+    llm_map: "OrderedDict[str, Union[AzureClient, OllamaClient]]" = OrderedDict()
+    _lock = threading.Lock()
     
     @staticmethod
     def get_instance(name: str, is_local: bool = False, creativity_level: float = 0.5) -> Union[AzureClient, OllamaClient]:
@@ -66,20 +145,33 @@ class SandboxInstances:
         Returns:
             Cached or new LLM instance
         """
-        cache_key = f"{name}_{is_local}_{creativity_level}"
+        # Rounded so 0.1 * 2 and 0.2 share an instance
+        cache_key = f"{name}_{is_local}_{round(creativity_level, 4)}"
         
-        if SandboxInstances.llm_map.get(cache_key) is None:
-            logger.info(f"Creating new LLM instance: {cache_key}")
-            SandboxInstances.llm_map[cache_key] = get_llm_instance(is_local, creativity_level)
-        else:
-            logger.debug(f"Using cached LLM instance: {cache_key}")
-            
-        return SandboxInstances.llm_map[cache_key]
+        # Agents are created from several threads; only one of them may build the instance
+        with SandboxInstances._lock:
+            instance = SandboxInstances.llm_map.get(cache_key)
+            if instance is not None:
+                # Least recently used instances are evicted first
+                SandboxInstances.llm_map.move_to_end(cache_key)
+                logger.debug("Using cached LLM instance: %s", cache_key)
+            else:
+                logger.info("Creating new LLM instance: %s", cache_key)
+                instance = get_llm_instance(is_local, creativity_level)
+                SandboxInstances.llm_map[cache_key] = instance
+                while len(SandboxInstances.llm_map) > MAX_CACHED_INSTANCES:
+                    SandboxInstances.llm_map.popitem(last=False)
+        
+        return instance
     
     @staticmethod
     def clear_cache():
-        """Clear all cached instances."""
-        SandboxInstances.llm_map.clear()
+        """Clear all cached instances, including the shared Azure clients and secrets."""
+        with SandboxInstances._lock:
+            SandboxInstances.llm_map.clear()
+        with _azure_client_lock:
+            _azure_client_cache.clear()
+        _load_secrets.cache_clear()
         logger.info("LLM instance cache cleared")
     
     @staticmethod
@@ -3,9 +3,19 @@
 Multi-Agent Code Reviewer - Orchestrates multiple specialized agents for comprehensive code review.
 """
 
+import ast
 import asyncio
-import concurrent.futures
-from typing import List, Optional, Dict, Any
+import hashlib
+import itertools
+import json
+import logging
+import math
+import re
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, replace
+from typing import List, Optional, Dict, Any, Coroutine, Tuple
 from pathlib import Path
 import sys
 import os
@@ -14,10 +24,239 @@ import os
 from .specialized_agents import (
     SecurityAgent, PerformanceAgent, CodingPracticesAgent, 
     ArchitectureAgent, ReadabilityAgent, TestabilityAgent,
-    AgentReview
+    AgentReview, BaseReviewAgent, ReviewFinding, Severity
 )
 from .consolidation_agent import ConsolidationAgent, ConsolidatedReview
+from .batch_consolidator import BatchProcessor
+from .code_reviewer import MAX_REVIEW_BYTES, read_review_source
+from .llm_manager import SandboxInstances
 from .pr_review_formatter import PRReviewFormatter
+from .util.aio import run_sync
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on how long a single agent review may take
+AGENT_TIMEOUT_SECONDS = 360
+
+# Azure OpenAI agent requests time out after the time to read the code, in proportion
+# to its size and at least AGENT_TIMEOUT_MIN_SECONDS, plus the time to generate a full
+# answer at a slow but healthy rate, capped at AGENT_TIMEOUT_SECONDS. A hung request on
+# a small diff is dropped sooner; local Ollama models are too slow to bound this tightly
+AGENT_TIMEOUT_MIN_SECONDS = 30
+AGENT_TIMEOUT_SECONDS_PER_KB = 2
+AGENT_MAX_OUTPUT_TOKENS = 2000  # AzureClient.chat_completion's default max_tokens
+AGENT_MIN_TOKENS_PER_SECOND = 20
+
+# Agent requests in flight at once unless LLM_MAX_CONCURRENCY says otherwise: a local
+# Ollama model serves one request at a time, Azure OpenAI handles all agents together
+_DEFAULT_CONCURRENCY_LOCAL = 1
+_DEFAULT_CONCURRENCY_AZURE = 6
+
+# Agent reviews are cached on disk so unchanged code is not sent to the model again
+REVIEW_CACHE_DIR = "~/.cache/multi_agent_reviewer"
+REVIEW_CACHE_TTL_SECONDS = 7 * 24 * 3600
+# The cache directory keeps at most this many reviews; it is swept every REVIEW_CACHE_SWEEP_INTERVAL stores
+REVIEW_CACHE_MAX_ENTRIES = 2000
+REVIEW_CACHE_SWEEP_INTERVAL = 50
+
+# Code shorter than this can be reviewed by all agents in one fused request
+FUSED_MAX_CHARS = 4000
+FUSED_MAX_TOKENS = 4000
+
+# What each agent's section of a fused review looks at
+_FUSED_SECTION_FOCUS = {
+    'security': "input validation, authentication and authorization, data exposure, injection, cryptography, OWASP Top 10",
+    'performance': "algorithmic complexity, memory usage, I/O and database access, caching, concurrency",
+    'coding_practices': "SOLID and DRY, error handling, naming conventions, code smells, language best practices",
+    'architecture': "separation of concerns, coupling and cohesion, design patterns, modularity, extensibility",
+    'readability': "naming, structure, comments and documentation, complexity, consistency",
+    'testability': "dependency injection, side effects, mockability, test seams, deterministic behaviour"
+}
+# Python code longer than this is split at top-level functions and classes into
+# chunks of at most CHUNK_MAX_CHARS, which are reviewed concurrently
+CHUNK_THRESHOLD = 8000
+CHUNK_MAX_CHARS = 4000
+
+_SEVERITY_PENALTY = {Severity.CRITICAL: 3, Severity.HIGH: 2, Severity.MEDIUM: 1}
+_JSON_OBJECT_RE = re.compile(r'\{.*\}', re.DOTALL)
+_LINE_REF_RE = re.compile(r'(\blines?\s*)(\d+)', re.IGNORECASE)
+
+# Lines of the file shown around each diff hunk in review_diff_with_context
+DIFF_CONTEXT_LINES = 30
+_HUNK_HEADER_RE = re.compile(r'^@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@', re.MULTILINE)
+_NEW_FILE_HEADER_RE = re.compile(r'^\+\+\+ ', re.MULTILINE)
+
+
+async def _await_in_slot(semaphore: asyncio.Semaphore, coro: Coroutine[Any, Any, Optional[AgentReview]],
+                         timeout: float) -> Optional[AgentReview]:
+    """
+    Run coro in one of the semaphore's slots, waiting at most timeout seconds for it.
+    
+    A timeout only stops the wait: the LLM request keeps running on its worker
+    thread, so the slot stays taken until the request actually finishes and
+    no more than the semaphore's limit of requests is ever in flight.
+    
+    Args:
+        semaphore: Limits the requests in flight
+        coro: The review to run
+        timeout: Seconds to wait for the result
+        
+    Returns:
+        The result of coro
+        
+    Raises:
+        asyncio.TimeoutError: If coro did not finish in time
+    """
+    try:
+        await semaphore.acquire()
+    except BaseException:
+        coro.close()
+        raise
+    task = asyncio.ensure_future(coro)
+    
+    def release(finished: asyncio.Future) -> None:
+        semaphore.release()
+        if not finished.cancelled():
+            finished.exception()  # Retrieved so an abandoned failure is not reported as unhandled
+    
+    task.add_done_callback(release)
+    return await asyncio.wait_for(asyncio.shield(task), timeout)
+
+
+class FusedAgent:
+    """
+    Runs several review agents as one request.
+    
+    Small snippets are dominated by the per-request overhead: every agent sends
+    the same code with its own prompt. The fused agent sends the code once and
+    asks for one JSON section per agent, which is then split back into one
+    AgentReview per agent for the regular consolidation.
+    """
+    
+    def __init__(self, agents: List[BaseReviewAgent], is_local: bool = False, creativity_level: float = 0.1):
+        """
+        Initialize the fused agent.
+        
+        Args:
+            agents: The agents whose reviews are fused into one request
+            is_local: Whether to use local Ollama (True) or Azure OpenAI (False)
+            creativity_level: Temperature for AI responses (0.0-1.0)
+        """
+        self.agents = agents
+        self.temperature = max(0.2, creativity_level)
+        self.llm_client = SandboxInstances.get_instance(
+            name="fused_agent",
+            is_local=is_local,
+            creativity_level=creativity_level
+        )
+    
+    def build_messages(self, code: str, diff_only: bool = False) -> List[Dict[str, str]]:
+        """Chat messages asking for every agent's review of the code in one JSON object."""
+        sections = '\n'.join(
+            f'- "{agent.agent_type}": {_FUSED_SECTION_FOCUS.get(agent.agent_type, agent.agent_type)}'
+            for agent in self.agents
+        )
+        if diff_only:
+            scope = "You are reviewing a DIFF with context. ONLY comment on lines that are ADDED or CHANGED in the diff."
+            content = code
+        else:
+            scope = "Review the ENTIRE code. Every line is prefixed with its line number."
+            content = '\n'.join(f"{i + 1:3d}: {line}" for i, line in enumerate(code.split('\n')))
+        
+        system_prompt = f"""You are a team of code review experts. Each expert reviews the same code for one aspect:
+{sections}
+
+{scope} Always give the exact line number of each finding. Be concise and actionable.
+
+Return ONLY a JSON object with one key per expert listed above, in this form:
+{{"security": {{"summary": "one or two sentences", "findings": [{{"line": 15, "severity": "critical|high|medium|low|info", "title": "short title", "description": "what is wrong and why", "suggestion": "how to fix it"}}], "recommendations": ["..."]}}, ...}}"""
+        
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": content}
+        ]
+    
+    def review_code(self, code: str, diff_only: bool = False) -> List[AgentReview]:
+        """
+        Review the code for all agents with a single request.
+        
+        Args:
+            code: The code to review
+            diff_only: Whether the content is a diff with context
+            
+        Returns:
+            One AgentReview per agent section found in the response; empty if the request or parsing failed
+        """
+        try:
+            response = self.llm_client.chat_completion(
+                messages=self.build_messages(code, diff_only),
+                temperature=self.temperature,
+                max_tokens=FUSED_MAX_TOKENS
+            )
+        except Exception as e:
+            logger.error("❌ Fused review error: %s", e)
+            return []
+        
+        return self.parse_response(response) if response else []
+    
+    def parse_response(self, response: str) -> List[AgentReview]:
+        """Split the fused JSON response into one AgentReview per agent."""
+        try:
+            sections = json.loads(response)
+        except ValueError:
+            # Tolerate prose or code fences around the JSON object
+            match = _JSON_OBJECT_RE.search(response)
+            try:
+                sections = json.loads(match.group(0)) if match else None
+            except ValueError:
+                sections = None
+        if not isinstance(sections, dict):
+            return []
+        
+        reviews = []
+        for agent in self.agents:
+            section = sections.get(agent.agent_type)
+            if isinstance(section, dict):
+                reviews.append(self._section_review(agent, section))
+        return reviews
+    
+    @staticmethod
+    def _section_review(agent: BaseReviewAgent, section: Dict[str, Any]) -> AgentReview:
+        """Build an agent's review from its section of the fused response."""
+        findings = []
+        for item in section.get('findings') or []:
+            if not isinstance(item, dict):
+                continue
+            title = str(item.get('title') or item.get('description') or '').strip()
+            if not title:
+                continue
+            try:
+                severity = Severity(str(item.get('severity', '')).lower())
+            except ValueError:
+                severity = Severity.INFO
+            line_number = item.get('line') if isinstance(item.get('line'), int) else None
+            if line_number is not None:
+                title = f"Line {line_number}: {title}"
+            findings.append(ReviewFinding(
+                agent_type=agent.agent_type,
+                severity=severity,
+                title=title,
+                description=str(item.get('description') or title),
+                line_number=line_number,
+                suggestion=item.get('suggestion'),
+                category=agent.agent_type
+            ))
+        
+        score = max(1, 10 - sum(_SEVERITY_PENALTY.get(finding.severity, 0) for finding in findings))
+        summary = str(section.get('summary') or '')
+        return AgentReview(
+            agent_name=agent.agent_name,
+            agent_type=agent.agent_type,
+            overall_score=score,
+            summary=summary[:200] + "..." if len(summary) > 200 else summary,
+            findings=findings,
+            recommendations=[str(rec) for rec in section.get('recommendations') or []]
+        )
 
 
 class MultiAgentCodeReviewer:
@@ -26,7 +265,10 @@ class MultiAgentCodeReviewer:
     def __init__(self, 
                  is_local: bool = False,
                  creativity_level: float = 0.1,
-                 enabled_agents: Optional[List[str]] = None):
+                 enabled_agents: Optional[List[str]] = None,
+                 max_concurrency: Optional[int] = None,
+                 use_cache: bool = True,
+                 straggler_grace: Optional[float] = None):
         """
         Initialize the multi-agent code reviewer.
         
@@ -34,9 +276,20 @@ class MultiAgentCodeReviewer:
             is_local: Whether to use local Ollama (True) or Azure OpenAI (False)
             creativity_level: Temperature for AI responses (0.0-1.0)
             enabled_agents: List of agent types to enable. If None, all agents are enabled.
+            max_concurrency: Agent reviews in flight at once
+                (default: LLM_MAX_CONCURRENCY, else 1 for Ollama and 6 for Azure OpenAI)
+            use_cache: Whether to reuse agent reviews of unchanged code from the disk cache
+            straggler_grace: Once half of the agents have finished, wait at most this many
+                seconds for the rest before consolidating. If None, wait for all.
         """
         self.is_local = is_local
         self.creativity_level = creativity_level
+        default_concurrency = _DEFAULT_CONCURRENCY_LOCAL if is_local else _DEFAULT_CONCURRENCY_AZURE
+        self.max_concurrency = max(1, max_concurrency or int(os.getenv('LLM_MAX_CONCURRENCY', default_concurrency)))
+        self.use_cache = use_cache
+        self.straggler_grace = straggler_grace
+        self.cache_dir = Path(os.getenv("REVIEWER_CACHE", REVIEW_CACHE_DIR)).expanduser()
+        self._stores_since_sweep = REVIEW_CACHE_SWEEP_INTERVAL  # sweep on the first store
         
         # Initialize all available agents
         self.available_agents = {
@@ -54,10 +307,88 @@ class MultiAgentCodeReviewer:
         else:
             self.enabled_agents = [agent for agent in enabled_agents 
                                  if agent in self.available_agents]
+        self._active = [(agent_type, self.available_agents[agent_type]) for agent_type in self.enabled_agents]
         
         # Initialize consolidation agent
         self.consolidation_agent = ConsolidationAgent(is_local, creativity_level * 2)  # Slightly higher creativity for consolidation
     
+    def _cache_path(self, agent: BaseReviewAgent, code: str, diff_only: bool) -> Path:
+        """Cache file for one agent's review of this code with the current model and settings."""
+        client = getattr(agent.llm_client, 'client', agent.llm_client)
+        model = (getattr(client, 'model_name', None) or getattr(client, 'azure_openai_url', None)
+                 or getattr(client, 'azure_endpoint', None) or type(client).__name__)
+        key = hashlib.blake2b(
+            f"{agent.agent_type}|{model}|{agent.creativity_level}|{diff_only}|{code}".encode('utf-8'),
+            digest_size=16
+        ).hexdigest()
+        return self.cache_dir / f"{key}.json"
+    
+    def _load_cached_review(self, agent: BaseReviewAgent, code: str, diff_only: bool) -> Optional[AgentReview]:
+        """Return the cached review for this agent and code, or None if missing or expired."""
+        if not self.use_cache:
+            return None
+        
+        path = self._cache_path(agent, code, diff_only)
+        try:
+            if time.time() - path.stat().st_mtime > REVIEW_CACHE_TTL_SECONDS:
+                path.unlink(missing_ok=True)
+                return None
+            data = json.loads(path.read_text(encoding='utf-8'))
+            data['findings'] = [
+                ReviewFinding(**{**finding, 'severity': Severity(finding['severity'])})
+                for finding in data['findings']
+            ]
+            return AgentReview(**data)
+        except (OSError, ValueError, TypeError, KeyError):
+            return None
+    
+    def _store_cached_review(self, agent: BaseReviewAgent, code: str, diff_only: bool,
+                             review: AgentReview) -> None:
+        """Write a review to the disk cache atomically; failures only cost a future cache miss."""
+        if not self.use_cache:
+            return
+        
+        path = self._cache_path(agent, code, diff_only)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp.write_text(json.dumps(asdict(review), default=lambda severity: severity.value), encoding='utf-8')
+            tmp.replace(path)
+        except OSError:
+            tmp.unlink(missing_ok=True)
+            return
+        
+        self._stores_since_sweep += 1
+        if self._stores_since_sweep >= REVIEW_CACHE_SWEEP_INTERVAL:
+            self._stores_since_sweep = 0
+            self._sweep_cache()
+    
+    def _sweep_cache(self) -> None:
+        """Delete expired reviews and, beyond REVIEW_CACHE_MAX_ENTRIES, the oldest ones."""
+        entries = []
+        for path in self.cache_dir.glob("*.json"):
+            try:
+                entries.append((path.stat().st_mtime, path))
+            except OSError:
+                continue
+        
+        entries.sort(reverse=True)
+        expired_before = time.time() - REVIEW_CACHE_TTL_SECONDS
+        for index, (mtime, path) in enumerate(entries):
+            if index >= REVIEW_CACHE_MAX_ENTRIES or mtime < expired_before:
+                path.unlink(missing_ok=True)
+    
+    async def _areview_with_cache(self, agent: BaseReviewAgent, code: str, diff_only: bool) -> Optional[AgentReview]:
+        """Run one agent's review, answering from the disk cache when the code was reviewed before."""
+        review = self._load_cached_review(agent, code, diff_only)
+        if review is not None:
+            return review
+        
+        review = await agent.areview_code(code, diff_only)
+        if review:
+            self._store_cached_review(agent, code, diff_only, review)
+        return review
+    
     def get_available_agents(self) -> List[str]:
         """Get list of available agent types."""
         return list(self.available_agents.keys())
@@ -66,144 +397,515 @@ class MultiAgentCodeReviewer:
         """Set which agents should be enabled for reviews."""
         self.enabled_agents = [agent for agent in agent_types 
                              if agent in self.available_agents]
+        self._active = [(agent_type, self.available_agents[agent_type]) for agent_type in self.enabled_agents]
     
-    def review_code(self, code: str, parallel: bool = True, diff_only: bool = False) -> Optional[ConsolidatedReview]:
+    def review_code(self, code: str, parallel: bool = True, diff_only: bool = False,
+                    fused: bool = False) -> Optional[ConsolidatedReview]:
         """
         Perform multi-agent code review.
         
         Args:
             code: The code to review
             parallel: Whether to run agents in parallel (faster) or sequentially
+            fused: Whether to review code shorter than FUSED_MAX_CHARS with a single request for all agents
             
         Returns:
             ConsolidatedReview object with results from all agents
         """
         if not self.enabled_agents:
-            print("No agents enabled for review.")
+            logger.warning("No agents enabled for review.")
             return None
         
-        print(f"🚀 Starting multi-agent code review with {len(self.enabled_agents)} agents...")
-        print(f"Enabled agents: {', '.join(self.enabled_agents)}")
+        logger.info("🚀 Starting multi-agent code review with %s agents...", len(self.enabled_agents))
+        logger.info("Enabled agents: %s", ', '.join(self.enabled_agents))
         
-        if parallel:
-            agent_reviews = self._run_agents_parallel(code, diff_only)
-        else:
-            agent_reviews = self._run_agents_sequential(code, diff_only)
+        agent_reviews = []
+        if fused and len(self.enabled_agents) > 1 and len(code) < FUSED_MAX_CHARS:
+            agent_reviews = self._run_agents_fused(code, diff_only)
+        
+        if not agent_reviews and parallel and not diff_only and len(code) > CHUNK_THRESHOLD:
+            chunks = self._split_by_ast(code)
+            if len(chunks) > 1:
+                logger.info("✂️ Reviewing %s chunks of the code concurrently...", len(chunks))
+                agent_reviews = run_sync(self._run_chunks_async(chunks))
+        
+        if not agent_reviews:
+            if parallel:
+                agent_reviews = self._run_agents_parallel(code, diff_only)
+            else:
+                agent_reviews = self._run_agents_sequential(code, diff_only)
         
         if not agent_reviews:
-            print("❌ No agent reviews were completed successfully.")
+            logger.error("❌ No agent reviews were completed successfully.")
             return None
         
-        print(f"✅ Completed {len(agent_reviews)} agent reviews. Consolidating results...")
+        logger.info("✅ Completed %s agent reviews. Consolidating results...", len(agent_reviews))
         
         # Consolidate all agent reviews
         consolidated_review = self.consolidation_agent.consolidate_reviews(
             agent_reviews, code
         )
         
-        print("🎯 Multi-agent review completed!")
+        logger.info("🎯 Multi-agent review completed!")
         return consolidated_review
     
+    def review_code_batch(self, codes: List[str], diff_only: bool = False,
+                          use_batch_api: bool = True) -> List[Optional[ConsolidatedReview]]:
+        """
+        Review many pieces of code through one batch job instead of live requests.
+        
+        Every (code, agent) prompt goes into a single Azure OpenAI batch, and the
+        consolidations go into a second one. This trades latency for half-price
+        requests that don't count against the real-time rate limit, which suits
+        CI runs over many diffs. With Ollama the requests run directly.
+        
+        Args:
+            codes: The code or diffs to review
+            diff_only: Whether the content is a diff with context
+            use_batch_api: Whether to use the Batch API when the client supports it
+            
+        Returns:
+            One ConsolidatedReview per code, None where no agent review succeeded
+        """
+        if not codes:
+            return []
+        if not self.enabled_agents:
+            logger.warning("No agents enabled for review.")
+            return [None] * len(codes)
+        
+        agents = [agent for _, agent in self._active]
+        agent_reviews: List[List[AgentReview]] = [[] for _ in codes]
+        jobs = []
+        for index, code in enumerate(codes):
+            for agent in agents:
+                cached = self._load_cached_review(agent, code, diff_only)
+                if cached is not None:
+                    agent_reviews[index].append(cached)
+                else:
+                    jobs.append((index, agent))
+        
+        # Each job runs on its agent's client and temperature; agents sharing both
+        # (the usual Azure setup) share one batch job
+        groups: Dict[Tuple[int, float], List[Tuple[int, BaseReviewAgent]]] = defaultdict(list)
+        for index, agent in jobs:
+            groups[(id(agent.llm_client), agent.temperature)].append((index, agent))
+        
+        def run_group(group: List[Tuple[int, BaseReviewAgent]]) -> List[Optional[str]]:
+            agent = group[0][1]
+            processor = BatchProcessor(agent.llm_client, use_batch_api=use_batch_api,
+                                       max_workers=self.max_concurrency)
+            return processor.run([agent.build_review_messages(codes[index], diff_only) for index, agent in group],
+                                 temperature=agent.temperature)
+        
+        logger.info("📦 Submitting %s agent reviews for %s item(s) as %s batch(es)...",
+                    len(jobs), len(codes), len(groups))
+        with ThreadPoolExecutor(max_workers=max(1, len(groups))) as executor:
+            group_responses = list(executor.map(run_group, groups.values()))
+        
+        # Demultiplex the responses back into per-code agent reviews
+        for (index, agent), response in zip(itertools.chain.from_iterable(groups.values()),
+                                            itertools.chain.from_iterable(group_responses)):
+            if response:
+                review = agent.parse_review(response, codes[index])
+                self._store_cached_review(agent, codes[index], diff_only, review)
+                agent_reviews[index].append(review)
+            else:
+                logger.warning("⚠️ %s review failed for item %s", agent.agent_type.replace('_', ' ').title(), index + 1)
+        
+        reviewed = [index for index, reviews in enumerate(agent_reviews) if reviews]
+        logger.info("✅ Completed agent reviews for %s/%s item(s). Consolidating results...", len(reviewed), len(codes))
+        
+        consolidated = self.consolidation_agent.consolidate_reviews_batch(
+            [(agent_reviews[index], codes[index]) for index in reviewed], use_batch_api=use_batch_api
+        )
+        results: List[Optional[ConsolidatedReview]] = [None] * len(codes)
+        for index, review in zip(reviewed, consolidated):
+            results[index] = review
+        
+        logger.info("🎯 Multi-agent batch review completed!")
+        return results
+    
     def _run_agents_parallel(self, code: str, diff_only: bool = False) -> List[AgentReview]:
-        """Run all enabled agents in parallel using ThreadPoolExecutor."""
-        agent_reviews = []
+        """Run all enabled agents concurrently on an event loop."""
+        # run_sync rather than asyncio.run, so timed-out or skipped agents don't hold up the return
+        return run_sync(self._run_agents_async(code, diff_only))
+    
+    async def areview_code(self, code: str, diff_only: bool = False,
+                           min_agents: Optional[int] = None) -> Optional[ConsolidatedReview]:
+        """
+        Perform multi-agent code review without blocking the event loop.
+        
+        Args:
+            code: The code to review
+            diff_only: Whether the content is a diff with context
+            min_agents: Consolidate as soon as this many agents have finished. If None, wait for all.
+            
+        Returns:
+            ConsolidatedReview object with results from the completed agents
+        """
+        agent_reviews = await self._arun_agents_for_review(code, diff_only, min_agents)
+        if not agent_reviews:
+            return None
+        
+        consolidated_review = await self.consolidation_agent.consolidate_reviews_async(agent_reviews, code)
         
-        with concurrent.futures.ThreadPoolExecutor(max_workers=len(self.enabled_agents)) as executor:
-            # Submit all agent tasks
-            future_to_agent = {
-                executor.submit(self.available_agents[agent_type].review_code, code, diff_only): agent_type
-                for agent_type in self.enabled_agents
-            }
+        logger.info("🎯 Multi-agent review completed!")
+        return consolidated_review
+    
+    async def areview_code_with_comments(self, code: str, file_path: str,
+                                         extracted_files: Optional[List[str]] = None,
+                                         diff_only: bool = False,
+                                         min_agents: Optional[int] = None
+                                         ) -> Optional[Tuple[ConsolidatedReview, str]]:
+        """
+        Perform multi-agent review and produce the JSON review comments in one pass.
+        
+        Consolidation and JSON comment generation only need the agent reviews,
+        so their LLM calls run concurrently.
+        
+        Args:
+            code: The code to review
+            file_path: Fallback file path for comments
+            extracted_files: File paths found in the diff, if already known
+            diff_only: Whether the content is a diff with context
+            min_agents: Consolidate as soon as this many agents have finished. If None, wait for all.
             
-            # Collect results as they complete
-            for future in concurrent.futures.as_completed(future_to_agent):
-                agent_type = future_to_agent[future]
-                try:
-                    review = future.result(timeout=360)  # 6 minute timeout per agent
-                    if review:
-                        agent_reviews.append(review)
-                        print(f"✅ {agent_type.replace('_', ' ').title()} review completed")
+        Returns:
+            Tuple of (consolidated review, JSON review comments), or None if no agent finished
+        """
+        agent_reviews = await self._arun_agents_for_review(code, diff_only, min_agents)
+        if not agent_reviews:
+            return None
+        
+        result = await self.consolidation_agent.consolidate_with_comments_async(
+            agent_reviews, code, file_path, extracted_files
+        )
+        
+        logger.info("🎯 Multi-agent review completed!")
+        return result
+    
+    async def _arun_agents_for_review(self, code: str, diff_only: bool,
+                                      min_agents: Optional[int]) -> Optional[List[AgentReview]]:
+        """Run the enabled agents for an async review, reporting progress like review_code."""
+        if not self.enabled_agents:
+            logger.warning("No agents enabled for review.")
+            return None
+        
+        logger.info("🚀 Starting multi-agent code review with %s agents...", len(self.enabled_agents))
+        logger.info("Enabled agents: %s", ', '.join(self.enabled_agents))
+        
+        agent_reviews = await self._run_agents_async(code, diff_only, min_agents)
+        
+        if not agent_reviews:
+            logger.error("❌ No agent reviews were completed successfully.")
+            return None
+        
+        logger.info("✅ Completed %s agent reviews. Consolidating results...", len(agent_reviews))
+        return agent_reviews
+    
+    async def areview_diff(self, diff_content: str, min_agents: Optional[int] = None) -> Optional[ConsolidatedReview]:
+        """Async counterpart of review_diff."""
+        logger.info("📋 Reviewing git diff...")
+        return await self.areview_code(diff_content, min_agents=min_agents)
+    
+    def _agent_timeout(self, code: str) -> float:
+        """Seconds one agent may take to review this code."""
+        if self.is_local:
+            return AGENT_TIMEOUT_SECONDS
+        input_seconds = max(AGENT_TIMEOUT_MIN_SECONDS, AGENT_TIMEOUT_SECONDS_PER_KB * math.ceil(len(code) / 1000))
+        return min(AGENT_TIMEOUT_SECONDS, input_seconds + AGENT_MAX_OUTPUT_TOKENS / AGENT_MIN_TOKENS_PER_SECOND)
+    
+    async def _run_agents_async(self, code: str, diff_only: bool = False,
+                                min_agents: Optional[int] = None) -> List[AgentReview]:
+        """Run all enabled agents concurrently, stopping early once min_agents reviews are in."""
+        agent_reviews = []
+        
+        # Every agent's LLM round trip is awaited on this loop; the semaphore keeps at most
+        # max_concurrency of them in flight so the provider is not flooded
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        
+        agent_timeout = self._agent_timeout(code)
+        
+        async def guarded_review(agent: BaseReviewAgent) -> Optional[AgentReview]:
+            return await _await_in_slot(semaphore, self._areview_with_cache(agent, code, diff_only), agent_timeout)
+        
+        task_to_agent = {
+            asyncio.ensure_future(guarded_review(agent)): agent_type
+            for agent_type, agent in self._active
+        }
+        pending = set(task_to_agent)
+        
+        # With a straggler grace period, consolidation starts at most that long after
+        # half of the agents are in, instead of waiting on the slowest one
+        loop = asyncio.get_running_loop()
+        quorum = (len(task_to_agent) + 1) // 2
+        deadline = None
+        
+        try:
+            while pending:
+                timeout = AGENT_TIMEOUT_SECONDS if deadline is None else max(0.0, deadline - loop.time())
+                done, pending = await asyncio.wait(
+                    pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    if deadline is None:
+                        logger.warning("⚠️ Timed out waiting for %s agent review(s)", len(pending))
                     else:
-                        print(f"⚠️ {agent_type.replace('_', ' ').title()} review failed")
-                except Exception as e:
-                    print(f"❌ {agent_type.replace('_', ' ').title()} review error: {e}")
+                        logger.warning("⏱️ Consolidating without %s slow agent review(s)", len(pending))
+                    break
+                
+                for task in done:
+                    agent_type = task_to_agent[task]
+                    try:
+                        review = task.result()
+                        if review:
+                            agent_reviews.append(review)
+                            logger.info("✅ %s review completed", agent_type.replace('_', ' ').title())
+                        else:
+                            logger.warning("⚠️ %s review failed", agent_type.replace('_', ' ').title())
+                    except asyncio.TimeoutError:
+                        logger.warning("⏱️ %s review timed out after %ss",
+                                       agent_type.replace('_', ' ').title(), agent_timeout)
+                    except Exception as e:
+                        logger.error("❌ %s review error: %s", agent_type.replace('_', ' ').title(), e)
+                
+                if min_agents and len(agent_reviews) >= min_agents:
+                    break
+                if self.straggler_grace is not None and deadline is None and len(agent_reviews) >= quorum:
+                    deadline = loop.time() + self.straggler_grace
+        finally:
+            # Requests already on the wire finish in the background; their results are discarded
+            for task in pending:
+                task.cancel()
+            if pending:
+                skipped = ', '.join(task_to_agent[task] for task in pending)
+                logger.warning("⏭️ Skipped agents: %s", skipped)
+        
+        return agent_reviews
+    
+    @staticmethod
+    def _split_by_ast(code: str) -> List[Tuple[str, int]]:
+        """
+        Split Python code at top-level statements into chunks of about CHUNK_MAX_CHARS.
+        
+        Each function or class (with its decorators) stays in one chunk; a single
+        definition larger than the limit becomes a chunk of its own.
+        
+        Args:
+            code: The code to split
+            
+        Returns:
+            (chunk source, 1-based start line) pairs; the whole code as one chunk if it is not valid Python
+        """
+        try:
+            tree = ast.parse(code)
+        except (SyntaxError, ValueError):
+            return [(code, 1)]
+        
+        lines = code.split('\n')
+        starts = [
+            min([node.lineno] + [decorator.lineno for decorator in getattr(node, 'decorator_list', [])])
+            for node in tree.body
+        ]
+        # The first segment also carries the module header (comments, docstring)
+        boundaries = [1] + starts[1:] + [len(lines) + 1]
+        
+        chunks = []
+        chunk_start, chunk_size = 1, 0
+        for seg_start, seg_end in zip(boundaries, boundaries[1:]):
+            seg_size = sum(len(line) + 1 for line in lines[seg_start - 1:seg_end - 1])
+            if chunk_size and chunk_size + seg_size > CHUNK_MAX_CHARS:
+                chunks.append(('\n'.join(lines[chunk_start - 1:seg_start - 1]), chunk_start))
+                chunk_start, chunk_size = seg_start, 0
+            chunk_size += seg_size
+        chunks.append(('\n'.join(lines[chunk_start - 1:]), chunk_start))
+        return chunks
+    
+    async def _run_chunks_async(self, chunks: List[Tuple[str, int]]) -> List[AgentReview]:
+        """Review every chunk with every enabled agent and merge the results into one review per agent."""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        agents = [agent for _, agent in self._active]
+        
+        async def guarded_review(agent: BaseReviewAgent, chunk: str) -> Optional[AgentReview]:
+            return await _await_in_slot(semaphore, self._areview_with_cache(agent, chunk, False),
+                                        self._agent_timeout(chunk))
+        
+        jobs = [(agent, chunk, start) for chunk, start in chunks for agent in agents]
+        results = await asyncio.gather(*(guarded_review(agent, chunk) for agent, chunk, _ in jobs),
+                                       return_exceptions=True)
+        
+        chunk_reviews: Dict[str, List[AgentReview]] = defaultdict(list)
+        for (agent, _, start), result in zip(jobs, results):
+            if isinstance(result, BaseException):
+                logger.error("❌ %s chunk review error: %r", agent.agent_type.replace('_', ' ').title(), result)
+            elif result:
+                chunk_reviews[agent.agent_type].append(self._offset_review_lines(result, start - 1))
+        
+        agent_reviews = []
+        for agent in agents:
+            reviews = chunk_reviews.get(agent.agent_type)
+            if reviews:
+                agent_reviews.append(self._merge_chunk_reviews(reviews))
+                logger.info("✅ %s review completed (%s/%s chunks)",
+                            agent.agent_type.replace('_', ' ').title(), len(reviews), len(chunks))
+            else:
+                logger.warning("⚠️ %s review failed", agent.agent_type.replace('_', ' ').title())
+        return agent_reviews
+    
+    @staticmethod
+    def _offset_review_lines(review: AgentReview, offset: int) -> AgentReview:
+        """Shift the line numbers a chunk review refers to so they point into the whole file."""
+        if not offset:
+            return review
         
+        def shift(text: Optional[str]) -> Optional[str]:
+            if not text:
+                return text
+            return _LINE_REF_RE.sub(lambda match: f"{match.group(1)}{int(match.group(2)) + offset}", text)
+        
+        findings = [
+            replace(finding,
+                    title=shift(finding.title),
+                    description=shift(finding.description),
+                    suggestion=shift(finding.suggestion),
+                    line_number=finding.line_number + offset if finding.line_number is not None else None)
+            for finding in review.findings
+        ]
+        return replace(review, summary=shift(review.summary), findings=findings,
+                       recommendations=[shift(rec) for rec in review.recommendations])
+    
+    @staticmethod
+    def _merge_chunk_reviews(reviews: List[AgentReview]) -> AgentReview:
+        """Combine one agent's chunk reviews into a single review of the whole file."""
+        if len(reviews) == 1:
+            return reviews[0]
+        
+        findings = list(itertools.chain.from_iterable(review.findings for review in reviews))
+        summary = ' '.join(review.summary for review in reviews)
+        return AgentReview(
+            agent_name=reviews[0].agent_name,
+            agent_type=reviews[0].agent_type,
+            overall_score=max(1, 10 - sum(_SEVERITY_PENALTY.get(finding.severity, 0) for finding in findings)),
+            summary=summary[:200] + "..." if len(summary) > 200 else summary,
+            findings=findings,
+            recommendations=list(itertools.chain.from_iterable(review.recommendations for review in reviews))
+        )
+    
+    def _run_agents_fused(self, code: str, diff_only: bool = False) -> List[AgentReview]:
+        """Run all enabled agents as one fused request; empty if it failed so the agents run separately."""
+        logger.info("🧩 Running %s agents as one fused review...", len(self.enabled_agents))
+        agents = [agent for _, agent in self._active]
+        fused_agent = FusedAgent(agents, self.is_local, self.creativity_level)
+        agent_reviews = fused_agent.review_code(code, diff_only)
+        
+        if agent_reviews:
+            logger.info("✅ Fused review covered %s/%s agents", len(agent_reviews), len(agents))
+        else:
+            logger.warning("⚠️ Fused review failed, running agents separately")
         return agent_reviews
     
     def _run_agents_sequential(self, code: str, diff_only: bool = False) -> List[AgentReview]:
         """Run all enabled agents sequentially."""
         agent_reviews = []
         
-        for agent_type in self.enabled_agents:
-            print(f"🔄 Running {agent_type.replace('_', ' ').title()} review...")
+        for agent_type, agent in self._active:
+            logger.info("🔄 Running %s review...", agent_type.replace('_', ' ').title())
             try:
-                review = self.available_agents[agent_type].review_code(code, diff_only)
+                review = self._load_cached_review(agent, code, diff_only)
+                if review is None:
+                    review = agent.review_code(code, diff_only)
+                    if review:
+                        self._store_cached_review(agent, code, diff_only, review)
                 if review:
                     agent_reviews.append(review)
-                    print(f"✅ {agent_type.replace('_', ' ').title()} review completed")
+                    logger.info("✅ %s review completed", agent_type.replace('_', ' ').title())
                 else:
-                    print(f"⚠️ {agent_type.replace('_', ' ').title()} review failed")
+                    logger.warning("⚠️ %s review failed", agent_type.replace('_', ' ').title())
             except Exception as e:
-                print(f"❌ {agent_type.replace('_', ' ').title()} review error: {e}")
+                logger.error("❌ %s review error: %s", agent_type.replace('_', ' ').title(), e)
         
         return agent_reviews
     
-    def review_file(self, file_path: str, parallel: bool = True) -> Optional[ConsolidatedReview]:
+    def review_file(self, file_path: str, parallel: bool = True, fused: bool = False) -> Optional[ConsolidatedReview]:
         """
         Review code from a file using multiple agents.
         
         Args:
             file_path: Path to the file to review
             parallel: Whether to run agents in parallel
+            fused: Whether to review a small file with a single request for all agents
             
         Returns:
             ConsolidatedReview object with results from all agents
         """
         try:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                code = file.read()
+            code = self._read_source(file_path)
             
-            print(f"📁 Reviewing file: {file_path}")
-            return self.review_code(code, parallel)
+            logger.info("📁 Reviewing file: %s", file_path)
+            return self.review_code(code, parallel, fused=fused)
             
         except FileNotFoundError:
-            print(f"❌ Error: File '{file_path}' not found.")
+            logger.error("❌ Error: File '%s' not found.", file_path)
             return None
         except IOError as e:
-            print(f"❌ Error reading file '{file_path}': {e}")
+            logger.error("❌ Error reading file '%s': %s", file_path, e)
             return None
     
-    def review_diff(self, diff_content: str, parallel: bool = True) -> Optional[ConsolidatedReview]:
+    @staticmethod
+    def _read_source(file_path: str) -> str:
+        """
+        Read a source file for review, keeping at most MAX_REVIEW_BYTES.
+        
+        Oversized files are cut by read_review_source and a warning is logged;
+        no note is prepended, so line numbers in findings stay those of the file.
+        
+        Args:
+            file_path: Path to the file
+            
+        Returns:
+            The file content with universal newlines
+        """
+        code, size = read_review_source(file_path)
+        if size > MAX_REVIEW_BYTES:
+            logger.warning("⚠️ %s is %s bytes; reviewing only the first %s bytes", file_path, size, MAX_REVIEW_BYTES)
+        
+        return code.replace('\r\n', '\n').replace('\r', '\n')
+    
+    def review_diff(self, diff_content: str, parallel: bool = True, fused: bool = False) -> Optional[ConsolidatedReview]:
         """
         Review a git diff using multiple agents.
         
         Args:
             diff_content: The diff content to review
             parallel: Whether to run agents in parallel
+            fused: Whether to review a small diff with a single request for all agents
             
         Returns:
             ConsolidatedReview object with results from all agents
         """
-        print("📋 Reviewing git diff...")
-        return self.review_code(diff_content, parallel)
+        logger.info("📋 Reviewing git diff...")
+        return self.review_code(diff_content, parallel, fused=fused)
     
-    def review_diff_with_context(self, diff_content: str, file_path: str, parallel: bool = True) -> Optional[ConsolidatedReview]:
+    def review_diff_with_context(self, diff_content: str, file_path: str, parallel: bool = True,
+                                 full_context: bool = False) -> Optional[ConsolidatedReview]:
         """
-        Review a git diff using the full file as context.
+        Review a git diff using the file as context.
         
         Args:
             diff_content: The diff content to review
             file_path: Path to the full file for context
             parallel: Whether to run agents in parallel
+            full_context: Whether to send the whole file instead of DIFF_CONTEXT_LINES around each hunk
             
         Returns:
             ConsolidatedReview object with results from all agents
         """
         try:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                full_file_content = file.read()
+            full_file_content = self._read_source(file_path)
+            if not full_context:
+                full_file_content = self._hunk_context(diff_content, full_file_content) or full_file_content
             
-            print(f"📋 Reviewing diff with file context: {file_path}")
+            logger.info("📋 Reviewing diff with file context: %s", file_path)
             
             # Create enhanced prompt that includes both diff and full file context
             enhanced_content = f"""DIFF TO REVIEW:
@@ -217,20 +919,62 @@ INSTRUCTIONS: Please focus your review specifically on the changes shown in the
             return self.review_code(enhanced_content, parallel, diff_only=True)
             
         except FileNotFoundError:
-            print(f"❌ Error: File '{file_path}' not found. Falling back to diff-only review.")
+            logger.error("❌ Error: File '%s' not found. Falling back to diff-only review.", file_path)
             return self.review_diff(diff_content, parallel)
         except IOError as e:
-            print(f"❌ Error reading file '{file_path}': {e}. Falling back to diff-only review.")
+            logger.error("❌ Error reading file '%s': %s. Falling back to diff-only review.", file_path, e)
             return self.review_diff(diff_content, parallel)
     
+    @staticmethod
+    def _hunk_context(diff_content: str, file_content: str) -> Optional[str]:
+        """
+        Cut the file down to DIFF_CONTEXT_LINES around each hunk of a single-file diff.
+        
+        Args:
+            diff_content: Unified diff of the file
+            file_content: The file after the change
+            
+        Returns:
+            The excerpts with their line ranges, or None if the diff has no hunks or spans several files
+        """
+        if len(_NEW_FILE_HEADER_RE.findall(diff_content)) > 1:
+            return None
+        
+        lines = file_content.split('\n')
+        windows = []
+        for match in _HUNK_HEADER_RE.finditer(diff_content):
+            start = int(match.group(1))
+            count = int(match.group(2)) if match.group(2) is not None else 1
+            first = max(1, start - DIFF_CONTEXT_LINES)
+            last = min(len(lines), start + count - 1 + DIFF_CONTEXT_LINES)
+            # Overlapping windows are merged so no line is sent twice
+            if windows and first <= windows[-1][1] + 1:
+                windows[-1][1] = max(windows[-1][1], last)
+            else:
+                windows.append([first, last])
+        
+        if not windows:
+            return None
+        return '\n\n'.join(
+            f"Lines {first}-{last}:\n" + '\n'.join(lines[first - 1:last])
+            for first, last in windows
+        )
+    
     def generate_pr_review(self, consolidated_review: ConsolidatedReview, file_path: str) -> str:
         """Generate a PR-style review from the consolidated review."""
-        # Convert consolidated review to JSON format first
-        json_report = self.consolidation_agent.generate_report(consolidated_review, "json")
+        # The formatter only reads the score and each agent's name, type and summary,
+        # so hand those over directly rather than serializing the whole report to JSON and parsing it back
+        review_data = {
+            'overall_score': consolidated_review.overall_score,
+            'agent_reviews': [
+                {'agent_name': review.agent_name, 'agent_type': review.agent_type, 'summary': review.summary}
+                for review in consolidated_review.agent_reviews
+            ]
+        }
         
         # Use PR formatter to create GitHub/GitLab style review
         formatter = PRReviewFormatter(file_path)
-        return formatter.format_pr_review(json_report)
+        return formatter.format_pr_review(review_data)
     
     def print_pr_review(self, consolidated_review: ConsolidatedReview, file_path: str) -> None:
         """Print the PR-style review."""
@@ -264,6 +1008,8 @@ def main():
     parser.add_argument("--diff", "-d", help="Diff content to review")
     parser.add_argument("--diff-with-context", help="Diff content to review with full file context")
     parser.add_argument("--context-file", help="Path to full file for context (used with --diff-with-context)")
+    parser.add_argument("--full-context", action="store_true",
+                       help=f"Send the whole context file instead of {DIFF_CONTEXT_LINES} lines around each hunk")
     parser.add_argument("--agents", "-a", nargs='+', 
                        choices=['security', 'performance', 'coding_practices', 
                                'architecture', 'readability', 'testability'],
@@ -273,19 +1019,39 @@ def main():
                        help="Run agents sequentially instead of in parallel")
     parser.add_argument("--use-ollama", action="store_true", help="Use local Ollama instead of Azure OpenAI")
     parser.add_argument("--creativity", type=float, default=0.1, help="Creativity level for AI responses (0.0-1.0)")
+    parser.add_argument("--max-concurrency", type=int,
+                       help="Agent reviews in flight at once (default: LLM_MAX_CONCURRENCY, else 1 for Ollama, 6 for Azure)")
     parser.add_argument("--list-agents", action="store_true", 
                        help="List available agents and exit")
     parser.add_argument("--json-issues", action="store_true",
                        help="Output issues as JSON list with markdown descriptions")
+    parser.add_argument("--no-cache", action="store_true",
+                       help="Ignore cached agent reviews and always call the model")
+    parser.add_argument("--batch", action="store_true",
+                       help="Submit the review through the Azure OpenAI Batch API (cheaper, may take hours; for CI). "
+                            "Needs a Global-Batch deployment in $AZURE_BATCH_DEPLOYMENT_NAME")
+    parser.add_argument("--straggler-grace", type=float,
+                       help="Once half of the agents are done, wait at most this many seconds for the rest")
+    parser.add_argument("--quiet", "-q", action="store_true",
+                       help="Only log warnings and errors, not review progress")
+    parser.add_argument("--fused", action="store_true",
+                       help=f"Review inputs under {FUSED_MAX_CHARS} characters with one request for all agents")
     
     args = parser.parse_args()
     
+    # Progress goes to stderr so --json-issues output on stdout stays machine-readable
+    logging.basicConfig(level=logging.WARNING, format="%(message)s")
+    logger.setLevel(logging.WARNING if args.quiet else logging.INFO)
+    
     # Initialize multi-agent reviewer
     is_local = args.use_ollama
     reviewer = MultiAgentCodeReviewer(
         is_local=is_local,
         creativity_level=args.creativity,
-        enabled_agents=args.agents
+        enabled_agents=args.agents,
+        max_concurrency=args.max_concurrency,
+        use_cache=not args.no_cache,
+        straggler_grace=args.straggler_grace
     )
     
     # Handle list agents command
@@ -310,42 +1076,58 @@ def main():
         print("❌ Error: --diff-with-context requires --context-file")
         sys.exit(1)
     
+    if args.batch and args.diff_with_context:
+        print("❌ Error: --batch supports --file, --code and --diff")
+        sys.exit(1)
+    
     try:
-        print("🚀 Multi-Agent Code Review Bot Starting...")
+        logger.info("🚀 Multi-Agent Code Review Bot Starting...")
         if is_local:
-            print("Using local Ollama: llama3.2 @ http://localhost:11434")
+            logger.info("Using local Ollama: llama3.2 @ http://localhost:11434")
         else:
-            print("Using Azure OpenAI with client secret authentication")
-        print(f"Creativity level: {args.creativity}")
+            logger.info("Using Azure OpenAI with client secret authentication")
+        logger.info("Creativity level: %s", args.creativity)
         
         # Show agent configuration
         stats = reviewer.get_agent_statistics()
-        print(f"Running {stats['enabled_agents']}/{stats['total_agents']} agents")
+        logger.info("Running %s/%s agents", stats['enabled_agents'], stats['total_agents'])
         
         # Perform review
-        if args.file:
+        if args.batch:
+            if args.file:
+                code, file_path = reviewer._read_source(args.file), args.file
+            elif args.code:
+                code, file_path = args.code, "code_snippet"
+            else:
+                code, file_path = args.diff, "diff_content"
+            consolidated_review = reviewer.review_code_batch([code])[0]
+        elif args.file:
             consolidated_review = reviewer.review_file(
                 args.file, 
-                parallel=not args.sequential
+                parallel=not args.sequential,
+                fused=args.fused
             )
             file_path = args.file
         elif args.code:
             consolidated_review = reviewer.review_code(
                 args.code, 
-                parallel=not args.sequential
+                parallel=not args.sequential,
+                fused=args.fused
             )
             file_path = "code_snippet"
         elif args.diff:
             consolidated_review = reviewer.review_diff(
                 args.diff, 
-                parallel=not args.sequential
+                parallel=not args.sequential,
+                fused=args.fused
             )
             file_path = "diff_content"
         elif args.diff_with_context:
             consolidated_review = reviewer.review_diff_with_context(
                 args.diff_with_context,
                 args.context_file,
-                parallel=not args.sequential
+                parallel=not args.sequential,
+                full_context=args.full_context
             )
             file_path = args.context_file
         
@@ -3,10 +3,237 @@
 PR Review Formatter - Converts multi-agent code review results into GitHub/GitLab style PR comments
 """
 
+import bisect
+import functools
+import io
+import itertools
 import json
+import os
 import re
 from typing import Dict, List, Any, Tuple
 
+# Prefer orjson for parsing the consolidated JSON report when it is installed
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+try:
+    import ahocorasick_rs
+except ImportError:
+    ahocorasick_rs = None
+
+# Patterns locating a line in the reviewed file for common issue kinds
+_LINE_PATTERN_SPECS = {
+    "sql injection": r"SELECT.*FROM.*WHERE.*\+",
+    "loose equality": r"==(?!=)",
+    "var declaration": r"^\s*var\s+",
+    "for loop": r"for\s*\(\s*var\s+\w+\s*=",
+    "dom manipulation": r"innerHTML|outerHTML",
+    "synchronous": r"\.execute\(|\.sync\(",
+}
+
+
+def _is_var_declaration(line: str) -> bool:
+    """Same test as the "var declaration" pattern: the line starts with 'var' and whitespace."""
+    stripped = line.lstrip()
+    return stripped.startswith("var") and len(stripped) > 3 and stripped[3].isspace()
+
+
+# Plain string tests equivalent to the patterns that need no regex engine. "==(?!=)"
+# matches any line containing "==", since the last pair of a run of '=' is never followed by '='
+_LINE_FASTPATHS = {
+    "loose equality": lambda line: "==" in line,
+    "var declaration": _is_var_declaration,
+    "dom manipulation": lambda line: "innerHTML" in line or "outerHTML" in line,
+    "synchronous": lambda line: ".execute(" in line or ".sync(" in line,
+}
+_LINE_PATTERNS = tuple(
+    (name, _LINE_FASTPATHS.get(name) or re.compile(pattern).search)
+    for name, pattern in _LINE_PATTERN_SPECS.items()
+)
+
+# Patterns for different types of issues: (pattern, title, severity) per agent type
+_ISSUE_PATTERN_SPECS = {
+    'security': [
+        (r"SQL Injection.*?`([^`]+)`", "🔐 **SQL Injection Vulnerability**", "critical"),
+        (r"XSS.*?`([^`]+)`", "🔐 **Cross-Site Scripting (XSS)**", "high"),
+        (r"input validation.*?`([^`]+)`", "🔐 **Missing Input Validation**", "high"),
+        (r"hardcoded.*?`([^`]+)`", "🔐 **Hardcoded Credentials**", "critical"),
+    ],
+    'performance': [
+        (r"synchronous.*?`([^`]+)`", "⚡ **Synchronous Operation**", "medium"),
+        (r"inefficient.*?loop.*?`([^`]+)`", "⚡ **Inefficient Loop**", "medium"),
+        (r"memory leak.*?`([^`]+)`", "⚡ **Memory Leak**", "high"),
+        (r"O\(n²\).*?`([^`]+)`", "⚡ **Quadratic Time Complexity**", "medium"),
+    ],
+    'coding_practices': [
+        (r"loose equality.*?`([^`]+)`", "📋 **Use Strict Equality**", "low"),
+        (r"var.*?instead.*?`([^`]+)`", "📋 **Use Modern Variable Declaration**", "low"),
+        (r"magic number.*?`([^`]+)`", "📋 **Magic Number**", "low"),
+        (r"global variable.*?`([^`]+)`", "📋 **Global Variable**", "medium"),
+    ],
+    'readability': [
+        (r"cryptic.*?name.*?`([^`]+)`", "📖 **Unclear Variable Name**", "low"),
+        (r"missing.*?comment.*?`([^`]+)`", "📖 **Missing Documentation**", "low"),
+        (r"inconsistent.*?format.*?`([^`]+)`", "📖 **Inconsistent Formatting**", "low"),
+    ],
+    'architecture': [
+        (r"mixed concerns.*?`([^`]+)`", "🏗️ **Mixed Concerns**", "medium"),
+        (r"tight coupling.*?`([^`]+)`", "🏗️ **Tight Coupling**", "medium"),
+        (r"no error handling.*?`([^`]+)`", "🏗️ **Missing Error Handling**", "high"),
+    ],
+    'testability': [
+        (r"hard to test.*?`([^`]+)`", "🧪 **Hard to Test**", "medium"),
+        (r"dependency injection.*?`([^`]+)`", "🧪 **Missing Dependency Injection**", "medium"),
+        (r"no unit test.*?`([^`]+)`", "🧪 **Missing Unit Tests**", "low"),
+    ]
+}
+
+
+def _literal_prefix(pattern: str) -> str:
+    """Lowercased literal text an issue pattern starts with, e.g. 'o(n²)' for the quadratic complexity pattern."""
+    return re.sub(r'\\(.)', r'\1', pattern.split('.*?', 1)[0]).lower()
+
+
+# Each pattern carries the keyword it starts with, so a cheap substring test can
+# skip the regex scan for the (usual) patterns whose keyword is not in the summary
+_ISSUE_PATTERNS = {
+    agent_type: tuple(
+        (_literal_prefix(pattern), re.compile(pattern, re.IGNORECASE | re.DOTALL), title, severity)
+        for pattern, title, severity in specs
+    )
+    for agent_type, specs in _ISSUE_PATTERN_SPECS.items()
+}
+
+# Report sections in output order; each severity maps to its section's index and
+# unknown severities are reported as low
+_SEVERITY_SECTIONS = ("🚨 Critical Issues", "⚠️ High Priority Issues", "📝 Medium Priority Issues", "💡 Low Priority Issues")
+_SEVERITY_INDEX = {'critical': 0, 'high': 1, 'medium': 2, 'low': 3}
+_LOW_SEVERITY_INDEX = _SEVERITY_INDEX['low']
+
+
+# Fix suggestions as (lowercased title keyword, recommendation); the first keyword found in an issue title wins
+_RECOMMENDATIONS = (
+    ("sql injection", """
+```javascript
+// Instead of:
+var query = "SELECT * FROM users WHERE id = '" + userId + "'";
+
+// Use parameterized queries:
+var query = "SELECT * FROM users WHERE id = ?";
+var result = database.execute(query, [userId]);
+```"""),
+    ("strict equality", """
+```javascript
+// Instead of: if (value == null)
+// Use: if (value === null)
+
+// Instead of: if (count == 0) 
+// Use: if (count === 0)
+```"""),
+    ("modern variable", """
+```javascript
+// Instead of: var users = [];
+// Use: const users = []; or let users = [];
+
+// Prefer const for values that don't change
+// Use let for values that will be reassigned
+```"""),
+    ("modern array", """
+```javascript
+// Instead of traditional for loop:
+for (var i = 0; i < users.length; i++) {
+    if (users[i].active) data.push(users[i]);
+}
+
+// Use modern array methods:
+const data = users.filter(user => user.active);
+```"""),
+    ("error handling", """
+```javascript
+function calculateTotal(items) {
+    try {
+        if (!Array.isArray(items)) {
+            throw new Error('Items must be an array');
+        }
+        return items.reduce((sum, item) => sum + (item.price || 0), 0);
+    } catch (error) {
+        console.error('Error calculating total:', error);
+        return 0;
+    }
+}
+```"""),
+)
+_DEFAULT_RECOMMENDATION = "Consider following best practices for this type of issue."
+
+
+def _recommendation_for(issue_title: str) -> str:
+    """Recommendation for an issue title, matched by keyword."""
+    title = issue_title.lower()
+    for keyword, recommendation in _RECOMMENDATIONS:
+        if keyword in title:
+            return recommendation
+    return _DEFAULT_RECOMMENDATION
+
+
+# Issues reported for well-known function names when no issue pattern matches a summary
+_FALLBACK_FUNCTION_ISSUES = {
+    'getUserData': {
+        'title': '🔐 **SQL Injection Risk**',
+        'severity': 'critical',
+        'description': 'Function constructs SQL query using string concatenation, vulnerable to SQL injection attacks.'
+    },
+    'processUsers': {
+        'title': '📋 **Use Modern Array Methods**', 
+        'severity': 'low',
+        'description': 'Consider using modern array methods like filter(), map(), or forEach() instead of traditional for loops.'
+    },
+    'calculateTotal': {
+        'title': '🏗️ **Missing Error Handling**',
+        'severity': 'medium', 
+        'description': 'Function lacks error handling for edge cases and invalid inputs.'
+    },
+    'updateUserList': {
+        'title': '⚡ **DOM Manipulation Optimization**',
+        'severity': 'medium',
+        'description': 'Consider batching DOM updates or using document fragments for better performance.'
+    }
+}
+_FALLBACK_ISSUES = tuple(
+    (func_name.lower(), func_name, issue_info) for func_name, issue_info in _FALLBACK_FUNCTION_ISSUES.items()
+)
+
+# One automaton pass finds every mentioned function name; plain substring tests
+# are the fallback when ahocorasick_rs is not installed
+if ahocorasick_rs is not None:
+    _FALLBACK_AC = ahocorasick_rs.AhoCorasick([name for name, _, _ in _FALLBACK_ISSUES])
+    
+    def _mentioned_fallback_issues(summary_lower: str) -> List[Tuple[str, str, Dict]]:
+        hits = {index for index, _, _ in _FALLBACK_AC.find_matches_as_indexes(summary_lower, overlapping=True)}
+        return [entry for index, entry in enumerate(_FALLBACK_ISSUES) if index in hits]
+else:
+    def _mentioned_fallback_issues(summary_lower: str) -> List[Tuple[str, str, Dict]]:
+        return [entry for entry in _FALLBACK_ISSUES if entry[0] in summary_lower]
+
+# Every title the formatter can produce, resolved to its recommendation at import
+_RECOMMENDATION_INDEX = {
+    title: _recommendation_for(title)
+    for title in itertools.chain(
+        (title for patterns in _ISSUE_PATTERNS.values() for _, _, title, _ in patterns),
+        (issue_info['title'] for issue_info in _FALLBACK_FUNCTION_ISSUES.values()),
+    )
+}
+
+
+@functools.lru_cache(maxsize=64)
+def _load_lines(path: str, mtime_ns: int, size: int) -> Tuple[str, ...]:
+    """Lines of a file, cached per (path, mtime, size) so formatters for the same file share one read."""
+    with open(path, 'r', encoding='utf-8', buffering=131072) as f:
+        return tuple(f.readlines())
+
+
 class PRReviewFormatter:
     def __init__(self, file_path: str):
         self.file_path = file_path
@@ -16,99 +243,74 @@ class PRReviewFormatter:
     def load_file_content(self):
         """Load the file content to map issues to specific lines."""
         try:
-            with open(self.file_path, 'r', encoding='utf-8') as f:
-                self.file_lines = f.readlines()
+            st = os.stat(self.file_path)
+            self.file_lines = _load_lines(self.file_path, st.st_mtime_ns, st.st_size)
         except Exception as e:
             print(f"Warning: Could not load file {self.file_path}: {e}")
             self.file_lines = []
+        
+        # The stripped lines joined by newlines, with each line's start offset, so a snippet
+        # is located with one str.find instead of stripping and scanning every line per issue
+        stripped = [line.strip() for line in self.file_lines]
+        self._stripped_text = '\n'.join(stripped)
+        self._line_offsets = []
+        offset = 0
+        for line in stripped:
+            self._line_offsets.append(offset)
+            offset += len(line) + 1
+        
+        # "NN: code" for every line, so code windows of overlapping issues only add the marker
+        self._formatted_lines = [f"{i:2d}: {line.rstrip()}" for i, line in enumerate(self.file_lines, 1)]
     
     def find_line_number(self, code_snippet: str, function_name: str = None) -> int:
         """Find the line number for a specific code snippet or function."""
-        if not self.file_lines:
+        # A pattern that captured nothing (or only whitespace) has nothing to locate
+        snippet = code_snippet.strip() if code_snippet else ""
+        if not snippet or not self.file_lines:
             return 0
             
-        # Try to find exact code match first
-        for i, line in enumerate(self.file_lines, 1):
-            if code_snippet.strip() in line.strip():
-                return i
+        # Try to find exact code match first; a snippet spanning lines can't be within one line
+        if '\n' not in snippet:
+            pos = self._stripped_text.find(snippet)
+            if pos >= 0:
+                return bisect.bisect_right(self._line_offsets, pos)
                 
         # Try to find function name
         if function_name:
+            declaration, assignment = f"function {function_name}", f"{function_name} ="
             for i, line in enumerate(self.file_lines, 1):
-                if f"function {function_name}" in line or f"{function_name} =" in line:
+                if declaration in line or assignment in line:
                     return i
                     
         # Try pattern matching for common issues
-        patterns = {
-            "sql injection": r"SELECT.*FROM.*WHERE.*\+",
-            "loose equality": r"==(?!=)",
-            "var declaration": r"^\s*var\s+",
-            "for loop": r"for\s*\(\s*var\s+\w+\s*=",
-            "dom manipulation": r"innerHTML|outerHTML",
-            "synchronous": r"\.execute\(|\.sync\(",
-        }
-        
-        snippet_lower = code_snippet.lower()
-        for pattern_name, pattern in patterns.items():
+        snippet_lower = snippet.lower()
+        for pattern_name, matches in _LINE_PATTERNS:
             if pattern_name in snippet_lower:
                 for i, line in enumerate(self.file_lines, 1):
-                    if re.search(pattern, line):
+                    if matches(line):
                         return i
         
         return 0
     
     def extract_issues_from_summary(self, summary: str, agent_type: str) -> List[Dict]:
         """Extract specific issues from agent summary text."""
-        issues = []
+        patterns = _ISSUE_PATTERNS.get(agent_type)
+        if not patterns:
+            return self._extract_fallback_issues(summary, agent_type)
         
-        # Define patterns for different types of issues
-        issue_patterns = {
-            'security': [
-                (r"SQL Injection.*?`([^`]+)`", "🔐 **SQL Injection Vulnerability**", "critical"),
-                (r"XSS.*?`([^`]+)`", "🔐 **Cross-Site Scripting (XSS)**", "high"),
-                (r"input validation.*?`([^`]+)`", "🔐 **Missing Input Validation**", "high"),
-                (r"hardcoded.*?`([^`]+)`", "🔐 **Hardcoded Credentials**", "critical"),
-            ],
-            'performance': [
-                (r"synchronous.*?`([^`]+)`", "⚡ **Synchronous Operation**", "medium"),
-                (r"inefficient.*?loop.*?`([^`]+)`", "⚡ **Inefficient Loop**", "medium"),
-                (r"memory leak.*?`([^`]+)`", "⚡ **Memory Leak**", "high"),
-                (r"O\(n²\).*?`([^`]+)`", "⚡ **Quadratic Time Complexity**", "medium"),
-            ],
-            'coding_practices': [
-                (r"loose equality.*?`([^`]+)`", "📋 **Use Strict Equality**", "low"),
-                (r"var.*?instead.*?`([^`]+)`", "📋 **Use Modern Variable Declaration**", "low"),
-                (r"magic number.*?`([^`]+)`", "📋 **Magic Number**", "low"),
-                (r"global variable.*?`([^`]+)`", "📋 **Global Variable**", "medium"),
-            ],
-            'readability': [
-                (r"cryptic.*?name.*?`([^`]+)`", "📖 **Unclear Variable Name**", "low"),
-                (r"missing.*?comment.*?`([^`]+)`", "📖 **Missing Documentation**", "low"),
-                (r"inconsistent.*?format.*?`([^`]+)`", "📖 **Inconsistent Formatting**", "low"),
-            ],
-            'architecture': [
-                (r"mixed concerns.*?`([^`]+)`", "🏗️ **Mixed Concerns**", "medium"),
-                (r"tight coupling.*?`([^`]+)`", "🏗️ **Tight Coupling**", "medium"),
-                (r"no error handling.*?`([^`]+)`", "🏗️ **Missing Error Handling**", "high"),
-            ],
-            'testability': [
-                (r"hard to test.*?`([^`]+)`", "🧪 **Hard to Test**", "medium"),
-                (r"dependency injection.*?`([^`]+)`", "🧪 **Missing Dependency Injection**", "medium"),
-                (r"no unit test.*?`([^`]+)`", "🧪 **Missing Unit Tests**", "low"),
-            ]
-        }
-        
-        if agent_type in issue_patterns:
-            for pattern, title, severity in issue_patterns[agent_type]:
-                matches = re.finditer(pattern, summary, re.IGNORECASE | re.DOTALL)
-                for match in matches:
-                    code_snippet = match.group(1) if match.groups() else ""
-                    issues.append({
-                        'title': title,
-                        'code': code_snippet,
-                        'severity': severity,
-                        'description': self._extract_description_around_match(summary, match)
-                    })
+        issues = []
+        summary_lower = summary.lower()
+        for keyword, pattern, title, severity in patterns:
+            if keyword not in summary_lower:
+                continue
+            for match in pattern.finditer(summary):
+                code_snippet = match.group(1) if match.groups() else ""
+                issues.append({
+                    'title': title,
+                    'code': code_snippet,
+                    'severity': severity,
+                    'description': self._extract_description_around_match(summary, match)
+                })
         
         # Fallback: extract issues from common patterns
         if not issues:
@@ -120,72 +322,40 @@ class PRReviewFormatter:
         """Extract description around a regex match."""
         start = max(0, match.start() - 100)
         end = min(len(text), match.end() + 200)
-        context = text[start:end].strip()
         
-        # Clean up the context
-        lines = context.split('\n')
-        clean_lines = [line.strip() for line in lines if line.strip()]
-        return ' '.join(clean_lines[:3])  # First 3 meaningful lines
+        # Clean up the context; stripping stops after the first 3 meaningful lines
+        stripped_lines = (line.strip() for line in text[start:end].split('\n'))
+        return ' '.join(itertools.islice(filter(None, stripped_lines), 3))
     
     def _extract_fallback_issues(self, summary: str, agent_type: str) -> List[Dict]:
         """Fallback method to extract issues when patterns don't match."""
-        issues = []
-        
-        # Common function names and issues
-        function_issues = {
-            'getUserData': {
-                'title': '🔐 **SQL Injection Risk**',
-                'severity': 'critical',
-                'description': 'Function constructs SQL query using string concatenation, vulnerable to SQL injection attacks.'
-            },
-            'processUsers': {
-                'title': '📋 **Use Modern Array Methods**', 
-                'severity': 'low',
-                'description': 'Consider using modern array methods like filter(), map(), or forEach() instead of traditional for loops.'
-            },
-            'calculateTotal': {
-                'title': '🏗️ **Missing Error Handling**',
-                'severity': 'medium', 
-                'description': 'Function lacks error handling for edge cases and invalid inputs.'
-            },
-            'updateUserList': {
-                'title': '⚡ **DOM Manipulation Optimization**',
-                'severity': 'medium',
-                'description': 'Consider batching DOM updates or using document fragments for better performance.'
+        return [
+            {
+                'title': issue_info['title'],
+                'code': func_name,
+                'severity': issue_info['severity'],
+                'description': issue_info['description']
             }
-        }
-        
-        for func_name, issue_info in function_issues.items():
-            if func_name.lower() in summary.lower():
-                issues.append({
-                    'title': issue_info['title'],
-                    'code': func_name,
-                    'severity': issue_info['severity'],
-                    'description': issue_info['description']
-                })
-        
-        return issues
+            for _, func_name, issue_info in _mentioned_fallback_issues(summary.lower())
+        ]
     
     def format_pr_review(self, review_data: Dict) -> str:
         """Format the review data as PR comments."""
         if isinstance(review_data, str):
             try:
-                review_data = json.loads(review_data)
+                review_data = _json_loads(review_data)
             except:
                 return "Error: Invalid review data format"
         
-        output = []
-        output.append("# 🤖 Multi-Agent Code Review")
-        output.append("")
-        output.append(f"**File:** `{self.file_path.split('/')[-1]}`")
-        output.append(f"**Overall Score:** {review_data.get('overall_score', 'N/A')}/10")
-        output.append("")
+        # Lines are written straight into one buffer instead of collected and joined
+        buf = io.StringIO()
+        w = buf.write
+        w("# 🤖 Multi-Agent Code Review\n\n"
+          f"**File:** `{self.file_path.split('/')[-1]}`\n"
+          f"**Overall Score:** {review_data.get('overall_score', 'N/A')}/10\n\n")
         
         # Group issues by severity
-        critical_issues = []
-        high_issues = []
-        medium_issues = []
-        low_issues = []
+        buckets = tuple([] for _ in _SEVERITY_SECTIONS)
         
         # Process each agent's review
         for agent_review in review_data.get('agent_reviews', []):
@@ -209,139 +379,61 @@ class PRReviewFormatter:
                 }
                 
                 # Group by severity
-                if issue['severity'] == 'critical':
-                    critical_issues.append(comment)
-                elif issue['severity'] == 'high':
-                    high_issues.append(comment)
-                elif issue['severity'] == 'medium':
-                    medium_issues.append(comment)
-                else:
-                    low_issues.append(comment)
+                buckets[_SEVERITY_INDEX.get(issue['severity'], _LOW_SEVERITY_INDEX)].append(comment)
         
         # Format issues by severity
-        all_issues = [
-            ("🚨 Critical Issues", critical_issues),
-            ("⚠️ High Priority Issues", high_issues), 
-            ("📝 Medium Priority Issues", medium_issues),
-            ("💡 Low Priority Issues", low_issues)
-        ]
-        
-        for section_title, issues in all_issues:
+        for section_title, issues in zip(_SEVERITY_SECTIONS, buckets):
             if issues:
-                output.append(f"## {section_title}")
-                output.append("")
+                w(f"## {section_title}\n\n")
                 
                 for i, issue in enumerate(issues, 1):
                     line_info = f" (Line {issue['line']})" if issue['line'] > 0 else ""
-                    output.append(f"### {i}. {issue['title']}{line_info}")
-                    output.append(f"**Agent:** {issue['agent']}")
-                    output.append("")
+                    w(f"### {i}. {issue['title']}{line_info}\n**Agent:** {issue['agent']}\n\n")
                     
                     if issue['line'] > 0 and issue['line'] <= len(self.file_lines):
                         # Show the problematic code
                         start_line = max(1, issue['line'] - 2)
                         end_line = min(len(self.file_lines), issue['line'] + 2)
                         
-                        output.append("**Code:**")
-                        output.append("```javascript")
+                        w("**Code:**\n```javascript\n")
                         for line_num in range(start_line, end_line + 1):
-                            prefix = "➤ " if line_num == issue['line'] else "  "
-                            line_content = self.file_lines[line_num - 1].rstrip()
-                            output.append(f"{prefix}{line_num:2d}: {line_content}")
-                        output.append("```")
-                        output.append("")
+                            w("➤ " if line_num == issue['line'] else "  ")
+                            w(self._formatted_lines[line_num - 1])
+                            w("\n")
+                        w("```\n\n")
                     
-                    output.append(f"**Issue:** {issue['description']}")
-                    output.append("")
+                    w(f"**Issue:** {issue['description']}\n\n")
                     
                     # Add specific recommendations
                     recommendations = self._get_recommendations(issue['title'], issue['code'])
                     if recommendations:
-                        output.append("**Recommended Fix:**")
-                        output.append(recommendations)
-                        output.append("")
+                        w(f"**Recommended Fix:**\n{recommendations}\n\n")
                     
-                    output.append("---")
-                    output.append("")
+                    w("---\n\n")
         
         # Summary statistics
-        total_issues = len(critical_issues) + len(high_issues) + len(medium_issues) + len(low_issues)
+        critical_count, high_count, medium_count, low_count = map(len, buckets)
+        total_issues = critical_count + high_count + medium_count + low_count
         if total_issues > 0:
-            output.append("## 📊 Review Summary")
-            output.append("")
-            output.append(f"- **Total Issues Found:** {total_issues}")
-            output.append(f"- **Critical:** {len(critical_issues)}")
-            output.append(f"- **High Priority:** {len(high_issues)}")
-            output.append(f"- **Medium Priority:** {len(medium_issues)}")
-            output.append(f"- **Low Priority:** {len(low_issues)}")
-            output.append("")
+            w("## 📊 Review Summary\n\n"
+              f"- **Total Issues Found:** {total_issues}\n"
+              f"- **Critical:** {critical_count}\n"
+              f"- **High Priority:** {high_count}\n"
+              f"- **Medium Priority:** {medium_count}\n"
+              f"- **Low Priority:** {low_count}\n\n")
             
-            if critical_issues or high_issues:
-                output.append("⚠️ **Action Required:** Please address critical and high priority issues before merging.")
+            if critical_count or high_count:
+                w("⚠️ **Action Required:** Please address critical and high priority issues before merging.\n")
             else:
-                output.append("✅ **Good to merge** after addressing medium/low priority improvements.")
+                w("✅ **Good to merge** after addressing medium/low priority improvements.\n")
         
-        return "\n".join(output)
+        # Every line was written with its newline; the report has none after the last line
+        return buf.getvalue()[:-1]
     
     def _get_recommendations(self, issue_title: str, code: str) -> str:
         """Get specific recommendations based on the issue type."""
-        recommendations = {
-            "SQL Injection": """
-```javascript
-// Instead of:
-var query = "SELECT * FROM users WHERE id = '" + userId + "'";
-
-// Use parameterized queries:
-var query = "SELECT * FROM users WHERE id = ?";
-var result = database.execute(query, [userId]);
-```""",
-            "Strict Equality": """
-```javascript
-// Instead of: if (value == null)
-// Use: if (value === null)
-
-// Instead of: if (count == 0) 
-// Use: if (count === 0)
-```""",
-            "Modern Variable": """
-```javascript
-// Instead of: var users = [];
-// Use: const users = []; or let users = [];
-
-// Prefer const for values that don't change
-// Use let for values that will be reassigned
-```""",
-            "Modern Array": """
-```javascript
-// Instead of traditional for loop:
-for (var i = 0; i < users.length; i++) {
-    if (users[i].active) data.push(users[i]);
-}
-
-// Use modern array methods:
-const data = users.filter(user => user.active);
-```""",
-            "Error Handling": """
-```javascript
-function calculateTotal(items) {
-    try {
-        if (!Array.isArray(items)) {
-            throw new Error('Items must be an array');
-        }
-        return items.reduce((sum, item) => sum + (item.price || 0), 0);
-    } catch (error) {
-        console.error('Error calculating total:', error);
-        return 0;
-    }
-}
-```"""
-        }
-        
-        for key, recommendation in recommendations.items():
-            if key.lower() in issue_title.lower():
-                return recommendation
-                
-        return "Consider following best practices for this type of issue."
+        recommendation = _RECOMMENDATION_INDEX.get(issue_title)
+        return recommendation if recommendation is not None else _recommendation_for(issue_title)
 
 
 def main():
@@ -358,8 +450,8 @@ def main():
     
     # Load review data
     try:
-        with open(args.review_json, 'r') as f:
-            review_data = json.load(f)
+        with open(args.review_json, 'rb') as f:
+            review_data = _json_loads(f.read())
     except Exception as e:
         print(f"Error loading review data: {e}", file=sys.stderr)
         sys.exit(1)
@@ -370,11 +462,14 @@ def main():
     
     # Output
     if args.output:
-        with open(args.output, 'w') as f:
+        with open(args.output, 'w', encoding='utf-8', buffering=131072) as f:
             f.write(pr_review)
         print(f"PR review written to {args.output}")
     else:
-        print(pr_review)
+        # One write of the whole report, then a single flush
+        sys.stdout.write(pr_review)
+        sys.stdout.write("\n")
+        sys.stdout.flush()
 
 
 if __name__ == "__main__":
@@ -3,8 +3,10 @@
 Specialized Code Review Agents - Individual agents focused on specific aspects of code review.
 """
 
+import functools
 import json
 import logging
+import sys
 from typing import Optional, Dict, Any, List, Union
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
@@ -14,6 +16,16 @@ from .util.llm import AzureClient, OllamaClient
 
 logger = logging.getLogger(__name__)
 
+# Review objects are created per finding and can number in the hundreds per PR;
+# slots keep them small on interpreters that support slotted dataclasses
+DATACLASS_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+
+@functools.lru_cache(maxsize=8)
+def _number_lines(code: str) -> str:
+    """Prefix every line with its number; cached since every agent numbers the same code."""
+    return '\n'.join([f"{i+1:3d}: {line}" for i, line in enumerate(code.split('\n'))])
+
 
 class Severity(Enum):
     """Severity levels for review findings."""
@@ -24,7 +36,7 @@ class Severity(Enum):
     INFO = "info"
 
 
-@dataclass
+@dataclass(**DATACLASS_SLOTS)
 class ReviewFinding:
     """Represents a single finding from a code review agent."""
     agent_type: str
@@ -37,7 +49,7 @@ class ReviewFinding:
     category: Optional[str] = None
 
 
-@dataclass
+@dataclass(**DATACLASS_SLOTS)
 class AgentReview:
     """Represents the complete review from a single agent."""
     agent_name: str
@@ -63,6 +75,7 @@ class BaseReviewAgent(ABC):
         self.creativity_level = creativity_level
         self.agent_name = self.__class__.__name__
         self.agent_type = self.get_agent_type()
+        self._system_prompt = self._build_system_prompt()
         
         # Get LLM instance through the sandbox manager
         self.llm_client = SandboxInstances.get_instance(
@@ -71,6 +84,11 @@ class BaseReviewAgent(ABC):
             creativity_level=creativity_level
         )
     
+    @property
+    def temperature(self) -> float:
+        """Sampling temperature for review requests; at least 0.2 for consistency."""
+        return max(0.2, self.creativity_level)
+    
     @abstractmethod
     def get_agent_type(self) -> str:
         """Return the type of this agent."""
@@ -81,25 +99,57 @@ class BaseReviewAgent(ABC):
         """Generate the specialized prompt for this agent."""
         pass
     
+    def _build_system_prompt(self) -> str:
+        """System prompt for this agent; built once since it only depends on the agent type."""
+        return f"You are a {self.agent_type} expert conducting a thorough code review. CRITICAL REQUIREMENTS: 1) ALWAYS scan the ENTIRE code thoroughly for ALL potential issues, 2) NEVER miss obvious problems, 3) ALWAYS provide specific line numbers for each issue you identify, 4) Format your response to clearly indicate the line number for each finding (e.g., 'Line 15: Issue description'), 5) Be comprehensive and consistent in your analysis."
+    
+    def _build_messages(self, prompt: str) -> List[Dict[str, str]]:
+        """Chat messages for a review prompt."""
+        return [
+            {
+                "role": "system",
+                "content": self._system_prompt
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ]
+    
+    def build_review_messages(self, code: str, diff_only: bool = False) -> List[Dict[str, str]]:
+        """Chat messages that ask this agent's model to review the code, for callers sending them themselves."""
+        return self._build_messages(self.get_specialized_prompt(code, diff_only))
+    
+    def parse_review(self, response: str, code: str) -> AgentReview:
+        """Turn a model response to build_review_messages into this agent's review."""
+        return self._parse_response(response, code)
+    
     def _make_api_request(self, prompt: str) -> Optional[str]:
         """Make a request to the AI model through the LLM client."""
         try:
-            # Prepare messages for chat completion
-            messages = [
-                {
-                    "role": "system",
-                    "content": f"You are a {self.agent_type} expert conducting a thorough code review. CRITICAL REQUIREMENTS: 1) ALWAYS scan the ENTIRE code thoroughly for ALL potential issues, 2) NEVER miss obvious problems, 3) ALWAYS provide specific line numbers for each issue you identify, 4) Format your response to clearly indicate the line number for each finding (e.g., 'Line 15: Issue description'), 5) Be comprehensive and consistent in your analysis."
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ]
-            
             # Make request through the LLM client
             response = self.llm_client.chat_completion(
-                messages=messages,
-                temperature=max(0.2, self.creativity_level)  # Minimum 0.2 for consistency
+                messages=self._build_messages(prompt),
+                temperature=self.temperature
+            )
+            
+            if response:
+                logger.debug(f"{self.agent_name} completed successfully")
+                return response
+            else:
+                logger.error(f"{self.agent_name} returned empty response")
+                return None
+                
+        except Exception as e:
+            logger.error(f"Error in {self.agent_name}: {e}")
+            return None
+    
+    async def _amake_api_request(self, prompt: str) -> Optional[str]:
+        """Async counterpart of _make_api_request, awaiting the client's achat_completion."""
+        try:
+            response = await self.llm_client.achat_completion(
+                messages=self._build_messages(prompt),
+                temperature=self.temperature
             )
             
             if response:
@@ -123,6 +173,16 @@ class BaseReviewAgent(ABC):
         
         return self._parse_response(response, code)
     
+    async def areview_code(self, code: str, diff_only: bool = False) -> Optional[AgentReview]:
+        """Async counterpart of review_code, so several agents can await their LLM calls on one event loop."""
+        prompt = self.get_specialized_prompt(code, diff_only)
+        response = await self._amake_api_request(prompt)
+        
+        if not response:
+            return None
+        
+        return self._parse_response(response, code)
+    
     def _parse_response(self, response: str, code: str) -> AgentReview:
         """Parse the AI response into structured review data."""
         # This is a simplified parser - in production, you might want more sophisticated parsing
@@ -226,8 +286,7 @@ Example: "Line 15: SQL Injection vulnerability - user input concatenated into qu
 Be concise and actionable. IGNORE unchanged context lines."""
         else:
             # Add line numbers to the code for full file review
-            lines = code.split('\n')
-            numbered_code = '\n'.join([f"{i+1:3d}: {line}" for i, line in enumerate(lines)])
+            numbered_code = _number_lines(code)
             
             return f"""You are a cybersecurity expert conducting a thorough security code review. 
 
@@ -296,8 +355,7 @@ Example: "Line 25: Inefficient loop - O(n²) complexity due to nested iteration.
 Be specific about measurable performance gains. IGNORE unchanged context lines."""
         else:
             # Add line numbers to the code for full file review
-            lines = code.split('\n')
-            numbered_code = '\n'.join([f"{i+1:3d}: {line}" for i, line in enumerate(lines)])
+            numbered_code = _number_lines(code)
             
             return f"""You are a performance optimization expert reviewing code for efficiency and scalability.
 
@@ -367,8 +425,7 @@ Example: "Line 42: Use 'const' instead of 'var' for variables that don't change.
 Focus on practical improvements that enhance code quality. IGNORE unchanged context lines."""
         else:
             # Add line numbers to the code for full file review
-            lines = code.split('\n')
-            numbered_code = '\n'.join([f"{i+1:3d}: {line}" for i, line in enumerate(lines)])
+            numbered_code = _number_lines(code)
             
             return f"""You are a senior software engineer expert in coding standards and best practices.
 
@@ -439,8 +496,7 @@ Example: "Line 33: Tight coupling - direct database access should be abstracted.
 Focus on long-term architectural health. IGNORE unchanged context lines."""
         else:
             # Add line numbers to the code for full file review
-            lines = code.split('\n')
-            numbered_code = '\n'.join([f"{i+1:3d}: {line}" for i, line in enumerate(lines)])
+            numbered_code = _number_lines(code)
             
             return f"""You are a software architect reviewing code for architectural soundness and design quality.
 
@@ -510,8 +566,7 @@ Example: "Line 25: Variable name 'x' is unclear - consider using descriptive nam
 Focus on making code more readable and maintainable. IGNORE unchanged context lines."""
         else:
             # Add line numbers to the code for full file review
-            lines = code.split('\n')
-            numbered_code = '\n'.join([f"{i+1:3d}: {line}" for i, line in enumerate(lines)])
+            numbered_code = _number_lines(code)
         
         return f"""You are a technical documentation expert focused on code readability and clarity.
 
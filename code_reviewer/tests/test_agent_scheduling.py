@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Tests for agent scheduling: per-agent timeouts and the concurrency slots of timed-out requests.
+Run from the repository root with: python -m pytest code_reviewer/tests
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from code_reviewer import multi_agent_reviewer
+from code_reviewer.multi_agent_reviewer import MultiAgentCodeReviewer, _await_in_slot
+from code_reviewer.util.aio import run_sync
+
+
+class FakeReviewer:
+    def __init__(self, is_local):
+        self.is_local = is_local
+
+
+def _timeout(code, is_local=False):
+    return MultiAgentCodeReviewer._agent_timeout(FakeReviewer(is_local), code)
+
+
+def test_small_code_still_gets_time_for_a_full_answer():
+    output_seconds = multi_agent_reviewer.AGENT_MAX_OUTPUT_TOKENS / multi_agent_reviewer.AGENT_MIN_TOKENS_PER_SECOND
+
+    assert _timeout("x = 1\n") == multi_agent_reviewer.AGENT_TIMEOUT_MIN_SECONDS + output_seconds
+
+
+def test_timeout_grows_with_the_code_up_to_the_cap():
+    assert _timeout("x" * 200_000) > _timeout("x" * 100_000) > _timeout("x")
+    assert _timeout("x" * 10_000_000) == multi_agent_reviewer.AGENT_TIMEOUT_SECONDS
+    assert _timeout("x", is_local=True) == multi_agent_reviewer.AGENT_TIMEOUT_SECONDS
+
+
+def test_timed_out_requests_keep_their_slot_until_they_finish():
+    in_flight, peak = 0, 0
+    lock = threading.Lock()
+
+    def request(seconds):
+        nonlocal in_flight, peak
+        with lock:
+            in_flight += 1
+            peak = max(peak, in_flight)
+        time.sleep(seconds)
+        with lock:
+            in_flight -= 1
+        return seconds
+
+    async def review(semaphore, seconds):
+        try:
+            return await _await_in_slot(semaphore, asyncio.to_thread(request, seconds), 0.05)
+        except asyncio.TimeoutError:
+            return "timed out"
+
+    async def run_all():
+        semaphore = asyncio.Semaphore(2)
+        return await asyncio.gather(*(review(semaphore, seconds) for seconds in (0.3, 0.3, 0.01, 0.01)))
+
+    assert run_sync(run_all()) == ["timed out", "timed out", 0.01, 0.01]
+    assert peak == 2
+
+
+def test_failures_are_raised_to_the_caller():
+    async def failing():
+        raise RuntimeError("model unavailable")
+
+    async def run():
+        return await _await_in_slot(asyncio.Semaphore(1), failing(), 1)
+
+    with pytest.raises(RuntimeError):
+        run_sync(run())
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Tests for BatchProcessor: JSONL demultiplexing and the direct-request fallback.
+Run from the repository root with: python -m pytest code_reviewer/tests
+"""
+
+import json
+
+import pytest
+
+from code_reviewer.batch_consolidator import BatchProcessor
+from code_reviewer.multi_agent_reviewer import MultiAgentCodeReviewer
+from code_reviewer.util.llm import AzureClient
+
+
+class FakeAzureClient(AzureClient):
+    """AzureClient that answers chat completions locally instead of fetching a token."""
+
+    def __init__(self, endpoint="https://example.openai.azure.com"):
+        self.azure_endpoint = endpoint
+        self._access_token = "token"
+        self.calls = []
+
+    def chat_completion(self, messages, **kwargs):
+        self.calls.append(messages)
+        return f"direct: {messages[-1]['content']}"
+
+
+class FakeResponse:
+    def __init__(self, payload=None, text=""):
+        self._payload = payload
+        self.text = text
+
+    def json(self):
+        return self._payload
+
+
+def _messages(*contents):
+    return [[{"role": "user", "content": content}] for content in contents]
+
+
+def _output_line(index, content=None, status_code=200):
+    body = {"choices": [{"message": {"content": content}}]} if content is not None else {}
+    return json.dumps({
+        "custom_id": f"request-{index}",
+        "response": {"status_code": status_code, "body": body},
+        "error": None if status_code == 200 else {"message": "failed"},
+    })
+
+
+def _fake_batch_api(processor, output_lines, submitted):
+    """Replace _request with a batch endpoint that completes at once with output_lines."""
+    def request(method, path, **kwargs):
+        if path == "files" and method == "POST":
+            submitted.extend(kwargs["files"]["file"][1].decode("utf-8").splitlines())
+            return FakeResponse({"id": "file-in"})
+        if path == "batches":
+            return FakeResponse({"id": "batch-1", "status": "completed", "output_file_id": "file-out"})
+        if path == "files/file-out/content":
+            return FakeResponse(text="\n".join(output_lines) + "\n\n")
+        raise AssertionError(f"unexpected request {method} {path}")
+
+    processor._request = request
+
+
+def test_batch_output_is_demultiplexed_by_custom_id():
+    processor = BatchProcessor(FakeAzureClient(), deployment_name="gpt-4o-batch", poll_interval=0)
+    submitted = []
+    # Output lines arrive in any order; one request failed and one is missing
+    _fake_batch_api(processor, [
+        _output_line(2, " third "),
+        _output_line(0, "first"),
+        _output_line(1, status_code=500),
+    ], submitted)
+
+    results = processor.run(_messages("a", "b", "c", "d"))
+
+    assert results == ["first", None, "third", None]
+    requests = [json.loads(line) for line in submitted]
+    assert [request["custom_id"] for request in requests] == [f"request-{i}" for i in range(4)]
+    assert {request["body"]["model"] for request in requests} == {"gpt-4o-batch"}
+
+
+def test_failed_batch_falls_back_to_direct_requests():
+    client = FakeAzureClient()
+    processor = BatchProcessor(client, deployment_name="gpt-4o-batch")
+
+    def failing_request(method, path, **kwargs):
+        raise RuntimeError("batch endpoint unavailable")
+
+    processor._request = failing_request
+
+    assert processor.run(_messages("a", "b")) == ["direct: a", "direct: b"]
+    assert len(client.calls) == 2
+
+
+def test_missing_batch_deployment_runs_directly(monkeypatch):
+    monkeypatch.delenv("AZURE_BATCH_DEPLOYMENT_NAME", raising=False)
+    processor = BatchProcessor(FakeAzureClient())
+
+    assert not processor.use_batch_api
+    assert processor.run(_messages("a")) == ["direct: a"]
+
+
+def test_batch_deployment_is_read_from_the_environment(monkeypatch):
+    monkeypatch.setenv("AZURE_BATCH_DEPLOYMENT_NAME", "env-batch")
+    processor = BatchProcessor(FakeAzureClient())
+
+    assert processor.use_batch_api
+    assert processor.deployment_name == "env-batch"
+
+
+@pytest.mark.parametrize("client", [object(), FakeAzureClient(endpoint=None)])
+def test_clients_without_batch_endpoint_run_directly(client):
+    assert not BatchProcessor(client, deployment_name="gpt-4o-batch").use_batch_api
+
+
+def test_direct_requests_keep_input_order():
+    processor = BatchProcessor(FakeAzureClient(), use_batch_api=False, max_workers=3)
+
+    assert processor.run(_messages(*"abcdef")) == [f"direct: {c}" for c in "abcdef"]
+    assert processor.run([]) == []
+
+
+class RecordingClient:
+    """Client without a batch endpoint that records the temperature of every request."""
+
+    def __init__(self, name):
+        self.name = name
+        self.temperatures = []
+
+    def chat_completion(self, messages, temperature=0.1, max_tokens=2000):
+        self.temperatures.append(temperature)
+        return f"Line 1: high severity issue reported by {self.name}"
+
+
+def test_batched_agent_reviews_use_each_agents_client_and_temperature():
+    reviewer = MultiAgentCodeReviewer(is_local=True, enabled_agents=["security", "performance"], use_cache=False)
+    security, performance = (reviewer.available_agents[name] for name in ("security", "performance"))
+    security.llm_client, performance.llm_client = RecordingClient("security"), RecordingClient("performance")
+    security.creativity_level, performance.creativity_level = 0.3, 0.5
+    reviewer.consolidation_agent.llm_client = RecordingClient("consolidation")
+
+    results = reviewer.review_code_batch(["x = 1", "y = 2"])
+
+    assert security.llm_client.temperatures == [0.3, 0.3]
+    assert performance.llm_client.temperatures == [0.5, 0.5]
+    for result in results:
+        assert {review.agent_type for review in result.agent_reviews} == {"security", "performance"}
+        for review in result.agent_reviews:
+            assert all(review.agent_type in finding.title for finding in review.findings)
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Tests for AST chunking of large files and mapping chunk findings back to file line numbers.
+Run from the repository root with: python -m pytest code_reviewer/tests
+"""
+
+from code_reviewer import multi_agent_reviewer
+from code_reviewer.multi_agent_reviewer import MultiAgentCodeReviewer
+from code_reviewer.specialized_agents import AgentReview, ReviewFinding, Severity
+
+split_by_ast = MultiAgentCodeReviewer._split_by_ast
+offset_review_lines = MultiAgentCodeReviewer._offset_review_lines
+merge_chunk_reviews = MultiAgentCodeReviewer._merge_chunk_reviews
+
+
+def _function(name, body_lines):
+    body = "".join(f"    x{i} = {i}\n" for i in range(body_lines))
+    return f"def {name}():\n{body}    return x0\n"
+
+
+def _review(findings=(), summary="ok", recommendations=()):
+    return AgentReview(agent_name="Performance Agent", agent_type="performance", overall_score=9,
+                       summary=summary, findings=list(findings), recommendations=list(recommendations))
+
+
+def _finding(line_number=None, title="Slow loop", description="", severity=Severity.MEDIUM):
+    return ReviewFinding(agent_type="performance", severity=severity, title=title,
+                         description=description, line_number=line_number)
+
+
+def test_chunks_cover_the_code_without_overlap(monkeypatch):
+    monkeypatch.setattr(multi_agent_reviewer, "CHUNK_MAX_CHARS", 200)
+    code = '"""Module docstring."""\nimport os\n\n' + "\n".join(_function(f"f{i}", 8) for i in range(5))
+
+    chunks = split_by_ast(code)
+
+    assert len(chunks) > 1
+    assert "\n".join(chunk for chunk, _ in chunks) == code
+    lines = code.split("\n")
+    for chunk, start in chunks:
+        assert lines[start - 1:start - 1 + chunk.count("\n") + 1] == chunk.split("\n")
+    assert chunks[0][1] == 1 and chunks[0][0].startswith('"""Module docstring."""')
+
+
+def test_definitions_are_never_split(monkeypatch):
+    monkeypatch.setattr(multi_agent_reviewer, "CHUNK_MAX_CHARS", 50)
+    code = "@decorator\n" + _function("big", 10) + "\n" + _function("small", 1)
+
+    chunks = split_by_ast(code)
+
+    assert [start for _, start in chunks] == [1, 15]
+    assert chunks[0][0].startswith("@decorator\ndef big():")
+    assert chunks[1][0].startswith("def small():")
+
+
+def test_invalid_python_is_one_chunk():
+    code = "def broken(:\n    pass\n"
+
+    assert split_by_ast(code) == [(code, 1)]
+
+
+def test_offset_shifts_finding_lines_and_line_references():
+    review = _review(
+        findings=[_finding(3, title="Loop on line 3", description="See lines 3 and line 10"), _finding()],
+        summary="Hot path at line 4",
+        recommendations=["Cache the result on line 7", "Use a set"],
+    )
+
+    shifted = offset_review_lines(review, 100)
+
+    assert [finding.line_number for finding in shifted.findings] == [103, None]
+    assert shifted.findings[0].title == "Loop on line 103"
+    assert shifted.findings[0].description == "See lines 103 and line 110"
+    assert shifted.summary == "Hot path at line 104"
+    assert shifted.recommendations == ["Cache the result on line 107", "Use a set"]
+    assert review.findings[0].line_number == 3
+
+
+def test_zero_offset_returns_the_review_unchanged():
+    review = _review(findings=[_finding(5)])
+
+    assert offset_review_lines(review, 0) is review
+
+
+def test_merged_chunk_reviews_keep_every_finding():
+    first = _review(findings=[_finding(2, severity=Severity.HIGH)], summary="First.", recommendations=["a"])
+    second = offset_review_lines(_review(findings=[_finding(1)], summary="Second.", recommendations=["b"]), 50)
+
+    merged = merge_chunk_reviews([first, second])
+
+    assert [finding.line_number for finding in merged.findings] == [2, 51]
+    assert merged.summary == "First. Second."
+    assert merged.recommendations == ["a", "b"]
+    assert 1 <= merged.overall_score < 10
+    assert merge_chunk_reviews([first]) is first
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Tests for the CodeReviewer helpers: stream line parsing, source reading and diff deduplication.
+Run from the repository root with: python -m pytest code_reviewer/tests
+"""
+
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from code_reviewer import code_reviewer
+from code_reviewer.code_reviewer import (
+    CodeReviewer,
+    _dedupe_diff,
+    _fast_extract_response,
+    _parse_stream_line,
+    _read_code_file,
+    read_review_source,
+)
+
+
+def _stream_line(response, done=False):
+    return json.dumps({"model": "llama3", "response": response, "done": done},
+                      separators=(",", ":"), ensure_ascii=True).encode("utf-8")
+
+
+@pytest.mark.parametrize("response", [
+    "plain token",
+    'say "hi"',
+    "back\\slash\\",
+    "tab\tand\nnewline",
+    "café ✓",
+    "",
+])
+def test_fast_extract_matches_json(response):
+    line = _stream_line(response, done=True)
+
+    assert _fast_extract_response(line) == (response, True)
+    assert _parse_stream_line(line) == (response, True)
+
+
+def test_fast_extract_reads_raw_utf8():
+    line = '{"response":"naïve ✓","done":false}'.encode("utf-8")
+
+    assert _fast_extract_response(line) == ("naïve ✓", False)
+
+
+def test_surrogate_pairs_fall_back_to_json():
+    line = _stream_line("emoji \U0001F600")
+
+    assert _fast_extract_response(line) == (None, False)
+    assert _parse_stream_line(line) == ("emoji \U0001F600", False)
+
+
+@pytest.mark.parametrize("line", [
+    b'{"done":true}',
+    b'{"response":"unterminated',
+    b'{"response":"bad \\q escape","done":false}',
+])
+def test_unusual_lines_are_left_to_the_json_parser(line):
+    assert _fast_extract_response(line) == (None, False)
+
+
+def test_parse_stream_line_ignores_garbage():
+    assert _parse_stream_line(b"not json") == (None, False)
+    assert _parse_stream_line(b"[1, 2]") == (None, False)
+    assert _parse_stream_line(b'{"done": true}') == (None, True)
+
+
+def test_read_code_file_empty(tmp_path):
+    path = tmp_path / "empty.py"
+    path.write_bytes(b"")
+
+    assert _read_code_file(str(path)) == ""
+
+
+def test_read_code_file_replaces_undecodable_bytes(tmp_path):
+    path = tmp_path / "latin1.py"
+    path.write_bytes(b"name = 'caf\xe9'\n")
+
+    assert _read_code_file(str(path)) == "name = 'caf�'\n"
+
+
+def test_oversized_file_is_cut_after_last_complete_line(tmp_path, monkeypatch):
+    monkeypatch.setattr(code_reviewer, "MAX_REVIEW_BYTES", 20)
+    path = tmp_path / "big.py"
+    path.write_bytes(b"a = 1\nb = 2\nc = 3333333333\n")
+
+    assert read_review_source(str(path)) == ("a = 1\nb = 2\n", 27)
+    code = _read_code_file(str(path))
+    assert code.startswith("# NOTE: file truncated to its first 20 of 27 bytes\n")
+    assert code.endswith("a = 1\nb = 2\n")
+
+
+def test_cut_without_newline_does_not_split_a_character(tmp_path, monkeypatch):
+    monkeypatch.setattr(code_reviewer, "MAX_REVIEW_BYTES", 4)
+    path = tmp_path / "wide.txt"
+    # "aé€" is 1 + 2 + 3 bytes; the cut at 4 bytes falls inside "€"
+    path.write_bytes("aé€".encode("utf-8"))
+
+    assert read_review_source(str(path)) == ("aé", 6)
+
+
+def _diff(*files):
+    return "".join(f"diff --git a/{name} b/{name}\n{hunks}" for name, hunks in files)
+
+
+def test_identical_hunks_are_collapsed_with_a_map():
+    hunk = "-old()\n+new()\n"
+    diff = _diff(
+        ("a.py", f"@@ -1,1 +1,1 @@\n{hunk}"),
+        ("b.py", f"@@ -5,1 +5,1 @@\n{hunk}@@ -9,1 +9,1 @@\n-x\n+y\n"),
+        ("c.py", f"@@ -7,1 +7,1 @@\n{hunk}"),
+    )
+
+    deduped, collapse_map = _dedupe_diff(diff)
+
+    assert deduped.startswith("# NOTE: 2 duplicate hunks collapsed\n")
+    assert "@@ -1,1 +1,1 @@ (x3 occurrences)\n-old()\n+new()\n" in deduped
+    assert deduped.count("+new()") == 1
+    assert "+y" in deduped
+    assert "diff --git a/c.py b/c.py" in deduped
+    assert collapse_map == {"a.py @@ -1,1 +1,1 @@": ["b.py @@ -5,1 +5,1 @@", "c.py @@ -7,1 +7,1 @@"]}
+
+
+def test_hunks_differing_only_in_whitespace_runs_are_duplicates():
+    diff = _diff(
+        ("a.py", "@@ -1,2 +1,2 @@\n-old()\n+new()\n"),
+        ("b.py", "@@ -3,3 +3,3 @@\n-old()   \n\n\n+new()\n"),
+    )
+
+    deduped, collapse_map = _dedupe_diff(diff)
+
+    assert "(x2 occurrences)" in deduped
+    assert list(collapse_map.values()) == [["b.py @@ -3,3 +3,3 @@"]]
+
+
+def test_diff_without_duplicates_is_unchanged():
+    diff = _diff(("a.py", "@@ -1 +1 @@\n-a\n+b\n"), ("b.py", "@@ -1 +1 @@\n-a\n+c\n"))
+
+    assert _dedupe_diff(diff) == (diff, {})
+
+
+class FakeReviewer(CodeReviewer):
+    """CodeReviewer that answers prompts locally and records them."""
+
+    def __init__(self, answer, **kwargs):
+        super().__init__(use_cache=False, **kwargs)
+        self.answer = answer
+        self.prompts = []
+
+    def _make_api_request(self, prompt, stream=True):
+        self.prompts.append(prompt)
+        return self.answer(prompt)
+
+
+def test_batched_reviews_are_demultiplexed():
+    def answer(prompt):
+        if "Snippet 1" in prompt:
+            return "<<<REVIEW 2>>>\nsecond\n<<<REVIEW 1>>>\nfirst\n<<<END>>>"
+        return "single"
+
+    reviewer = FakeReviewer(answer)
+
+    assert reviewer.review_codes_batched(["a = 1", "b = 2", "c = 3"], batch_size=2) == ["first", "second", "single"]
+    assert len(reviewer.prompts) == 2
+
+
+def test_batched_snippets_without_a_review_fall_back_to_single_requests():
+    reviewer = FakeReviewer(lambda prompt: "<<<REVIEW 1>>>\nfirst\n<<<END>>>" if "Snippet 1" in prompt else "single")
+
+    assert reviewer.review_codes_batched(["a = 1", "b = 2"]) == ["first", "single"]
+
+
+def test_batched_prompt_is_fitted_to_the_context(monkeypatch):
+    monkeypatch.setattr(code_reviewer, "_get_tokenizer", lambda: None)
+    reviewer = FakeReviewer(lambda prompt: "single", num_ctx=1200, num_predict=512)
+    codes = ["\n".join(f"value_{i} = {i}" for i in range(150))] * 2
+
+    reviewer.review_codes_batched(codes, max_prompt_chars=10**6)
+
+    assert code_reviewer._estimate_tokens(reviewer.prompts[0]) <= 1200 - 512
+    assert "truncated to fit" in reviewer.prompts[0]
+
+
+class SlowReviewer(CodeReviewer):
+    """CodeReviewer whose requests take a while, recording how many overlap."""
+
+    def __init__(self, **kwargs):
+        super().__init__(use_cache=False, **kwargs)
+        self.in_flight = self.peak = 0
+        self.starts = []
+        self.lock = threading.Lock()
+
+    def _send_request(self, prompt, stream):
+        with self.lock:
+            self.starts.append(time.monotonic())
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        time.sleep(0.05)
+        with self.lock:
+            self.in_flight -= 1
+        return prompt
+
+
+def test_concurrency_limit_applies_across_threads_and_async_reviews():
+    reviewer = SlowReviewer(max_concurrency=2)
+
+    with ThreadPoolExecutor(max_workers=6) as executor:
+        futures = [executor.submit(reviewer.review_code, f"x = {i}", stream=False) for i in range(4)]
+        futures.append(executor.submit(code_reviewer.asyncio.run, reviewer.areview_code(["y = 1", "y = 2"])))
+        for future in futures:
+            future.result()
+
+    assert reviewer.peak == 2
+    assert len(reviewer.starts) == 6
+
+
+def test_rate_limit_spaces_out_request_starts():
+    reviewer = SlowReviewer(max_concurrency=4, rate_per_min=600)
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        list(executor.map(lambda i: reviewer.review_code(f"x = {i}", stream=False), range(3)))
+
+    starts = sorted(reviewer.starts)
+    assert all(later - earlier >= 0.09 for earlier, later in zip(starts, starts[1:]))
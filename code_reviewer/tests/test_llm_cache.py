@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Tests for LLMCache: exact and semantic hits, expiry, the temperature gate and the cached client.
+Run from the repository root with: python -m pytest code_reviewer/tests
+"""
+
+import pytest
+
+from code_reviewer import llm_cache
+from code_reviewer.llm_cache import CachedLLMClient, InMemoryBackend, LLMCache, default_embedder
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class CountingClient:
+    model_name = "llama3"
+
+    def __init__(self):
+        self.calls = 0
+
+    def chat_completion(self, messages, **kwargs):
+        self.calls += 1
+        return f"answer {self.calls}"
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(llm_cache.time, "monotonic", clock)
+    return clock
+
+
+def _messages(prompt):
+    return [{"role": "system", "content": "You review code."}, {"role": "user", "content": prompt}]
+
+
+def test_exact_hit_requires_same_model_messages_and_temperature():
+    cache = LLMCache()
+    cache.set("llama3", _messages("review a"), 0.0, "fine")
+
+    assert cache.get("llama3", _messages("review a"), 0.0) == "fine"
+    assert cache.get("llama3", _messages("review b"), 0.0) is None
+    assert cache.get("gpt-4o", _messages("review a"), 0.0) is None
+    assert cache.get("llama3", _messages("review a"), 0.1) is None
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = LLMCache(ttl=60)
+    cache.set("llama3", _messages("review a"), 0.0, "fine")
+
+    clock.now += 59
+    assert cache.get("llama3", _messages("review a"), 0.0) == "fine"
+    clock.now += 2
+    assert cache.get("llama3", _messages("review a"), 0.0) is None
+
+
+def test_backend_evicts_least_recently_used(clock):
+    backend = InMemoryBackend(max_entries=2)
+    backend.set("a", "1", ttl=60)
+    backend.set("b", "2", ttl=60)
+    assert backend.get("a") == "1"
+
+    backend.set("c", "3", ttl=60)
+
+    assert backend.get("b") is None
+    assert (backend.get("a"), backend.get("c")) == ("1", "3")
+
+
+def test_semantic_hit_reuses_a_similar_prompt():
+    vectors = {"review a": [1.0, 0.0], "review a!": [0.99, 0.05], "unrelated": [0.0, 1.0]}
+    cache = LLMCache(embed_fn=vectors.__getitem__, threshold=0.9)
+    cache.set("llama3", _messages("review a"), 0.0, "fine")
+
+    assert cache.get("llama3", _messages("review a!"), 0.0) == "fine"
+    assert cache.get("llama3", _messages("unrelated"), 0.0) is None
+
+
+def test_failing_embedding_falls_back_to_exact_lookups():
+    def embed(text):
+        raise RuntimeError("embedding service down")
+
+    cache = LLMCache(embed_fn=embed)
+    cache.set("llama3", _messages("review a"), 0.0, "fine")
+
+    assert cache.get("llama3", _messages("review a"), 0.0) == "fine"
+    assert cache.get("llama3", _messages("review b"), 0.0) is None
+
+
+def test_client_caches_only_deterministic_requests():
+    client = CountingClient()
+    cached = CachedLLMClient(client, LLMCache(max_temperature=0.0))
+
+    assert cached.chat_completion(_messages("review a"), temperature=0.0) == "answer 1"
+    assert cached.chat_completion(_messages("review a"), temperature=0.0) == "answer 1"
+    assert cached.chat_completion(_messages("review a"), temperature=0.7) == "answer 2"
+    assert cached.chat_completion(_messages("review a"), temperature=0.7) == "answer 3"
+    assert client.calls == 3
+    assert cached.model_name == "llama3"
+
+
+def test_default_embedder_needs_sentence_transformers(monkeypatch):
+    monkeypatch.setattr(llm_cache.importlib.util, "find_spec", lambda name: None)
+
+    assert default_embedder() is None
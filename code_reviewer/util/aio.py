@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Event loop helpers for the synchronous review entry points
+"""
+
+import asyncio
+import concurrent.futures
+from typing import Any, Coroutine, TypeVar
+
+T = TypeVar("T")
+
+
+def run_sync(coro: Coroutine[Any, Any, T]) -> T:
+    """
+    Run a coroutine to completion on a fresh event loop, like asyncio.run.
+
+    asyncio.run joins the default executor before returning, so a blocking LLM call
+    started with asyncio.to_thread would hold up the caller even after its task timed
+    out or was skipped. Here the loop gets a private default executor that is shut
+    down without waiting: abandoned calls finish in the background and their results
+    are discarded.
+
+    Args:
+        coro: Coroutine to run
+
+    Returns:
+        The coroutine's result
+    """
+    loop = asyncio.new_event_loop()
+    executor = concurrent.futures.ThreadPoolExecutor(thread_name_prefix="review-worker")
+    loop.set_default_executor(executor)
+    try:
+        asyncio.set_event_loop(loop)
+        return loop.run_until_complete(coro)
+    finally:
+        try:
+            _cancel_all_tasks(loop)
+            loop.run_until_complete(loop.shutdown_asyncgens())
+        finally:
+            asyncio.set_event_loop(None)
+            executor.shutdown(wait=False, cancel_futures=True)
+            loop.close()
+
+
+def _cancel_all_tasks(loop: asyncio.AbstractEventLoop) -> None:
+    """Cancel the tasks still pending on the loop and wait for them to unwind."""
+    tasks = asyncio.all_tasks(loop)
+    if not tasks:
+        return
+    for task in tasks:
+        task.cancel()
+    loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
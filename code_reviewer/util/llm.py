@@ -3,14 +3,25 @@
 LLM Client utilities for Azure OpenAI integration
 """
 
+import asyncio
+import atexit
 import logging
 import os
 import requests
+from requests.adapters import HTTPAdapter
 from typing import Optional, Dict, Any, List
 from azure.identity import ClientSecretCredential, EnvironmentCredential
 
 logger = logging.getLogger(__name__)
 
+# All clients share one keep-alive connection pool, so concurrent agents reuse open
+# TLS connections instead of each paying for DNS and a handshake
+HTTP_POOL_MAXSIZE = 32
+http_session = requests.Session()
+http_session.mount("https://", HTTPAdapter(pool_connections=8, pool_maxsize=HTTP_POOL_MAXSIZE))
+http_session.mount("http://", HTTPAdapter(pool_connections=8, pool_maxsize=HTTP_POOL_MAXSIZE))
+atexit.register(http_session.close)
+
 
 class AzureClient:
     """Azure OpenAI client for code review agents."""
@@ -49,7 +60,7 @@ class AzureClient:
                 'scope': self.azure_scope
             }
             
-            response = requests.post(self.azure_token_url, data=token_data, timeout=30)
+            response = http_session.post(self.azure_token_url, data=token_data, timeout=30)
             response.raise_for_status()
             
             token_response = response.json()
@@ -101,14 +112,14 @@ class AzureClient:
         }
         
         try:
-            response = requests.post(url, headers=headers, json=payload, timeout=300)
+            response = http_session.post(url, headers=headers, json=payload, timeout=300)
             
             # Handle token expiration
             if response.status_code == 401:
                 logger.info("Token expired, refreshing...")
                 self._refresh_token()
                 headers["Authorization"] = f"Bearer {self._access_token}"
-                response = requests.post(url, headers=headers, json=payload, timeout=300)
+                response = http_session.post(url, headers=headers, json=payload, timeout=300)
             
             response.raise_for_status()
             result = response.json()
@@ -117,6 +128,10 @@ class AzureClient:
         except Exception as e:
             logger.error(f"Azure OpenAI request failed: {e}")
             return None
+    
+    async def achat_completion(self, messages: List[Dict[str, str]], **kwargs) -> Optional[str]:
+        """Async counterpart of chat_completion; the blocking request runs on a worker thread."""
+        return await asyncio.to_thread(self.chat_completion, messages, **kwargs)
 
 
 class OllamaClient:
@@ -149,7 +164,7 @@ class OllamaClient:
         }
         
         try:
-            response = requests.post(self.model_url, json=payload, timeout=300)
+            response = http_session.post(self.model_url, json=payload, timeout=300)
             response.raise_for_status()
             result = response.json()
             return result.get("response", "").strip()
@@ -157,6 +172,10 @@ class OllamaClient:
             logger.error(f"Ollama request failed: {e}")
             return None
     
+    async def achat_completion(self, messages: List[Dict[str, str]], **kwargs) -> Optional[str]:
+        """Async counterpart of chat_completion; the blocking request runs on a worker thread."""
+        return await asyncio.to_thread(self.chat_completion, messages, **kwargs)
+    
     def _messages_to_prompt(self, messages: List[Dict[str, str]]) -> str:
         """Convert messages format to single prompt for Ollama."""
         prompt_parts = []